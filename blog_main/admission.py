@@ -0,0 +1,164 @@
+"""
+Admission control for the expensive routes (settings.ADMISSION).
+
+Each limited route can have:
+
+* ``per_ip`` / ``per_user``: (requests, seconds) token buckets. A client
+  over its rate gets 429 with Retry-After set to when its next token is due.
+  The bucket is kept as GCRA: one "theoretical arrival time" per client,
+  which is a token bucket of ``requests`` tokens refilled evenly over
+  ``seconds`` without a refill job.
+* ``concurrency``: requests in flight across every worker. Beyond it the
+  request gets 503 with Retry-After at once, rather than queueing behind
+  the work it would only slow down.
+
+State lives in the cache named by ADMISSION['CACHE'], so all workers share
+it. Memcached and Redis update counters atomically; the file cache is
+best-effort, enough to shed a spike but not an exact limit.
+
+Every decision is counted per route (admitted, rate_limited, overloaded);
+``manage.py admission_stats`` prints the counters for capacity planning.
+"""
+import logging
+import math
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+logger = logging.getLogger('blog_main.admission')
+
+SLOTS_PREFIX = 'admission:slots:'
+BUCKET_PREFIX = 'admission:bucket:'
+STATS_PREFIX = 'admission:stats:'
+OUTCOMES = ('admitted', 'rate_limited', 'overloaded')
+# In-flight counters outlive any request; a worker killed mid-request leaks a slot until then
+SLOTS_TIMEOUT = 60 * 60
+
+
+def config(name, default=None):
+    return getattr(settings, 'ADMISSION', {}).get(name, default)
+
+
+def enabled():
+    return config('ENABLED', False) and bool(config('ROUTES'))
+
+
+def store():
+    return caches[config('CACHE', 'default')]
+
+
+def rule_for(route, method):
+    """The limits for this route and method, or None when it is not limited."""
+    rule = config('ROUTES', {}).get(route)
+    if rule is None:
+        return None
+    methods = rule.get('methods')
+    if methods and method not in methods:
+        return None
+    return rule
+
+
+def client_ip(request):
+    header = config('CLIENT_IP_HEADER')
+    if header and request.META.get(header):
+        # X-Forwarded-For lists the client first, then each proxy
+        return request.META[header].split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _incr(cache, key, delta=1, timeout=None):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        cache.add(key, 0, timeout)
+        return cache.incr(key, delta)
+
+
+def record(route, outcome):
+    _incr(store(), f'{STATS_PREFIX}{route}:{outcome}')
+
+
+def take_token(key, requests, seconds, now=None):
+    """Spend one token from the bucket ``key``; returns 0 when admitted, else seconds until a token is due."""
+    cache = store()
+    now = time.time() if now is None else now
+    interval = seconds / requests
+    # How far ahead of now the arrival time may run: a full bucket lets ``requests`` through at once
+    tolerance = seconds - interval
+    arrival = max(cache.get(key) or now, now)
+    if arrival - now > tolerance:
+        return arrival - now - tolerance
+    cache.set(key, arrival + interval, math.ceil(arrival + interval - now) + 1)
+    return 0
+
+
+def acquire_slot(route, limit):
+    cache = store()
+    key = SLOTS_PREFIX + route
+    if _incr(cache, key, timeout=SLOTS_TIMEOUT) > limit:
+        release_slot(route)
+        return None
+    return route
+
+
+def release_slot(route):
+    cache = store()
+    key = SLOTS_PREFIX + route
+    try:
+        if cache.decr(key) < 0:
+            # The counter expired under a running request; start again from empty
+            cache.set(key, 0, SLOTS_TIMEOUT)
+    except ValueError:
+        pass
+
+
+def shed(status, retry_after, message):
+    response = HttpResponse(message, status=status, content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(math.ceil(retry_after), 1))
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+def admit(request, route, rule):
+    """None to let the request through (holding a slot in request.admission_slot), or the response that sheds it."""
+    buckets = []
+    if rule.get('per_ip'):
+        buckets.append((f'ip:{client_ip(request)}', rule['per_ip']))
+    if rule.get('per_user') and request.user.is_authenticated:
+        buckets.append((f'user:{request.user.pk}', rule['per_user']))
+    for client, (requests, seconds) in buckets:
+        wait = take_token(f'{BUCKET_PREFIX}{route}:{client}', requests, seconds)
+        if wait:
+            record(route, 'rate_limited')
+            logger.info('Rate limited %s %s for %s', request.method, route, client)
+            return shed(429, wait, f'Too many requests. Try again in {max(math.ceil(wait), 1)} seconds.')
+
+    if rule.get('concurrency'):
+        request.admission_slot = acquire_slot(route, rule['concurrency'])
+        if request.admission_slot is None:
+            record(route, 'overloaded')
+            logger.warning('Shed %s %s: %s already in flight', request.method, route, rule['concurrency'])
+            return shed(503, config('RETRY_AFTER', 2), 'The server is busy. Please try again shortly.')
+
+    record(route, 'admitted')
+    return None
+
+
+def stats():
+    """{route: {outcome: count, 'in_flight': n}} for every configured route."""
+    routes = list(config('ROUTES', {}))
+    keys = [f'{STATS_PREFIX}{route}:{outcome}' for route in routes for outcome in OUTCOMES]
+    values = store().get_many(keys + [SLOTS_PREFIX + route for route in routes])
+    result = {}
+    for route in routes:
+        counts = {outcome: values.get(f'{STATS_PREFIX}{route}:{outcome}', 0) for outcome in OUTCOMES}
+        counts['in_flight'] = max(values.get(SLOTS_PREFIX + route, 0), 0)
+        result[route] = counts
+    return result
+
+
+def reset_stats():
+    routes = list(config('ROUTES', {}))
+    store().delete_many([f'{STATS_PREFIX}{route}:{outcome}' for route in routes for outcome in OUTCOMES])
@@ -3,6 +3,14 @@ ASGI config for blog_main project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+To serve the async read views, run gunicorn with uvicorn workers:
+
+    ASYNC_READ_VIEWS=True gunicorn blog_main.asgi:application -k uvicorn.workers.UvicornWorker
+
+WhiteNoise and the query inspector are sync middleware, so Django runs them
+in a thread around each async view. ``manage.py bench_asgi`` compares the
+WSGI and ASGI stacks in-process.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,58 @@
+"""
+The session and authentication fast path (settings.AUTH_FAST_PATH).
+
+Stock Django reads the session row and then the User row on every request
+from a logged-in visitor. With the fast path on:
+
+* sessions use a cache-backed engine (cached_db by default, so a cache
+  flush logs nobody out; signed_cookies keeps no server state at all);
+* ``blog_main.backends.CachedModelBackend`` keeps the logged-in User in the
+  cache for TIMEOUT seconds. Saving or deleting a User drops its entry,
+  as does logging out (blogs/signals.py) and a bulk deactivation (dashboards);
+* messages live in a cookie instead of falling back to the session;
+* ``LazySessionMiddleware`` never starts a session on a GET or HEAD, so
+  anonymous readers get no session row and no session cookie.
+
+``manage.py bench_auth`` measures per-request overhead with and without it.
+"""
+from django.conf import settings
+from django.core.cache import caches
+
+STOCK_SESSION_MIDDLEWARE = 'django.contrib.sessions.middleware.SessionMiddleware'
+LAZY_SESSION_MIDDLEWARE = 'blog_main.middleware.LazySessionMiddleware'
+
+
+def config(name, default=None):
+    return getattr(settings, 'AUTH_FAST_PATH', {}).get(name, default)
+
+
+def store():
+    return caches[config('CACHE', 'default')]
+
+
+def cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def get(user_id):
+    return store().get(cache_key(user_id))
+
+
+def remember(user):
+    store().set(cache_key(user.pk), user, config('TIMEOUT', 300))
+
+
+def invalidate(*user_ids):
+    if user_ids:
+        store().delete_many([cache_key(user_id) for user_id in user_ids])
+
+
+def fast_path_settings(middleware, session_engine='django.contrib.sessions.backends.cached_db'):
+    """The settings the fast path replaces, given the stock MIDDLEWARE list."""
+    return {
+        'SESSION_ENGINE': session_engine,
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.cookie.CookieStorage',
+        # ModelBackend stays listed so sessions from before the switch still resolve (uncached) until the next login
+        'AUTHENTICATION_BACKENDS': ['blog_main.backends.CachedModelBackend', 'django.contrib.auth.backends.ModelBackend'],
+        'MIDDLEWARE': [LAZY_SESSION_MIDDLEWARE if entry == STOCK_SESSION_MIDDLEWARE else entry for entry in middleware],
+    }
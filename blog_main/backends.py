@@ -0,0 +1,16 @@
+from django.contrib.auth.backends import ModelBackend
+
+from . import auth_cache
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend that loads the logged-in User from the cache (see blog_main/auth_cache.py)."""
+
+    def get_user(self, user_id):
+        user = auth_cache.get(user_id)
+        if user is None:
+            # Inactive users come back as None and are never cached
+            user = super().get_user(user_id)
+            if user is not None:
+                auth_cache.remember(user)
+        return user
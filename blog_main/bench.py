@@ -0,0 +1,217 @@
+"""
+Helpers shared by the benchmark management commands.
+
+Requests are pushed straight through Django's WSGI or ASGI handler in this
+process, so the numbers cover middleware, views, ORM and templates without
+any network or server in between.
+"""
+import asyncio
+import io
+import itertools
+import math
+import random
+import statistics
+import sys
+import time
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+
+from blogs import counters, search
+from blogs.models import Blog, Category, Comment
+
+
+def locmem_caches(name):
+    """CACHES with every alias in process memory, so a run starts cold and leaves the real cache alone."""
+    return {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'{name}-{alias}'}
+        for alias in settings.CACHES
+    }
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    rank = max(math.ceil(pct / 100 * len(values)), 1)
+    return values[rank - 1]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (in ms) for one run."""
+    latencies = sorted(latencies)
+    return {
+        'requests': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'max_ms': round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def format_summary(label, summary):
+    return (
+        f"{label:<24} {summary['requests']:>6} req {summary['throughput']:>9.1f} req/s"
+        f"   p50 {summary['p50_ms']:>8.2f} ms   p95 {summary['p95_ms']:>8.2f} ms"
+        f"   p99 {summary['p99_ms']:>8.2f} ms"
+    )
+
+
+def wsgi_environ(path, method='GET', headers=None, host='localhost'):
+    path_info, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': query,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'HTTP_HOST': host,
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    return environ
+
+
+def wsgi_request(handler, path, response_headers=None, **kwargs):
+    """Run one request through a WSGI handler; returns (status code, seconds, body bytes).
+
+    Pass a list as ``response_headers`` to collect the (name, value) pairs sent back.
+    """
+    status = []
+
+    def start_response(line, headers, exc_info=None):
+        status.append(int(line.split(' ', 1)[0]))
+        if response_headers is not None:
+            response_headers.extend(headers)
+
+    started = time.perf_counter()
+    body = handler(wsgi_environ(path, **kwargs), start_response)
+    size = 0
+    try:
+        for chunk in body:
+            size += len(chunk)
+    finally:
+        if hasattr(body, 'close'):
+            body.close()
+    return status[0], time.perf_counter() - started, size
+
+
+async def asgi_request(handler, path, method='GET', headers=None, host='localhost'):
+    """Run one request through an ASGI handler; returns (status code, seconds, body bytes)."""
+    path_info, _, query = path.partition('?')
+    raw_headers = [(b'host', host.encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': method,
+        'scheme': 'http',
+        'path': path_info,
+        'raw_path': path_info.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': raw_headers,
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    received = False
+    status = []
+    size = 0
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects; Django cancels this wait when it is done
+        await asyncio.Future()
+
+    async def send(message):
+        nonlocal size
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+        elif message['type'] == 'http.response.body':
+            size += len(message.get('body', b''))
+
+    started = time.perf_counter()
+    await handler(scope, receive, send)
+    return status[0], time.perf_counter() - started, size
+
+
+WORDS = (
+    'django python query index cache page post comment author category search latency '
+    'database template view request response server worker thread async stream image '
+    'feature release deploy benchmark profile memory storage session cookie header'
+).split()
+
+
+def sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def seed_dataset(users=50, categories=10, posts=1000, comments=5000, seed=0, batch_size=1000):
+    """
+    Fill an empty database with a deterministic synthetic blog.
+
+    Rows go in with bulk_create, which skips the save signals, so the
+    search index and the denormalized counters are rebuilt at the end.
+    Returns the superuser every account shares a password with: ``bench``.
+    """
+    def batches(rows):
+        rows = iter(rows)
+        while batch := list(itertools.islice(rows, batch_size)):
+            yield batch
+
+    rng = random.Random(seed)
+    password = make_password('bench')
+    manager = User.objects.create(username='bench-manager', password=password, is_staff=True, is_superuser=True)
+    for batch in batches(
+        User(username=f'bench-user-{i}', email=f'bench-user-{i}@example.com', password=password, is_staff=i % 10 == 0)
+        for i in range(users)
+    ):
+        User.objects.bulk_create(batch)
+    Category.objects.bulk_create([Category(category_name=f'Bench category {i}') for i in range(categories)])
+
+    user_ids = list(User.objects.values_list('pk', flat=True))
+    category_ids = list(Category.objects.values_list('pk', flat=True))
+    for batch in batches(
+        Blog(
+            title=sentence(rng, 6),
+            slug=f'bench-post-{i}',
+            category_id=rng.choice(category_ids),
+            author_id=rng.choice(user_ids),
+            feauture_image='',
+            short_description=sentence(rng, 30),
+            blog_body=sentence(rng, 300),
+            status='Published' if rng.random() < 0.9 else 'Draft',
+            is_featured=rng.random() < 0.05,
+        )
+        for i in range(posts)
+    ):
+        Blog.objects.bulk_create(batch)
+
+    post_ids = list(Blog.objects.published().values_list('pk', flat=True))
+    if post_ids:
+        for batch in batches(
+            Comment(user_id=rng.choice(user_ids), blog_id=rng.choice(post_ids), comment=sentence(rng, 20))
+            for _ in range(comments)
+        ):
+            Comment.objects.bulk_create(batch)
+
+    search.rebuild_index()
+    counters.recount()
+    return manager
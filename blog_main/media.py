@@ -0,0 +1,192 @@
+"""
+Serving uploaded media from MEDIA_ROOT.
+
+Replaces ``django.views.static.serve``, which reads every file through
+Python and sends no caching headers. Here:
+
+* files go out as a FileResponse, so gunicorn hands them to ``sendfile()``
+  and the bytes never pass through Python (ranges included);
+* strong ETags and Last-Modified answer revalidation with 304;
+* single ``Range: bytes=`` requests get 206 Partial Content, which lets
+  browsers resume downloads and seek in audio/video;
+* content-addressed image variants (blogs/images.py) are cached as
+  immutable for a year, other uploads for MEDIA_CACHE_MAX_AGE;
+* a ``.br`` or ``.gz`` copy next to a file is sent to clients that accept it.
+
+Static files are not served here; WhiteNoise handles them.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotAllowed
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+
+from blogs import images
+
+IMMUTABLE_MAX_AGE = 60 * 60 * 24 * 365
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Accept-Encoding token -> suffix of the precompressed copy, in order of preference
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class FileRange:
+    """
+    A file that reads at most ``length`` bytes from where it is positioned.
+
+    It keeps ``fileno()``, so a server using ``sendfile()`` can still send the
+    range directly from the file, sized by the Content-Length header.
+    """
+
+    def __init__(self, file, length):
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def close(self):
+        self.file.close()
+
+
+def byte_range(header, size):
+    """
+    The single range a ``Range`` header asks for, as inclusive (start, end).
+
+    Returns None to send the whole file: no header, a malformed one or a
+    multi-range request. Raises RangeNotSatisfiable for a range that starts
+    past the end of the file.
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N: the last N bytes
+        length = int(last)
+        if not length or not size:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+def if_range_matches(request, etag, last_modified):
+    """A Range applies only if the client's If-Range still describes this file."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def choose_representation(request, fullpath):
+    """The file to send and its Content-Encoding: a precompressed copy when the client accepts one."""
+    accepted = request.headers.get('Accept-Encoding', '')
+    found_any = False
+    for token, suffix in PRECOMPRESSED:
+        candidate = fullpath + suffix
+        if os.path.isfile(candidate):
+            found_any = True
+            if re.search(rf'\b{token}\b', accepted):
+                return candidate, token, True
+    return fullpath, None, found_any
+
+
+def cache_control(path):
+    if images.is_variant(path):
+        return f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+    return f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+
+
+def serve_media(request, path):
+    if request.method not in ('GET', 'HEAD'):
+        return HttpResponseNotAllowed(['GET', 'HEAD'])
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('File not found')
+    if os.path.basename(fullpath).endswith(tuple(suffix for _, suffix in PRECOMPRESSED)):
+        # Compressed copies are only ever sent as an encoding of their original
+        raise Http404('File not found')
+
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or 'application/octet-stream'
+    ranged = 'Range' in request.headers
+    if ranged or encoding:
+        sent_path, content_encoding, has_variants = fullpath, None, False
+    else:
+        sent_path, content_encoding, has_variants = choose_representation(request, fullpath)
+
+    try:
+        file_stat = os.stat(sent_path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404('File not found')
+    if not stat.S_ISREG(file_stat.st_mode):
+        raise Http404('File not found')
+
+    size = file_stat.st_size
+    last_modified = int(file_stat.st_mtime)
+    etag = f'"{size:x}-{file_stat.st_mtime_ns:x}{"-" + content_encoding if content_encoding else ""}"'
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': cache_control(path),
+    }
+
+    def finish(response):
+        for header, value in headers.items():
+            response[header] = value
+        if has_variants:
+            patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return finish(not_modified)
+
+    span = None
+    if ranged and if_range_matches(request, etag, last_modified):
+        try:
+            span = byte_range(request.headers['Range'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return finish(response)
+
+    file = open(sent_path, 'rb')
+    if span is None:
+        response = FileResponse(file, content_type=content_type)
+        response['Content-Length'] = str(size)
+    else:
+        start, end = span
+        file.seek(start)
+        response = FileResponse(FileRange(file, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    if content_encoding:
+        response['Content-Encoding'] = content_encoding
+    response['Accept-Ranges'] = 'bytes'
+    return finish(response)
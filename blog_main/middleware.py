@@ -0,0 +1,200 @@
+import logging
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+
+from . import admission, replicas
+
+logger = logging.getLogger('blog_main.queries')
+
+IN_LIST_RE = re.compile(r'\bIN \((?:%s, )*%s\)')
+LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+SPACE_RE = re.compile(r'\s+')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def normalize_sql(sql):
+    """Collapse a query to its shape so the same statement with different values groups together."""
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    sql = LITERAL_RE.sub('?', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def call_site():
+    """Template line that triggered the query, else the first frame in our own code."""
+    frame = sys._getframe(2)
+    base_dir = str(settings.BASE_DIR)
+    code_site = None
+    while frame is not None:
+        node = frame.f_locals.get('self')
+        # type() rather than isinstance(): a lazy object's __class__ would
+        # evaluate it and run a query from inside this hook.
+        if issubclass(type(node), Node) and getattr(node, 'token', None) is not None:
+            origin = getattr(node, 'origin', None)
+            name = getattr(origin, 'template_name', None) or getattr(origin, 'name', '?')
+            return f'{name}:{node.token.lineno}'
+        filename = frame.f_code.co_filename
+        if code_site is None and filename != __file__ and filename.startswith(base_dir) \
+                and 'site-packages' not in filename:
+            code_site = f'{filename[len(base_dir) + 1:]}:{frame.f_lineno}'
+        frame = frame.f_back
+    return code_site or '?'
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = defaultdict(lambda: {'count': 0, 'sites': set()})
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+            shape = self.shapes[normalize_sql(sql)]
+            shape['count'] += 1
+            shape['sites'].add(call_site())
+
+    def repeated(self, threshold):
+        return {
+            sql: shape for sql, shape in self.shapes.items()
+            if shape['count'] >= threshold
+        }
+
+
+class QueryInspectorMiddleware:
+    """
+    Counts the queries each request runs and flags repeated shapes (N+1s).
+
+    Adds X-DB-Query-Count, X-DB-Query-Time-Ms and X-DB-Duplicate-Queries to
+    the response and logs every repeated shape with the template line or
+    view line that issued it. With STRICT on, a request over its URL budget
+    raises QueryBudgetExceeded, which fails the test that made it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = getattr(settings, 'QUERY_INSPECTOR', {})
+        if not config.get('ENABLED', False):
+            raise MiddlewareNotUsed
+        self.strict = config.get('STRICT', False)
+        self.budgets = config.get('BUDGETS', {})
+        self.default_budget = config.get('DEFAULT_BUDGET')
+        self.threshold = config.get('DUPLICATE_THRESHOLD', 2)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with ExitStack() as stack:
+            for conn in connections.all():
+                stack.enter_context(conn.execute_wrapper(recorder))
+            response = self.get_response(request)
+
+        repeated = recorder.repeated(self.threshold)
+        response['X-DB-Query-Count'] = str(recorder.count)
+        response['X-DB-Query-Time-Ms'] = f'{recorder.duration * 1000:.1f}'
+        response['X-DB-Duplicate-Queries'] = str(sum(shape['count'] - 1 for shape in repeated.values()))
+
+        for sql, shape in repeated.items():
+            logger.warning(
+                '%s %s: %d x %s (from %s)',
+                request.method, request.path, shape['count'], sql, ', '.join(sorted(shape['sites'])),
+            )
+
+        budget = self.get_budget(request)
+        if budget is not None and recorder.count > budget:
+            message = f'{request.path} ran {recorder.count} queries (budget {budget})'
+            if self.strict:
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def get_budget(self, request):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        return self.budgets.get(url_name, self.default_budget)
+
+
+class ReplicaPinningMiddleware:
+    """
+    Lets safe requests read from a replica and pins writers to the primary.
+
+    A request that writes sets a short-lived cookie; while the browser sends
+    it back, that visitor's reads stay on the primary (see blog_main/replicas.py).
+    """
+
+    def __init__(self, get_response):
+        if not replicas.replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.cookie = replicas.config('COOKIE', 'pin_primary')
+        self.pin_seconds = replicas.config('PIN_SECONDS', 10)
+
+    def __call__(self, request):
+        use_replica = request.method in ('GET', 'HEAD', 'OPTIONS') and self.cookie not in request.COOKIES
+        token = replicas.begin(use_replica)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrote = replicas.end(token)
+        if wrote:
+            response.set_cookie(self.cookie, '1', max_age=self.pin_seconds, httponly=True, samesite='Lax')
+        return response
+
+
+class AdmissionControlMiddleware:
+    """
+    Sheds load on the routes in ADMISSION['ROUTES'] before their views run.
+
+    Over a rate limit the answer is 429, over the route's concurrency limit
+    503, both with Retry-After (see blog_main/admission.py). Runs after
+    AuthenticationMiddleware so per-user limits know who is asking.
+    """
+
+    def __init__(self, get_response):
+        if not admission.enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            slot = getattr(request, 'admission_slot', None)
+            if slot is not None:
+                admission.release_slot(slot)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        rule = admission.rule_for(request.resolver_match.url_name, request.method)
+        if rule is None:
+            return None
+        return admission.admit(request, request.resolver_match.url_name, rule)
+
+
+class LazySessionMiddleware(SessionMiddleware):
+    """
+    SessionMiddleware that never starts a session on a safe request.
+
+    A GET or HEAD without a session cookie leaves without one, even if
+    something wrote to request.session; sessions begin at login, which is
+    a POST. Visitors who already have a session are handled as usual.
+    """
+
+    def process_response(self, request, response):
+        if request.method in ('GET', 'HEAD', 'OPTIONS') and settings.SESSION_COOKIE_NAME not in request.COOKIES:
+            # Still adds Vary: Cookie when the session was read
+            request.session.modified = False
+        return super().process_response(request, response)
@@ -0,0 +1,122 @@
+"""
+Read replicas with read-your-writes pinning.
+
+``ReplicaRouter`` sends reads to the aliases in REPLICAS['ALIASES'], but
+only inside a request that ``ReplicaPinningMiddleware`` has marked as
+read-only. Management commands, signals run from the shell and tests
+never opt in, so they read from the primary they write to.
+
+A request stays on the primary when:
+
+* its method is unsafe (POST and friends read what they are about to write);
+* the browser carries the pin cookie, set for PIN_SECONDS after any
+  request that wrote, so the writer sees their comment or post even
+  while the replicas catch up;
+* it has written already, or is inside a transaction on the primary;
+* it reads sessions, which must never lag behind a login.
+
+One replica is chosen per request so its reads see one consistent
+snapshot. A replica that cannot be connected to is skipped for
+RETRY_SECONDS, and with none left reads fall back to the primary.
+"""
+import contextvars
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import DatabaseError
+
+logger = logging.getLogger('blog_main.replicas')
+
+# Apps whose reads always go to the primary
+PRIMARY_APPS = {'sessions'}
+
+# Per request: None (primary only), or a dict with the chosen replica and whether it wrote
+_request_state = contextvars.ContextVar('replica_request_state', default=None)
+# alias -> time.monotonic() before which it is not tried again
+_unhealthy = {}
+
+
+def config(name, default=None):
+    return getattr(settings, 'REPLICAS', {}).get(name, default)
+
+
+def replica_aliases():
+    return [alias for alias in config('ALIASES', []) if alias in settings.DATABASES]
+
+
+def mark_unhealthy(alias):
+    _unhealthy[alias] = time.monotonic() + config('RETRY_SECONDS', 30)
+    logger.warning('Replica %s is unavailable; reading from the primary for %ss', alias, config('RETRY_SECONDS', 30))
+
+
+def healthy(alias):
+    retry_at = _unhealthy.get(alias)
+    if retry_at is not None and time.monotonic() < retry_at:
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        mark_unhealthy(alias)
+        return False
+    _unhealthy.pop(alias, None)
+    return True
+
+
+def pick_replica():
+    """A healthy replica, or None for the primary."""
+    aliases = replica_aliases()
+    random.shuffle(aliases)
+    return next((alias for alias in aliases if healthy(alias)), None)
+
+
+def begin(use_replica):
+    """Start routing for one request; returns the token for end()."""
+    return _request_state.set({'replica': None, 'pending': use_replica, 'wrote': False})
+
+
+def end(token):
+    state = _request_state.get()
+    _request_state.reset(token)
+    return bool(state and state['wrote'])
+
+
+def read_alias():
+    """Where this request's reads go right now."""
+    state = _request_state.get()
+    if state is None or not state['pending'] or state['wrote']:
+        return DEFAULT_DB_ALIAS
+    if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return DEFAULT_DB_ALIAS
+    if state['replica'] is None:
+        # Chosen on first read, then kept for the rest of the request
+        state['replica'] = pick_replica() or DEFAULT_DB_ALIAS
+    return state['replica']
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APPS:
+            return DEFAULT_DB_ALIAS
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            # Everything after the first write reads from the primary, and so will the next few requests
+            state['wrote'] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary
+        if db in config('ALIASES', []):
+            return False
+        return None
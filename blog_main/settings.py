@@ -12,14 +12,20 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 
 from pathlib import Path
 import os
+import sys
 import dj_database_url
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
 
+from blog_main import auth_cache, sqlite_profile
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# `manage.py test`: local-memory caches, a throwaway replica and no load shedding, so runs cannot leak into each other
+TESTING = sys.argv[1:2] == ['test']
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
@@ -60,10 +66,13 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'blog_main.middleware.QueryInspectorMiddleware',
+    'blog_main.middleware.ReplicaPinningMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'blog_main.middleware.AdmissionControlMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -80,7 +89,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
-                'blogs.context_processors.get_social_links',  
+                'blogs.context_processors.site_chrome',
             ],
         },
     },
@@ -102,6 +111,126 @@ DATABASES = {
     )
 }
 
+# Read replicas: DATABASE_REPLICA_URLS is a comma-separated list of database
+# URLs, added as replica1, replica2, ... Safe requests read from them unless
+# the visitor wrote in the last PIN_SECONDS (see blog_main/replicas.py).
+# Locally, two SQLite files will do: DATABASE_REPLICA_URLS=sqlite:///replica.sqlite3
+# plus `manage.py sync_replica` to copy the primary across.
+REPLICAS = {
+    'ALIASES': [],
+    'PIN_SECONDS': int(os.environ.get('REPLICA_PIN_SECONDS', 10)),
+    'RETRY_SECONDS': int(os.environ.get('REPLICA_RETRY_SECONDS', 30)),
+    'COOKIE': 'pin_primary',
+}
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), start=1):
+    alias = f'replica{number}'
+    DATABASES[alias] = dj_database_url.parse(url.strip(), conn_max_age=600, conn_health_checks=True)
+    # Tests run against the primary's test database
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    REPLICAS['ALIASES'].append(alias)
+if TESTING:
+    # Tests read from the primary; the routing tests list this separate,
+    # empty replica in REPLICAS themselves (see blog_main/tests.py).
+    REPLICAS['ALIASES'] = []
+    DATABASES = {
+        'default': DATABASES['default'],
+        'replica1': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': BASE_DIR / 'replica.sqlite3'},
+    }
+DATABASE_ROUTERS = ['blog_main.replicas.ReplicaRouter']
+
+# Opt-in SQLite production profile: WAL, synchronous=NORMAL, mmap, a larger
+# page cache, a busy timeout and BEGIN IMMEDIATE (see blog_main/sqlite_profile.py)
+SQLITE_TUNED = os.environ.get('SQLITE_TUNED', 'False') == 'True'
+if SQLITE_TUNED:
+    sqlite_profile.apply(DATABASES)
+
+
+# Cache
+# File-based by default so every gunicorn worker on the host shares one cache;
+# point CACHE_BACKEND/CACHE_LOCATION at memcached or redis for multi-host setups.
+# Two aliases, so that culling one never evicts the other:
+#   default  version stamps, feed fragments, image manifests, rate limits and
+#            cached users: small, long-lived entries the site relies on
+#   pages    anonymous page bodies: large and disposable, a cull only costs misses
+# The file cache culls a random share of entries once MAX_ENTRIES is reached.
+CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache')
+CACHE_LOCATION = os.environ.get('CACHE_LOCATION', os.path.join(BASE_DIR, '.cache'))
+# Only the file and local-memory backends take MAX_ENTRIES; memcached and redis evict on their own
+BOUNDED_CACHE = CACHE_BACKEND.endswith(('FileBasedCache', 'LocMemCache'))
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': CACHE_LOCATION,
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('CACHE_MAX_ENTRIES', 50000))} if BOUNDED_CACHE else {},
+    },
+    'pages': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.environ.get(
+            'PAGE_CACHE_LOCATION',
+            os.path.join(CACHE_LOCATION, 'pages') if CACHE_BACKEND.endswith('FileBasedCache') else CACHE_LOCATION,
+        ),
+        'KEY_PREFIX': 'pages',
+        'OPTIONS': {'MAX_ENTRIES': int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', 5000))} if BOUNDED_CACHE else {},
+    },
+}
+if TESTING:
+    CACHES = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+        for alias in CACHES
+    }
+
+# Anonymous full-page cache (see blogs/page_cache.py). STATS counts hits and
+# misses for pagecache_stats: a cache write per request, and only approximate
+# on the file cache, whose incr() is not atomic across workers.
+PAGE_CACHE = {
+    'ENABLED': os.environ.get('PAGE_CACHE', 'True') == 'True',
+    'TIMEOUT': int(os.environ.get('PAGE_CACHE_TIMEOUT', 600)),
+    'CACHE': 'pages',
+    'STATS': os.environ.get('PAGE_CACHE_STATS', 'False') == 'True',
+}
+
+# RSS/Atom feeds and sitemap (see blogs/feeds.py)
+FEEDS = {
+    'ITEMS': 20,
+    'MAX_AGE': int(os.environ.get('FEEDS_MAX_AGE', 300)),
+    'SITEMAP_SECTION_SIZE': 5000,
+}
+
+# Opt-in load shedding for the expensive routes (see blog_main/admission.py).
+# Per url name: methods (default all), concurrency (in flight across all
+# workers, beyond it 503) and per_ip / per_user (requests, seconds) token
+# buckets, beyond them 429. Behind a proxy, set ADMISSION_CLIENT_IP_HEADER
+# (e.g. HTTP_X_FORWARDED_FOR) or every visitor shares the proxy's bucket.
+ADMISSION = {
+    'ENABLED': os.environ.get('ADMISSION_CONTROL', 'False') == 'True' and not TESTING,
+    'CACHE': 'default',
+    'CLIENT_IP_HEADER': os.environ.get('ADMISSION_CLIENT_IP_HEADER') or None,
+    'RETRY_AFTER': 2,
+    'ROUTES': {
+        'search': {'concurrency': 8, 'per_ip': (30, 60)},
+        'blogs': {'methods': ['POST'], 'concurrency': 4, 'per_ip': (20, 60), 'per_user': (10, 60)},
+        # PBKDF2 costs a few hundred milliseconds of CPU per attempt
+        'login': {'methods': ['POST'], 'concurrency': 2, 'per_ip': (10, 60)},
+        'register': {'methods': ['POST'], 'concurrency': 2, 'per_ip': (5, 300)},
+    },
+}
+
+# Session/auth fast path (see blog_main/auth_cache.py): cache-backed sessions,
+# the logged-in User cached between requests, cookie messages and no session
+# for anonymous GETs. AUTH_SESSION_ENGINE may name the signed_cookies engine.
+AUTH_FAST_PATH = {
+    'ENABLED': os.environ.get('AUTH_FAST_PATH', 'False') == 'True',
+    'CACHE': 'default',
+    'TIMEOUT': int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 300)),
+    'SESSION_ENGINE': os.environ.get('AUTH_SESSION_ENGINE', 'django.contrib.sessions.backends.cached_db'),
+}
+if AUTH_FAST_PATH['ENABLED']:
+    fast_path = auth_cache.fast_path_settings(MIDDLEWARE, AUTH_FAST_PATH['SESSION_ENGINE'])
+    SESSION_ENGINE = fast_path['SESSION_ENGINE']
+    MESSAGE_STORAGE = fast_path['MESSAGE_STORAGE']
+    AUTHENTICATION_BACKENDS = fast_path['AUTHENTICATION_BACKENDS']
+    MIDDLEWARE = fast_path['MIDDLEWARE']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -145,12 +274,63 @@ STATICFILES_DIRS = []
 if os.path.exists(os.path.join(BASE_DIR, 'static')):
     STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
-# WhiteNoise configuration
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-
-# Media files (Cloudinary)
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+# Media files: Cloudinary when it is configured, the local media/ folder otherwise
+STORAGES = {
+    'default': {
+        'BACKEND': (
+            'cloudinary_storage.storage.MediaCloudinaryStorage'
+            if os.environ.get('CLOUDINARY_CLOUD_NAME')
+            else 'django.core.files.storage.FileSystemStorage'
+        ),
+    },
+    'staticfiles': {
+        # WhiteNoise serves these with hashed names, gzip/brotli copies and
+        # immutable caching (see blog_main/storage.py)
+        'BACKEND': 'blog_main.storage.StaticFilesStorage',
+    },
+}
 MEDIA_URL = '/media/'
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', BASE_DIR / 'media')
+# Browser cache lifetime for uploads served from MEDIA_ROOT (blog_main/media.py).
+# Content-addressed image variants are always cached as immutable.
+MEDIA_CACHE_MAX_AGE = int(os.environ.get('MEDIA_CACHE_MAX_AGE', 60 * 60 * 24))
+
+# Resized renditions of feature images for srcset (see blogs/images.py)
+IMAGE_VARIANTS = {
+    'WIDTHS': [320, 640, 960, 1600],
+    'FORMATS': ['webp', 'jpeg'],
+    'QUALITY': int(os.environ.get('IMAGE_VARIANT_QUALITY', 80)),
+    'PREFIX': 'variants',
+}
+
+# Listings
+BLOG_POSTS_PER_PAGE = int(os.environ.get('BLOG_POSTS_PER_PAGE', 10))
+BLOG_FEATURED_POSTS = int(os.environ.get('BLOG_FEATURED_POSTS', 5))
+BLOG_COMMENTS_PER_PAGE = int(os.environ.get('BLOG_COMMENTS_PER_PAGE', 20))
+
+# Serve the public read views with async views (blogs/async_views.py).
+# Only worth it under an ASGI server; see blog_main/asgi.py.
+ASYNC_READ_VIEWS = os.environ.get('ASYNC_READ_VIEWS', 'False') == 'True'
+
+# Per-request query counting and N+1 detection (see blog_main/middleware.py).
+# STRICT turns a blown budget into an exception so tests fail on regressions.
+QUERY_INSPECTOR = {
+    'ENABLED': os.environ.get('QUERY_INSPECTOR', str(DEBUG)) == 'True',
+    'STRICT': os.environ.get('QUERY_INSPECTOR_STRICT', 'False') == 'True',
+    'DUPLICATE_THRESHOLD': 3,
+    'DEFAULT_BUDGET': None,
+    # url_name -> max queries per request
+    'BUDGETS': {
+        'home': 10,
+        'blogs': 10,
+        'posts_by_category': 10,
+        'search': 10,
+        'categories_list': 10,
+        'dashboard': 15,
+        'posts': 15,
+        'users_list': 10,
+    },
+}
 
 
 # Production security settings
@@ -0,0 +1,52 @@
+"""
+The opt-in SQLite production profile (SQLITE_TUNED=True in the environment).
+
+Stock SQLite suits one process at a time. Under several gunicorn workers
+the rollback journal makes every reader wait for a writer and every writer
+wait for the readers, and a lock that outlasts the 5 second default
+surfaces as "database is locked". The profile applies, per connection:
+
+* journal_mode=WAL: readers keep reading the last committed snapshot while
+  one writer appends, so page views no longer stall behind comment posts;
+* synchronous=NORMAL: with WAL, fsync at checkpoints rather than every
+  commit; a power cut can lose the last commits but never corrupts;
+* mmap_size and cache_size: hot pages are read from memory shared with
+  the OS page cache instead of copied through read() calls;
+* a busy timeout, so a writer queues for the lock instead of failing;
+* BEGIN IMMEDIATE for transaction.atomic(): the write lock is taken when
+  the transaction starts. A deferred transaction that reads first and
+  then tries to write cannot wait for the lock (that would deadlock), so
+  SQLite fails it at once whatever the busy timeout.
+
+``manage.py bench_sqlite`` measures reader and writer throughput with and
+without it.
+"""
+import os
+
+MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+CACHE_SIZE_KIB = int(os.environ.get('SQLITE_CACHE_SIZE_KIB', 64 * 1024))
+BUSY_TIMEOUT_S = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))
+
+
+def tuned_options(mmap_size=MMAP_SIZE, cache_size_kib=CACHE_SIZE_KIB, busy_timeout=BUSY_TIMEOUT_S):
+    """OPTIONS for a django.db.backends.sqlite3 DATABASES entry."""
+    pragmas = [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA mmap_size={mmap_size}',
+        # Negative means KiB rather than pages
+        f'PRAGMA cache_size=-{cache_size_kib}',
+    ]
+    return {
+        'init_command': ';'.join(pragmas),
+        'transaction_mode': 'IMMEDIATE',
+        # Passed to sqlite3.connect(), which installs it as the busy timeout
+        'timeout': busy_timeout,
+    }
+
+
+def apply(databases):
+    """Add the profile to every SQLite entry in a DATABASES dict."""
+    for database in databases.values():
+        if database.get('ENGINE') == 'django.db.backends.sqlite3':
+            database['OPTIONS'] = {**database.get('OPTIONS', {}), **tuned_options()}
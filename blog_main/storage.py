@@ -0,0 +1,21 @@
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+
+class StaticFilesStorage(CompressedManifestStaticFilesStorage):
+    """
+    WhiteNoise's hashed, gzip/brotli-compressed static files.
+
+    Before collectstatic has run there is nothing to hash, so instead of
+    failing every page a file that has not been collected is linked by its
+    plain name.
+    """
+
+    manifest_strict = False
+
+    def hashed_name(self, name, content=None, filename=None):
+        try:
+            return super().hashed_name(name, content, filename)
+        except ValueError:
+            if content is not None:
+                raise
+            return name
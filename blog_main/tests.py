@@ -0,0 +1,428 @@
+import os
+import shutil
+import tempfile
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import http_date
+
+from blogs.models import Blog, Category
+
+from . import admission, auth_cache, replicas, sqlite_profile
+from .media import serve_media
+from .middleware import QueryBudgetExceeded, QueryInspectorMiddleware, ReplicaPinningMiddleware, normalize_sql
+
+CONTENT = bytes(range(100))
+
+
+class MediaRangeTests(SimpleTestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(MEDIA_ROOT=media)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.path = os.path.join(media, 'clip.bin')
+        with open(self.path, 'wb') as output:
+            output.write(CONTENT)
+
+    def get(self, **headers):
+        response = serve_media(RequestFactory().get('/media/clip.bin', headers=headers), 'clip.bin')
+        self.addCleanup(response.close)
+        return response
+
+    def body(self, response):
+        return b''.join(response.streaming_content) if response.streaming else response.content
+
+    def assertPartial(self, response, start, end):
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{len(CONTENT)}')
+        self.assertEqual(response['Content-Length'], str(end - start + 1))
+        self.assertEqual(self.body(response), CONTENT[start:end + 1])
+
+    def assertWhole(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(self.body(response), CONTENT)
+
+    def test_no_range(self):
+        self.assertWhole(self.get())
+
+    def test_single_ranges(self):
+        for header, (start, end) in (
+            ('bytes=10-19', (10, 19)),
+            ('bytes=90-', (90, 99)),
+            # An end past the file is cut to its last byte
+            ('bytes=95-500', (95, 99)),
+        ):
+            with self.subTest(range=header):
+                self.assertPartial(self.get(Range=header), start, end)
+
+    def test_suffix_ranges(self):
+        self.assertPartial(self.get(Range='bytes=-5'), 95, 99)
+        # Longer than the file: all of it, still as a range
+        self.assertPartial(self.get(Range='bytes=-500'), 0, 99)
+
+    def test_unsatisfiable_ranges(self):
+        for header in ('bytes=100-', 'bytes=500-600', 'bytes=-0'):
+            with self.subTest(range=header):
+                response = self.get(Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{len(CONTENT)}')
+
+    def test_ignored_ranges_send_the_whole_file(self):
+        for header in ('bytes=0-4,10-14', 'bytes=20-10', 'items=0-4', 'bytes=-'):
+            with self.subTest(range=header):
+                self.assertWhole(self.get(Range=header))
+
+    def test_if_range(self):
+        etag = self.get()['ETag']
+        modified = http_date(int(os.stat(self.path).st_mtime))
+        self.assertPartial(self.get(Range='bytes=0-9', If_Range=etag), 0, 9)
+        self.assertPartial(self.get(Range='bytes=0-9', If_Range=modified), 0, 9)
+        # The file changed since the client's copy: the whole new file, not a piece of it
+        self.assertWhole(self.get(Range='bytes=0-9', If_Range='"stale"'))
+        self.assertWhole(self.get(Range='bytes=0-9', If_Range=http_date(0)))
+
+
+class ReplicaTestCase(TransactionTestCase):
+    # Not TestCase: its transaction on the primary would keep every read there
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        # Not a class decorator: the flush after each test skips tables the
+        # router won't migrate, so it must run once replica1 is unlisted again
+        settings_override = override_settings(REPLICAS={
+            'ALIASES': ['replica1'], 'PIN_SECONDS': 10, 'RETRY_SECONDS': 30, 'COOKIE': 'pin_primary',
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(replicas._unhealthy.clear)
+        # Only the replica has it, so reading it proves where a query went
+        Category.objects.using('replica1').create(category_name='Replicated')
+
+
+class ReplicaRoutingTests(ReplicaTestCase):
+
+    def names(self):
+        return list(Category.objects.values_list('category_name', flat=True))
+
+    def test_reads_go_to_the_replica(self):
+        token = replicas.begin(True)
+        try:
+            self.assertEqual(self.names(), ['Replicated'])
+            # Sessions stay on the primary even in a read-only request
+            self.assertEqual(Session.objects.all().db, DEFAULT_DB_ALIAS)
+        finally:
+            self.assertFalse(replicas.end(token))
+        # Outside a request, and in unsafe ones, reads use the primary
+        self.assertEqual(self.names(), [])
+        token = replicas.begin(False)
+        try:
+            self.assertEqual(self.names(), [])
+        finally:
+            replicas.end(token)
+
+    def test_writes_go_to_the_primary(self):
+        token = replicas.begin(True)
+        try:
+            Category.objects.create(category_name='Written')
+            # Having written, the request reads its own write from the primary
+            self.assertEqual(self.names(), ['Written'])
+        finally:
+            self.assertTrue(replicas.end(token))
+        self.assertEqual(list(Category.objects.using('replica1').values_list('category_name', flat=True)), ['Replicated'])
+
+    def test_unreachable_replica_falls_back_to_the_primary(self):
+        with mock.patch.object(connections['replica1'], 'ensure_connection', side_effect=OperationalError):
+            token = replicas.begin(True)
+            try:
+                with self.assertLogs('blog_main.replicas', 'WARNING'):
+                    self.assertEqual(self.names(), [])
+            finally:
+                replicas.end(token)
+        self.assertFalse(replicas.healthy('replica1'))
+
+
+class ReplicaPinningTests(ReplicaTestCase):
+
+    def view(self, request):
+        self.read_from = list(Category.objects.values_list('category_name', flat=True))
+        if request.method == 'POST' or 'write' in request.GET:
+            Category.objects.create(category_name='Written')
+        return HttpResponse()
+
+    def request(self, method='get', path='/', cookies=None):
+        request = getattr(RequestFactory(), method)(path)
+        request.COOKIES.update(cookies or {})
+        return ReplicaPinningMiddleware(self.view)(request)
+
+    def test_read_only_request_uses_the_replica_and_is_not_pinned(self):
+        response = self.request()
+        self.assertEqual(self.read_from, ['Replicated'])
+        self.assertNotIn('pin_primary', response.cookies)
+
+    def test_writing_pins_the_session_to_the_primary(self):
+        response = self.request('post')
+        self.assertEqual(self.read_from, [])
+        cookie = response.cookies['pin_primary']
+        self.assertEqual(cookie['max-age'], 10)
+        # The writer's next page reads the primary and sees what they wrote
+        self.request(cookies={'pin_primary': cookie.value})
+        self.assertEqual(self.read_from, ['Written'])
+        # Everyone else still reads the replica
+        self.request()
+        self.assertEqual(self.read_from, ['Replicated'])
+
+    def test_safe_request_that_writes_is_pinned_too(self):
+        self.assertIn('pin_primary', self.request(path='/?write=1').cookies)
+
+    def test_disabled_without_replicas(self):
+        with override_settings(REPLICAS={'ALIASES': []}):
+            with self.assertRaises(MiddlewareNotUsed):
+                ReplicaPinningMiddleware(self.view)
+
+
+ADMISSION = {
+    'ENABLED': True,
+    'CACHE': 'default',
+    'RETRY_AFTER': 2,
+    'ROUTES': {
+        'register': {'methods': ['POST'], 'per_ip': (2, 60)},
+        'login': {'methods': ['POST'], 'concurrency': 1},
+    },
+}
+
+
+@override_settings(ADMISSION=ADMISSION)
+class AdmissionTests(TestCase):
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+
+    def test_token_bucket(self):
+        # Two requests per two seconds: a full bucket admits two at once, then one a second
+        self.assertEqual([admission.take_token('bucket', 2, 2, now=100) for _ in range(3)], [0, 0, 1.0])
+        self.assertEqual(admission.take_token('bucket', 2, 2, now=100.5), 0.5)
+        self.assertEqual(admission.take_token('bucket', 2, 2, now=101), 0)
+        self.assertEqual(admission.take_token('bucket', 2, 2, now=101.5), 0.5)
+        # Idle for a while, the bucket is full again but never fuller
+        self.assertEqual([admission.take_token('bucket', 2, 2, now=200) for _ in range(3)], [0, 0, 1.0])
+
+    def test_rate_limit_answers_429_with_retry_after(self):
+        for _ in range(2):
+            self.assertNotEqual(self.client.post('/register/').status_code, 429)
+        response = self.client.post('/register/')
+        self.assertEqual(response.status_code, 429)
+        self.assertGreaterEqual(int(response['Retry-After']), 29)
+        self.assertEqual(response['Cache-Control'], 'no-store')
+        # Another address has a bucket of its own, and GETs are not limited
+        self.assertNotEqual(self.client.post('/register/', REMOTE_ADDR='10.0.0.2').status_code, 429)
+        self.assertEqual(self.client.get('/register/').status_code, 200)
+        self.assertEqual(admission.stats()['register']['rate_limited'], 1)
+
+    def test_concurrency_limit_answers_503(self):
+        held = admission.acquire_slot('login', 1)
+        with self.assertLogs('blog_main.admission', 'WARNING'):
+            response = self.client.post('/login/')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+        admission.release_slot(held)
+        self.assertNotEqual(self.client.post('/login/').status_code, 503)
+        # The admitted request gave its slot back
+        self.assertEqual(admission.stats()['login']['in_flight'], 0)
+
+    def test_disabled(self):
+        with override_settings(ADMISSION={**ADMISSION, 'ENABLED': False}):
+            for _ in range(3):
+                self.assertNotEqual(self.client.post('/register/').status_code, 429)
+
+
+@override_settings(
+    AUTH_FAST_PATH={'ENABLED': True, 'CACHE': 'default', 'TIMEOUT': 300},
+    **auth_cache.fast_path_settings(settings.MIDDLEWARE),
+)
+class AuthFastPathTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cached', 'cached@example.com', 'old password')
+        cls.manager = User.objects.create_superuser('manager', 'manager@example.com', 'pw')
+
+    def setUp(self):
+        self.addCleanup(cache.clear)
+        self.client.login(username='cached', password='old password')
+
+    def logged_in(self, client=None):
+        response = (client or self.client).get('/dashboard/')
+        return response.status_code == 200
+
+    def test_user_is_cached_between_requests(self):
+        self.assertTrue(self.logged_in())
+        self.assertEqual(auth_cache.get(self.user.pk), self.user)
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as queries:
+            self.assertTrue(self.logged_in())
+        self.assertFalse([query for query in queries if 'FROM "auth_user" WHERE "auth_user"."id"' in query['sql']])
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.assertTrue(self.logged_in())
+        self.user.set_password('new password')
+        self.user.save()
+        self.assertIsNone(auth_cache.get(self.user.pk))
+        # A stale cached copy would still carry the old hash and keep this session alive
+        self.assertFalse(self.logged_in())
+
+    def test_deactivation_logs_out(self):
+        self.assertTrue(self.logged_in())
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(auth_cache.get(self.user.pk))
+        self.assertFalse(self.logged_in())
+
+    def test_bulk_deactivation_logs_out(self):
+        self.assertTrue(self.logged_in())
+        manager = self.client_class()
+        manager.force_login(self.manager)
+        manager.post('/dashboard/users/bulk/', {'action': 'deactivate', 'user_ids': [self.user.pk]})
+        self.assertIsNone(auth_cache.get(self.user.pk))
+        self.assertFalse(self.logged_in())
+
+    def test_logout(self):
+        self.assertTrue(self.logged_in())
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.post('/logout/')
+        self.assertIsNone(auth_cache.get(self.user.pk))
+        # The old session cookie no longer signs anyone in
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        self.assertFalse(self.logged_in())
+
+    def test_anonymous_get_starts_no_session(self):
+        self.client.logout()
+        response = self.client.get('/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, response.cookies)
+        self.assertFalse(Session.objects.exists())
+
+
+INSPECTOR = {'ENABLED': True, 'STRICT': False, 'DUPLICATE_THRESHOLD': 3, 'DEFAULT_BUDGET': None, 'BUDGETS': {'listing': 3}}
+
+
+@override_settings(QUERY_INSPECTOR=INSPECTOR)
+class QueryInspectorTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(category_name='Inspected')
+        for n in range(4):
+            author = User.objects.create_user(f'inspected{n}', f'inspected{n}@example.com', 'pw')
+            Blog.objects.create(
+                title=f'Post {n}', slug=f'inspected-{n}', category=category, author=author,
+                short_description='short', blog_body='body', status='Published',
+            )
+
+    def n_plus_one(self, request):
+        # One query for the posts, then one per author
+        return HttpResponse(', '.join(post.author.username for post in Blog.objects.order_by('pk')))
+
+    def joined(self, request):
+        return HttpResponse(', '.join(post.author.username for post in Blog.objects.select_related('author')))
+
+    def request(self, view, url_name='listing'):
+        request = RequestFactory().get('/')
+        request.resolver_match = SimpleNamespace(url_name=url_name)
+        return QueryInspectorMiddleware(view)(request)
+
+    def test_normalize_sql(self):
+        self.assertEqual(
+            normalize_sql("SELECT *  FROM t\n WHERE id IN (%s, %s, %s) AND name = 'O''Brien' AND n > 10"),
+            'SELECT * FROM t WHERE id IN (...) AND name = ? AND n > ?',
+        )
+        self.assertEqual(normalize_sql('WHERE id IN (%s)'), normalize_sql('WHERE id IN (%s, %s)'))
+
+    def test_headers_and_duplicates(self):
+        with self.assertLogs('blog_main.queries', 'WARNING') as logs:
+            response = self.request(self.n_plus_one)
+        self.assertEqual(response['X-DB-Query-Count'], '5')
+        # Four lookups of one shape: three beyond the first
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '3')
+        self.assertGreaterEqual(float(response['X-DB-Query-Time-Ms']), 0)
+        self.assertIn('4 x SELECT', logs.output[0])
+        self.assertIn('blog_main/tests.py:', logs.output[0])
+        # Over the budget of 3, logged but not raised
+        self.assertIn('ran 5 queries (budget 3)', logs.output[-1])
+
+    def test_no_duplicates_when_joined(self):
+        with self.assertNoLogs('blog_main.queries', 'WARNING'):
+            response = self.request(self.joined)
+        self.assertEqual(response['X-DB-Query-Count'], '1')
+        self.assertEqual(response['X-DB-Duplicate-Queries'], '0')
+
+    def test_strict_budget(self):
+        with override_settings(QUERY_INSPECTOR={**INSPECTOR, 'STRICT': True}):
+            with self.assertLogs('blog_main.queries', 'WARNING'), self.assertRaises(QueryBudgetExceeded):
+                self.request(self.n_plus_one)
+            # Routes without a budget are only counted
+            with self.assertLogs('blog_main.queries', 'WARNING') as logs:
+                self.assertEqual(self.request(self.n_plus_one, url_name='unbudgeted')['X-DB-Query-Count'], '5')
+            self.assertNotIn('budget', logs.output[-1])
+
+    def test_disabled(self):
+        with override_settings(QUERY_INSPECTOR={'ENABLED': False}):
+            with self.assertRaises(MiddlewareNotUsed):
+                QueryInspectorMiddleware(self.joined)
+
+
+class SQLiteProfileTests(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'profile.sqlite3')
+
+    def databases_dict(self):
+        return {
+            'default': {**connections.settings[DEFAULT_DB_ALIAS], 'NAME': self.path, 'OPTIONS': {}},
+            'other': {'ENGINE': 'django.db.backends.postgresql', 'NAME': 'blog'},
+        }
+
+    def pragmas(self, settings_dict):
+        # A fresh connection, so init_command and the timeout run as in a new worker
+        connection = DatabaseWrapper(settings_dict, alias='profile')
+        self.addCleanup(connection.close)
+        with connection.cursor() as cursor:
+            return {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size')
+            }
+
+    def test_default_profile_unchanged(self):
+        pragmas = self.pragmas(self.databases_dict()['default'])
+        self.assertEqual(pragmas['journal_mode'], 'delete')
+        # FULL, and sqlite3.connect()'s 5 second timeout
+        self.assertEqual(pragmas['synchronous'], 2)
+        self.assertEqual(pragmas['busy_timeout'], 5000)
+        self.assertEqual(pragmas['mmap_size'], 0)
+
+    def test_tuned_profile(self):
+        databases = self.databases_dict()
+        sqlite_profile.apply(databases)
+        self.assertNotIn('OPTIONS', databases['other'])
+        self.assertEqual(databases['default']['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        pragmas = self.pragmas(databases['default'])
+        self.assertEqual(pragmas['journal_mode'], 'wal')
+        # NORMAL
+        self.assertEqual(pragmas['synchronous'], 1)
+        self.assertEqual(pragmas['busy_timeout'], int(sqlite_profile.BUSY_TIMEOUT_S * 1000))
+        self.assertEqual(pragmas['mmap_size'], sqlite_profile.MMAP_SIZE)
+        self.assertEqual(pragmas['cache_size'], -sqlite_profile.CACHE_SIZE_KIB)
@@ -18,33 +18,48 @@ from django.contrib import admin
 from django.urls import include, path
 from django.conf import settings
 from django.conf.urls.static import static
-from django.views.static import serve
 from django.urls import re_path
 from blog_main import views as main_views
+from blog_main.media import serve_media
+from blogs import async_views, feeds
 from blogs import views as blog_views
 
-urlpatterns = [
-    path('admin/', admin.site.urls),
-    path('', main_views.home, name='home'),
-    path('category/<int:category_id>/', blog_views.posts_by_category, name='posts_by_category'),
-    
-    # Static and Media
-    re_path(r'^static/(?P<path>.*)$', serve, {'document_root': settings.STATIC_ROOT}),
-    re_path(r'^media/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
-    
-    # Search
-    path('search/', blog_views.search, name='search'),
-    path('categories/', blog_views.categories_list, name='categories_list'),
-    
-    # Authentication - BEFORE slug pattern!
-    path('register/', main_views.register, name='register'),
-    path('login/', main_views.user_login, name='login'),
-    path('logout/', main_views.user_logout, name='logout'),
-    path('dashboard/', include('dashboards.urls')),
-    
-    # Comments
-    path('delete-comment/<int:comment_id>/', blog_views.delete_comment, name='delete_comment'),
-    
-    # Slug pattern LAST
-    path('<slug:slug>/', blog_views.blogs, name='blogs'),
-]
\ No newline at end of file
+def build_urlpatterns(async_reads=False):
+    # Public read views run async under ASGI when ASYNC_READ_VIEWS is on
+    reads = async_views if async_reads else blog_views
+    home = async_views.home if async_reads else main_views.home
+
+    return [
+        path('admin/', admin.site.urls),
+        path('', home, name='home'),
+        path('category/<int:category_id>/', reads.posts_by_category, name='posts_by_category'),
+        
+        # Media; static files are served by WhiteNoise
+        re_path(r'^media/(?P<path>.*)$', serve_media),
+        
+        # Feeds and sitemap
+        path('feeds/<str:fmt>.xml', feeds.latest_feed, name='feed'),
+        path('feeds/category/<int:category_id>/<str:fmt>.xml', feeds.category_feed, name='category_feed'),
+        path('sitemap.xml', feeds.sitemap_index, name='sitemap'),
+        path('sitemap-<int:section>.xml', feeds.sitemap_section, name='sitemap_section'),
+        
+        # Search
+        path('search/', reads.search, name='search'),
+        path('categories/', reads.categories_list, name='categories_list'),
+        
+        # Authentication - BEFORE slug pattern!
+        path('register/', main_views.register, name='register'),
+        path('login/', main_views.user_login, name='login'),
+        path('logout/', main_views.user_logout, name='logout'),
+        path('dashboard/', include('dashboards.urls')),
+        
+        # Comments
+        path('delete-comment/<int:comment_id>/', blog_views.delete_comment, name='delete_comment'),
+        
+        path('<slug:slug>/comments/', blog_views.comments_page, name='blog_comments'),
+        
+        # Slug pattern LAST
+        path('<slug:slug>/', reads.blogs, name='blogs'),
+    ]
+
+urlpatterns = build_urlpatterns(settings.ASYNC_READ_VIEWS)
@@ -1,28 +1,30 @@
+from django.conf import settings
 from django.shortcuts import render
 
-from blogs.models import Blog, Category
-from assignments.models import About
+from blogs.models import Blog
+from blogs.conditional import conditional_page, window_state
+from blogs.page_cache import cache_anonymous_page
+from blogs.pagination import keyset_window, paginate_keyset
 from .forms import RegisterationForm
 
+def featured_posts_window():
+    return Blog.objects.featured().summaries().order_by('-created_at')[:settings.BLOG_FEATURED_POSTS]
+
+def home_state(request):
+    window, _ = keyset_window(request, Blog.objects.published())
+    return window_state(window, featured_posts_window())
+
+@conditional_page(home_state)
+@cache_anonymous_page('posts')
 def home(request):
-    categories = Category.objects.all()
-    featured_posts = Blog.objects.filter(is_featured=True, status="Published")
-    posts = Blog.objects.filter(status="Published")
-    
-    # Fetch About Us
-    try:
-        about = About.objects.first()  # Use .first() instead of .get()
-    except:
-        about = None
+    featured_posts = featured_posts_window()
+    posts = paginate_keyset(request, Blog.objects.published().summaries())
 
-    #Fetch Social Media
-    
-    
+    # Categories, About Us and Social Media come from the site_chrome context processor
     context = {
-        'categories': categories,
         'featured_posts': featured_posts,
         'posts': posts,
-        'about': about,  # lowercase 'about'
+        'page': posts,
     }
     return render(request, 'home.html', context)
 
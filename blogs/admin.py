@@ -1,13 +1,30 @@
+from django import forms
 from django.contrib import admin
 from .models import Category, Blog, Comment
+from .slugs import allocate_slug, save_with_unique_slug
+
+
+class BlogAdminForm(forms.ModelForm):
+    class Meta:
+        model = Blog
+        fields = '__all__'
+
+    def clean_slug(self):
+        # The prepopulated slug is only a suggestion; swap a taken one for the next free suffix
+        slug = self.cleaned_data.get('slug') or self.cleaned_data.get('title') or ''
+        return allocate_slug(slug, exclude_pk=self.instance.pk)
 
 
 class BlogAdmin(admin.ModelAdmin):
+    form = BlogAdminForm
     prepopulated_fields = {'slug': ('title',)}
     list_display = ('title', 'category', 'author', 'status', 'is_featured')
     search_fields = ('id', 'title', 'category__category_name')
     list_editable = ('is_featured',)
 
+    def save_model(self, request, obj, form, change):
+        save_with_unique_slug(obj, source=obj.slug)
+
 class CommentAdmin(admin.ModelAdmin):
     list_display = ('user', 'blog', 'comment', 'created_at')
     list_filter = ('created_at',)
@@ -0,0 +1,89 @@
+"""
+Async versions of the public read views.
+
+Served instead of the sync views when ASYNC_READ_VIEWS is on and the site
+runs under an ASGI server (see blog_main/asgi.py). They fetch with the async
+ORM, so a worker keeps serving other readers while a query is in flight, and
+share validators, page cache, pagination and templates with the sync views.
+Template rendering still runs in a worker thread because the context
+processors and ``request.user`` use the sync ORM.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.shortcuts import aget_object_or_404, render
+
+from blog_main.views import featured_posts_window, home_state
+from . import views
+from .conditional import categories_state, conditional_page, post_state
+from .models import Blog, Category
+from .page_cache import cache_anonymous_page
+from .pagination import apaginate_keyset
+from .search import search_posts
+
+arender = sync_to_async(render)
+
+
+@conditional_page(home_state)
+@cache_anonymous_page('posts')
+async def home(request):
+    featured_posts = [post async for post in featured_posts_window()]
+    posts = await apaginate_keyset(request, Blog.objects.published().summaries())
+    context = {
+        'featured_posts': featured_posts,
+        'posts': posts,
+        'page': posts,
+    }
+    return await arender(request, 'home.html', context)
+
+
+@conditional_page(views.category_page_state)
+@cache_anonymous_page('category:{category_id}')
+async def posts_by_category(request, category_id):
+    category = await aget_object_or_404(Category, id=category_id)
+    posts = await apaginate_keyset(request, views.category_posts(category.id))
+    context = {
+        'posts': posts,
+        'page': posts,
+        'category': category,
+    }
+    return await arender(request, 'posts_by_category.html', context)
+
+
+@conditional_page(post_state)
+@cache_anonymous_page('post:{slug}')
+async def blogs(request, slug):
+    if request.method == 'POST':
+        # Posting a comment writes and sets flash messages; leave that to the sync view
+        return await sync_to_async(views.blogs)(request, slug=slug)
+
+    blog = await aget_object_or_404(Blog.objects.published().with_relations(), slug=slug)
+    comments = await apaginate_keyset(
+        request, views.blog_comments(blog), per_page=settings.BLOG_COMMENTS_PER_PAGE
+    )
+    context = {
+        'blog': blog,
+        'comments': comments,
+        'comment_count': blog.comment_count,
+    }
+    return await arender(request, 'blogs.html', context)
+
+
+async def search(request):
+    keyword, page = views.search_params(request)
+    # The search backends run raw SQL on the sync connection
+    results = await sync_to_async(search_posts)(keyword, page=page, query_params=request.GET)
+    context = {
+        'results': results,
+        'keyword': keyword,
+    }
+    return await arender(request, 'search.html', context)
+
+
+@conditional_page(categories_state)
+@cache_anonymous_page('posts')
+async def categories_list(request):
+    categories = [category async for category in Category.objects.all()]
+    context = {
+        'categories': categories,
+    }
+    return await arender(request, 'categories_list.html', context)
@@ -0,0 +1,156 @@
+"""
+Conditional GET (ETag / Last-Modified / 304) for public pages.
+
+Each page has a validator function that returns ``(last_modified, parts)``
+from one aggregate query, or None when the page does not exist. The ETag
+is a hash of those parts plus everything else that changes the HTML: the
+site chrome version, the viewer and their CSRF cookie.
+
+Deleting a comment, unpublishing a post or renaming a category leaves no
+newer row behind, so Last-Modified is the later of the newest row and the
+last bump of the page-cache stamps the page depends on (``bumped_at()``).
+"""
+import functools
+import hashlib
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from . import page_cache
+from .models import Blog, Category, Comment
+
+
+def bumped_at(*names):
+    """When the chrome stamp or any of these page-cache stamps last moved."""
+    return datetime.fromtimestamp(max(page_cache.get_versions(['chrome', *names])) / 1e9, tz=timezone.utc)
+
+
+def latest(*moments):
+    return max(filter(None, moments))
+
+
+def window_state(*windows):
+    """Validators for the union of one or more sliced listing querysets."""
+    condition = Q()
+    for window in windows:
+        condition |= Q(pk__in=window.values('pk'))
+    state = Blog.objects.filter(condition).aggregate(
+        last_modified=Max('updated_at'),
+        count=Count('pk'),
+        # Changes whenever a post enters or leaves the window
+        ids=Sum('pk'),
+    )
+    # A post leaving the window bumps 'posts' but leaves only older rows in it
+    last_modified = latest(state['last_modified'], bumped_at('posts'))
+    return last_modified, (state['last_modified'], state['count'], state['ids'])
+
+
+def categories_state(request):
+    """Validators for the categories table, including the stored post counts it shows."""
+    state = Category.objects.aggregate(
+        last_modified=Max('updated_at'),
+        count=Count('pk'),
+        posts=Sum('post_count'),
+    )
+    # Post counts change through UPDATEs that leave updated_at alone
+    last_modified = latest(state['last_modified'], bumped_at('posts'))
+    return last_modified, (state['last_modified'], state['count'], state['posts'])
+
+
+def post_state(request, slug):
+    """Validators for the post detail page: the post plus its comments, in one query."""
+    latest_comment = Comment.objects.filter(blog=OuterRef('pk')).order_by('-created_at').values('created_at')[:1]
+    row = (
+        Blog.objects.published()
+        .filter(slug=slug)
+        .annotate(last_comment=Subquery(latest_comment))
+        .values_list('updated_at', 'last_comment', 'comment_count')
+        .first()
+    )
+    if row is None:
+        return None
+    updated_at, last_comment, comment_count = row
+    return latest(updated_at, last_comment, bumped_at(f'post:{slug}')), row
+
+
+def make_etag(request, parts):
+    viewer = request.user.pk if request.user.is_authenticated else 'anon'
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    raw = '|'.join(str(p) for p in (*parts, *page_cache.get_versions(['chrome']), viewer, csrf))
+    return quote_etag(hashlib.md5(raw.encode()).hexdigest())
+
+
+def evaluate(request, validator, args, kwargs):
+    """
+    Run the page's validator against the request's preconditions.
+
+    Returns None when the view should simply run, otherwise
+    ``(headers, not_modified)`` where ``not_modified`` is a ready 304/412
+    response or None.
+    """
+    if request.method not in ('GET', 'HEAD') or len(messages.get_messages(request)):
+        return None
+
+    state = validator(request, *args, **kwargs)
+    if state is None:
+        return None
+
+    last_modified, parts = state
+    etag = make_etag(request, parts)
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    privacy = 'private' if request.user.is_authenticated else 'public'
+
+    headers = {
+        'ETag': etag,
+        'Cache-Control': f'{privacy}, max-age=0, must-revalidate',
+    }
+    if timestamp is not None:
+        headers['Last-Modified'] = http_date(timestamp)
+    return headers, get_conditional_response(request, etag=etag, last_modified=timestamp)
+
+
+def apply_validators(response, headers):
+    if response.status_code in (200, 304):
+        for header, value in headers.items():
+            response[header] = value
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def conditional_page(validator):
+    """
+    Answer GET/HEAD with 304 Not Modified when the client's copy is current.
+
+    ``validator`` receives the view's arguments. Requests with pending
+    flash messages always render, because the messages must be shown.
+    Works on both sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                evaluated = await sync_to_async(evaluate)(request, validator, args, kwargs)
+                if evaluated is None:
+                    return await view(request, *args, **kwargs)
+                headers, response = evaluated
+                if response is None:
+                    response = await view(request, *args, **kwargs)
+                return apply_validators(response, headers)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            evaluated = evaluate(request, validator, args, kwargs)
+            if evaluated is None:
+                return view(request, *args, **kwargs)
+            headers, response = evaluated
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return apply_validators(response, headers)
+        return wrapper
+    return decorator
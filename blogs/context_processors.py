@@ -1,12 +1,53 @@
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS
+
 from .models import Category
-from assignments.models import SocialLink
+from .page_cache import get_versions
+from assignments.models import About, SocialLink
+
+# Per-worker copy of the site chrome, tagged with the shared 'chrome' version
+# stamp it was loaded under. Admin edits bump the stamp (blogs.signals), so
+# every worker reloads on its next request; otherwise it costs one cache read
+# and no queries. MEMO_SECONDS bounds how long a copy that raced an edit
+# (loaded just before its commit, kept under the new stamp) can be served.
+MEMO_SECONDS = 60
+_chrome = {'version': None, 'expires': 0, 'data': None}
+_chrome_lock = threading.Lock()
+
+
+def load_chrome():
+    # From the primary: a lagging replica would be memoized under the new stamp
+    return {
+        'categories': list(Category.objects.using(DEFAULT_DB_ALIAS)),
+        'social_links': list(SocialLink.objects.using(DEFAULT_DB_ALIAS)),
+        'about': About.objects.using(DEFAULT_DB_ALIAS).first(),
+    }
+
+
+def _fresh(version):
+    return _chrome['version'] == version and time.monotonic() < _chrome['expires']
+
+
+def get_chrome():
+    version = get_versions(['chrome'])[0]
+    if not _fresh(version):
+        with _chrome_lock:
+            if not _fresh(version):
+                _chrome['data'] = load_chrome()
+                _chrome['version'] = version
+                _chrome['expires'] = time.monotonic() + MEMO_SECONDS
+    return _chrome['data']
+
+
+def site_chrome(request):
+    return dict(get_chrome())
 
 
 def get_categories(request):
-    categories = Category.objects.all()
-    return dict(categories=categories)
+    return {'categories': get_chrome()['categories']}
 
 
 def get_social_links(request):
-    social_links = SocialLink.objects.all()
-    return {'social_links': social_links} 
\ No newline at end of file
+    return {'social_links': get_chrome()['social_links']}
@@ -0,0 +1,187 @@
+"""
+Denormalized post counters on Category and AuthorStats, comment counters
+on Blog and AuthorStats, and the DailyStat rollup of posts and comments
+per day.
+
+Every change is a single ``UPDATE ... SET x = x + n`` so concurrent writers
+never lose an increment. ``recount()`` rebuilds everything from Blog in a
+handful of set-based statements when the counters drift (raw SQL, bulk
+queryset.update(), fixtures loaded with raw=True).
+"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest, TruncDate
+from django.utils import timezone
+
+from .models import AuthorStats, Blog, Category, Comment, DailyStat
+
+TRACKED_FIELDS = ('category_id', 'author_id', 'status', 'created_at')
+
+
+def snapshot(blog):
+    """The counter-relevant state of a post, or None if it is not fully loaded."""
+    if blog.pk is None or blog.get_deferred_fields() & set(TRACKED_FIELDS):
+        return None
+    return blog.category_id, blog.author_id, blog.status, day_of(blog.created_at)
+
+
+def day_of(moment):
+    # Same day boundaries as TruncDate in recount(): the current time zone
+    return timezone.localdate(moment) if moment else None
+
+
+def _shift(field, delta):
+    if delta < 0:
+        # Never go below zero even if the stored value already drifted low
+        return Greatest(F(field) + delta, Value(0))
+    return F(field) + delta
+
+
+def _upsert(model, lookup, sign, **changes):
+    # The row may not exist yet; only an increment is worth creating it for
+    if not model.objects.filter(**lookup).update(**changes) and sign > 0:
+        model.objects.get_or_create(**lookup)
+        model.objects.filter(**lookup).update(**changes)
+
+
+def _apply(category_id, author_id, published, day, sign):
+    total = _shift('post_count', sign)
+    live = _shift('published_count', sign if published else 0)
+    Category.objects.filter(pk=category_id).update(post_count=total, published_count=live)
+    _upsert(AuthorStats, {'user_id': author_id}, sign, post_count=total, published_count=live)
+    if day:
+        _upsert(
+            DailyStat, {'date': day}, sign,
+            posts=_shift('posts', sign), published=_shift('published', sign if published else 0),
+        )
+
+
+def post_added(blog):
+    _apply(blog.category_id, blog.author_id, blog.status == 'Published', day_of(blog.created_at), 1)
+
+
+def post_removed(blog):
+    state = getattr(blog, '_counter_state', None) or snapshot(blog)
+    if state:
+        category_id, author_id, status, day = state
+        _apply(category_id, author_id, status == 'Published', day, -1)
+
+
+def post_changed(old, blog):
+    """Move the post between counters when its category, author, status or day changed."""
+    new = snapshot(blog)
+    if old is None or new is None or old == new:
+        return
+    with transaction.atomic():
+        _apply(old[0], old[1], old[2] == 'Published', old[3], -1)
+        _apply(new[0], new[1], new[2] == 'Published', new[3], 1)
+
+
+def comment_added(comment):
+    Blog.objects.filter(pk=comment.blog_id).update(comment_count=_shift('comment_count', 1))
+    _upsert(AuthorStats, {'user_id': comment.user_id}, 1, comment_count=_shift('comment_count', 1))
+    _upsert(DailyStat, {'date': day_of(comment.created_at)}, 1, comments=_shift('comments', 1))
+
+
+def comment_removed(comment):
+    Blog.objects.filter(pk=comment.blog_id).update(comment_count=_shift('comment_count', -1))
+    AuthorStats.objects.filter(pk=comment.user_id).update(comment_count=_shift('comment_count', -1))
+    if comment.created_at:
+        _upsert(DailyStat, {'date': day_of(comment.created_at)}, -1, comments=_shift('comments', -1))
+
+
+def post_comments_removed(blog):
+    """
+    Take a post's comments off their authors' and days' counters before the post is deleted.
+
+    Stands in for comment_removed() on each comment the delete cascades to:
+    two UPDATEs, however many comments there are.
+    """
+    comments = Comment.objects.filter(blog_id=blog.pk).order_by()
+    per_user = comments.filter(user=OuterRef('pk')).values('user').annotate(n=Count('pk')).values('n')
+    AuthorStats.objects.filter(pk__in=comments.values('user')).update(
+        comment_count=Greatest(F('comment_count') - Subquery(per_user, output_field=IntegerField()), Value(0)),
+    )
+    dated = comments.annotate(day=TruncDate('created_at'))
+    per_day = dated.filter(day=OuterRef('date')).values('day').annotate(n=Count('pk')).values('n')
+    DailyStat.objects.filter(date__in=dated.values('day')).update(
+        comments=Greatest(F('comments') - Subquery(per_day, output_field=IntegerField()), Value(0)),
+    )
+
+
+def _count(field, published=False, model=Blog):
+    rows = model.objects.filter(**{field: OuterRef('pk')})
+    if published:
+        rows = rows.filter(status='Published')
+    counted = rows.order_by().values(field).annotate(n=Count('pk')).values('n')
+    return Coalesce(Subquery(counted, output_field=IntegerField()), Value(0))
+
+
+def daily_rows():
+    """The DailyStat rows as the Blog and Comment tables say they should be, in two grouped queries."""
+    days = {}
+    posts = (
+        Blog.objects.annotate(day=TruncDate('created_at')).order_by().values('day')
+        .annotate(posts=Count('pk'), published=Count('pk', filter=Q(status='Published')))
+        .values_list('day', 'posts', 'published')
+    )
+    for day, total, published in posts:
+        days[day] = DailyStat(date=day, posts=total, published=published)
+    comments = (
+        Comment.objects.annotate(day=TruncDate('created_at')).order_by().values('day')
+        .annotate(n=Count('pk')).values_list('day', 'n')
+    )
+    for day, total in comments:
+        days.setdefault(day, DailyStat(date=day)).comments = total
+    return days
+
+
+@transaction.atomic
+def recount():
+    """Rebuild every counter from the Blog and Comment tables. Returns (categories, authors, posts, days) updated."""
+    categories = Category.objects.update(
+        post_count=_count('category'),
+        published_count=_count('category', published=True),
+    )
+    missing = User.objects.filter(post_stats__isnull=True).values_list('pk', flat=True)
+    AuthorStats.objects.bulk_create(
+        [AuthorStats(user_id=pk) for pk in missing.iterator()],
+        batch_size=1000,
+        ignore_conflicts=True,
+    )
+    authors = AuthorStats.objects.update(
+        post_count=_count('author'),
+        published_count=_count('author', published=True),
+        comment_count=_count('user', model=Comment),
+    )
+    comments = Comment.objects.filter(blog=OuterRef('pk')).order_by().values('blog').annotate(n=Count('pk')).values('n')
+    posts = Blog.objects.update(
+        comment_count=Coalesce(Subquery(comments, output_field=IntegerField()), Value(0)),
+    )
+    # One row per day: cheaper to rewrite than to diff
+    days = daily_rows()
+    DailyStat.objects.all().delete()
+    DailyStat.objects.bulk_create(days.values(), batch_size=1000)
+    return categories, authors, posts, len(days)
+
+
+def drifted_days():
+    """Days whose stored DailyStat row disagrees with the Blog and Comment tables, as (stored, actual)."""
+    actual = daily_rows()
+    stored = {row.date: row for row in DailyStat.objects.all()}
+    stale = []
+    for day in sorted(set(actual) | set(stored)):
+        have = stored.get(day, DailyStat(date=day))
+        want = actual.get(day, DailyStat(date=day))
+        if (have.posts, have.published, have.comments) != (want.posts, want.published, want.comments):
+            stale.append((have, want))
+    return stale
+
+
+def drifted():
+    """Categories whose stored counters disagree with the Blog table."""
+    return Category.objects.annotate(
+        actual=Count('blog'),
+        actual_published=Count('blog', filter=Q(blog__status='Published')),
+    ).exclude(post_count=F('actual'), published_count=F('actual_published'))
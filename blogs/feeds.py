@@ -0,0 +1,259 @@
+"""
+RSS/Atom feeds (site-wide and per category) and a sitemap index.
+
+Feeds are assembled from per-post XML fragments kept in the cache under
+a key that includes the post's ``updated_at``. A request makes one query
+for the (pk, updated_at) pairs in the feed window and renders only the
+posts whose fragment is missing, i.e. new or changed since the last build.
+
+The sitemap is split into sections of SITEMAP_SECTION_SIZE primary keys.
+The index comes from one grouped query, and a section's XML is cached
+against its (last change, count, id sum), so an edit rebuilds only its
+own section.
+
+Every response carries an ETag and Last-Modified derived from the same
+state, so polling crawlers mostly get 304 Not Modified.
+"""
+import hashlib
+import io
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Max, Sum
+from django.db.models.functions import Floor
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed, Rss201rev2Feed
+from django.utils.http import http_date
+from django.utils.xmlutils import SimplerXMLGenerator
+from django.views.decorators.http import require_safe
+
+from . import page_cache
+from .models import Blog, Category
+
+FRAGMENT_PREFIX = 'feeds:'
+SITE_TITLE = 'Django Blogs'
+
+
+def _config(name, default):
+    return getattr(settings, 'FEEDS', {}).get(name, default)
+
+
+class FragmentFeedMixin:
+    """Writes pre-rendered item XML in place of ``self.items``."""
+
+    def __init__(self, *args, fragments=(), last_modified=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fragments = fragments
+        self.last_modified = last_modified
+
+    def write_items(self, handler):
+        for fragment in self.fragments:
+            # Already escaped XML; ignorableWhitespace writes it verbatim
+            handler.ignorableWhitespace(fragment)
+
+    def latest_post_date(self):
+        # The default scans self.items and falls back to now(), which would change the body on every request
+        return self.last_modified or datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+class RssFeed(FragmentFeedMixin, Rss201rev2Feed):
+    item_tag = 'item'
+
+
+class AtomFeed(FragmentFeedMixin, Atom1Feed):
+    item_tag = 'entry'
+
+
+FEED_TYPES = {'rss': RssFeed, 'atom': AtomFeed}
+
+
+def digest(*parts):
+    return hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def respond(request, body, etag_source, last_modified, content_type):
+    """
+    Return 304 when the client's copy matches, else the body from ``body()``.
+
+    ``etag_source`` must describe everything ``body()`` depends on, so the
+    check runs before anything is rendered.
+    """
+    etag = f'"{digest(*etag_source)}"'
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    headers = {'ETag': etag, 'Cache-Control': f"public, max-age={_config('MAX_AGE', 300)}"}
+    if timestamp is not None:
+        headers['Last-Modified'] = http_date(timestamp)
+
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        response = HttpResponse(body(), content_type=content_type)
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def render_fragment(feed_type, post, base_url):
+    link = base_url + reverse('blogs', kwargs={'slug': post.slug})
+    feed = feed_type('', '', '')
+    feed.add_item(
+        title=post.title,
+        link=link,
+        description=post.short_description,
+        unique_id=link,
+        pubdate=post.created_at,
+        updateddate=post.updated_at,
+        author_name=post.author.get_full_name() or post.author.username,
+        categories=[post.category.category_name],
+    )
+    item = feed.items[0]
+    output = io.StringIO()
+    handler = SimplerXMLGenerator(output, 'utf-8')
+    handler.startElement(feed_type.item_tag, feed.item_attributes(item))
+    feed.add_item_elements(handler, item)
+    handler.endElement(feed_type.item_tag)
+    return output.getvalue()
+
+
+def fragments(feed_type, rows, base_url, chrome):
+    """The item XML for ``rows`` of (pk, updated_at), rendering only what the cache lacks."""
+    # Category renames bump the chrome version; an author's new name shows once the post is next saved
+    keys = {
+        pk: f'{FRAGMENT_PREFIX}item:{feed_type.item_tag}:{pk}:{digest(updated_at, base_url, chrome)}'
+        for pk, updated_at in rows
+    }
+    found = cache.get_many(keys.values())
+    missing = [pk for pk, key in keys.items() if key not in found]
+    if missing:
+        rendered = {
+            keys[post.pk]: render_fragment(feed_type, post, base_url)
+            for post in Blog.objects.filter(pk__in=missing).with_relations()
+        }
+        cache.set_many(rendered, _config('FRAGMENT_TIMEOUT', 60 * 60 * 24 * 7))
+        found.update(rendered)
+    return [found[keys[pk]] for pk, _ in rows if keys[pk] in found]
+
+
+def feed_response(request, fmt, posts, title, link, description):
+    feed_type = FEED_TYPES.get(fmt)
+    if feed_type is None:
+        raise Http404('Unknown feed format')
+    rows = list(posts.order_by('-created_at', '-id').values_list('pk', 'updated_at')[:_config('ITEMS', 20)])
+    last_modified = max((updated_at for _, updated_at in rows), default=None)
+    base_url = request.build_absolute_uri('/')[:-1]
+    chrome = page_cache.get_versions(['chrome'])[0]
+
+    def body():
+        feed = feed_type(
+            title, base_url + link, description,
+            language=settings.LANGUAGE_CODE, feed_url=request.build_absolute_uri(request.path),
+            fragments=fragments(feed_type, rows, base_url, chrome), last_modified=last_modified,
+        )
+        return feed.writeString('utf-8')
+
+    return respond(request, body, (fmt, request.path, base_url, chrome, rows), last_modified, feed_type.content_type)
+
+
+@require_safe
+def latest_feed(request, fmt):
+    return feed_response(
+        request, fmt, Blog.objects.published(),
+        SITE_TITLE, reverse('home'), 'Latest posts',
+    )
+
+
+@require_safe
+def category_feed(request, category_id, fmt):
+    category = get_object_or_404(Category, pk=category_id)
+    return feed_response(
+        request, fmt, Blog.objects.published().filter(category=category),
+        f'{SITE_TITLE}: {category.category_name}',
+        reverse('posts_by_category', kwargs={'category_id': category.pk}),
+        f'Latest posts in {category.category_name}',
+    )
+
+
+def section_size():
+    return _config('SITEMAP_SECTION_SIZE', 5000)
+
+
+def sitemap_sections():
+    """{section: (last_modified, count, id sum)} for every section holding a published post."""
+    size = section_size()
+    rows = (
+        Blog.objects.published()
+        .annotate(section=Floor((F('pk') - 1) / size))
+        .values('section')
+        .annotate(last_modified=Max('updated_at'), count=Count('pk'), ids=Sum('pk'))
+        .order_by('section')
+        .values_list('section', 'last_modified', 'count', 'ids')
+    )
+    return {int(section): (last_modified, count, ids) for section, last_modified, count, ids in rows}
+
+
+def section_posts(section):
+    size = section_size()
+    return Blog.objects.published().filter(pk__gt=section * size, pk__lte=(section + 1) * size)
+
+
+def section_state(section):
+    state = section_posts(section).aggregate(last_modified=Max('updated_at'), count=Count('pk'), ids=Sum('pk'))
+    return (state['last_modified'], state['count'], state['ids']) if state['count'] else None
+
+
+def render_section(section, base_url):
+    posts = section_posts(section).order_by('pk').values_list('slug', 'updated_at')
+    output = io.StringIO()
+    handler = SimplerXMLGenerator(output, 'utf-8')
+    handler.startDocument()
+    handler.startElement('urlset', {'xmlns': 'http://www.sitemaps.org/schemas/sitemap/0.9'})
+    for slug, updated_at in posts.iterator(chunk_size=2000):
+        handler.startElement('url', {})
+        handler.addQuickElement('loc', base_url + reverse('blogs', kwargs={'slug': slug}))
+        handler.addQuickElement('lastmod', updated_at.isoformat())
+        handler.endElement('url')
+    handler.endElement('urlset')
+    return output.getvalue()
+
+
+@require_safe
+def sitemap_index(request):
+    sections = sitemap_sections()
+    base_url = request.build_absolute_uri('/')[:-1]
+    last_modified = max((state[0] for state in sections.values()), default=None)
+
+    def body():
+        output = io.StringIO()
+        handler = SimplerXMLGenerator(output, 'utf-8')
+        handler.startDocument()
+        handler.startElement('sitemapindex', {'xmlns': 'http://www.sitemaps.org/schemas/sitemap/0.9'})
+        for section, (section_modified, _, _) in sections.items():
+            handler.startElement('sitemap', {})
+            handler.addQuickElement('loc', base_url + reverse('sitemap_section', kwargs={'section': section}))
+            handler.addQuickElement('lastmod', section_modified.isoformat())
+            handler.endElement('sitemap')
+        handler.endElement('sitemapindex')
+        return output.getvalue()
+
+    return respond(request, body, ('index', base_url, sorted(sections.items())), last_modified, 'application/xml')
+
+
+@require_safe
+def sitemap_section(request, section):
+    state = section_state(section)
+    if state is None:
+        raise Http404('No such sitemap section')
+    base_url = request.build_absolute_uri('/')[:-1]
+    key = f'{FRAGMENT_PREFIX}sitemap:{section}:{digest(base_url, section_size(), *state)}'
+
+    def body():
+        xml = cache.get(key)
+        if xml is None:
+            xml = render_section(section, base_url)
+            cache.set(key, xml, _config('FRAGMENT_TIMEOUT', 60 * 60 * 24 * 7))
+        return xml
+
+    return respond(request, body, (key,), state[0], 'application/xml')
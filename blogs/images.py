@@ -0,0 +1,228 @@
+"""
+Resized renditions of uploaded images for responsive ``srcset`` markup.
+
+Every feature image is rendered with Pillow at the widths and formats in
+``settings.IMAGE_VARIANTS``, never wider than the original. Renditions are
+stored in the default storage under a name derived from the source bytes,
+e.g. ``variants/3f/3f9c...-640.webp``, so an identical upload reuses them and
+a replaced image can never serve a stale one.
+
+Variants are generated when a post's image changes (see blogs.signals) or,
+for images that predate that, on the first page that shows them. The list of
+renditions per source is kept in the cache, so rendering a page costs one
+cache lookup per image. Only one worker generates a given image at a time;
+pages rendered meanwhile, and images Pillow cannot render, use the original. ``manage.py cleanup_image_variants`` deletes
+renditions no post uses any more.
+"""
+import hashlib
+import io
+import logging
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_PREFIX = 'imagevariants:'
+# format -> (Pillow format, file extension, MIME type)
+FORMATS = {
+    'webp': ('WEBP', 'webp', 'image/webp'),
+    'jpeg': ('JPEG', 'jpg', 'image/jpeg'),
+}
+# Retry broken sources now and then instead of on every page view
+FAILURE_TIMEOUT = 300
+# Longest a worker may hold an image's generation lock, should it die holding it
+LOCK_TIMEOUT = 120
+
+
+def _config(name, default):
+    return getattr(settings, 'IMAGE_VARIANTS', {}).get(name, default)
+
+
+def source_digest(fieldfile):
+    digest = hashlib.sha256()
+    with fieldfile.storage.open(fieldfile.name, 'rb') as source:
+        for chunk in iter(lambda: source.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:32]
+
+
+def variant_name(digest, width, fmt):
+    extension = FORMATS[fmt][1]
+    return posixpath.join(_config('PREFIX', 'variants'), digest[:2], f'{digest}-{width}.{extension}')
+
+
+def digest_from_name(name):
+    """The source digest a variant file was named after, or None for foreign files."""
+    digest = posixpath.basename(name).split('-', 1)[0]
+    # Storage may have added a suffix after the width if two writers raced
+    return digest if re.fullmatch(r'[0-9a-f]{32}', digest) else None
+
+
+def is_variant(name):
+    """True for names generate() produced; what they hold never changes."""
+    return name.startswith(_config('PREFIX', 'variants') + '/') and digest_from_name(name) is not None
+
+
+def target_widths(source_width):
+    configured = _config('WIDTHS', [320, 640, 960, 1600])
+    widths = sorted(w for w in configured if w < source_width)
+    # Offer the original size too, unless it is beyond the largest configured width
+    if source_width <= max(configured):
+        widths.append(source_width)
+    return widths
+
+
+def render(image, width, fmt):
+    pillow_format = FORMATS[fmt][0]
+    height = max(round(image.height * width / image.width), 1)
+    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+    if pillow_format == 'JPEG' and resized.mode != 'RGB':
+        # JPEG has no alpha channel: flatten transparent images onto white
+        background = Image.new('RGB', resized.size, 'white')
+        rgba = resized.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        resized = background
+    output = io.BytesIO()
+    options = {'quality': _config('QUALITY', 80), 'optimize': True}
+    if pillow_format == 'JPEG':
+        options['progressive'] = True
+    resized.save(output, pillow_format, **options)
+    return output.getvalue()
+
+
+def manifest_key(fieldfile):
+    return MANIFEST_PREFIX + hashlib.md5(fieldfile.name.encode()).hexdigest()
+
+
+def empty_manifest():
+    """No renditions: pages fall back to the original image."""
+    return {'digest': None, 'width': None, 'height': None, 'variants': {}}
+
+
+def generate(fieldfile):
+    """
+    Create any missing renditions of ``fieldfile`` and cache their names.
+
+    Returns the manifest ``{'digest', 'width', 'height', 'variants'}`` where
+    ``variants`` maps each format to ``[(width, name), ...]``, narrowest
+    first. Images that cannot be read or rendered give an empty manifest,
+    cached for FAILURE_TIMEOUT. While another worker is generating the same
+    image, returns an empty manifest at once without caching it.
+    """
+    lock = manifest_key(fieldfile) + ':lock'
+    if not cache.add(lock, 1, LOCK_TIMEOUT):
+        return empty_manifest()
+    try:
+        manifest = _render_all(fieldfile)
+        cache.set(manifest_key(fieldfile), manifest, None)
+    except (OSError, UnidentifiedImageError, Image.DecompressionBombError, ValueError) as exc:
+        logger.warning('Cannot create variants of %s: %s', fieldfile.name, exc)
+        manifest = empty_manifest()
+        cache.set(manifest_key(fieldfile), manifest, FAILURE_TIMEOUT)
+    except Exception:
+        # Renditions are an optimisation; whatever Pillow or the storage raises must not break the page
+        logger.exception('Cannot create variants of %s', fieldfile.name)
+        manifest = empty_manifest()
+        cache.set(manifest_key(fieldfile), manifest, FAILURE_TIMEOUT)
+    finally:
+        cache.delete(lock)
+    return manifest
+
+
+def _render_all(fieldfile):
+    storage = fieldfile.storage
+    digest = source_digest(fieldfile)
+    with storage.open(fieldfile.name, 'rb') as source:
+        image = ImageOps.exif_transpose(Image.open(source))
+        image.load()
+
+    variants = {}
+    for fmt in _config('FORMATS', ['webp', 'jpeg']):
+        for width in target_widths(image.width):
+            name = variant_name(digest, width, fmt)
+            if not storage.exists(name):
+                name = storage.save(name, ContentFile(render(image, width, fmt)))
+            variants.setdefault(fmt, []).append((width, name))
+    return {'digest': digest, 'width': image.width, 'height': image.height, 'variants': variants}
+
+
+def get_manifest(fieldfile, create=True):
+    if not fieldfile:
+        return None
+    manifest = cache.get(manifest_key(fieldfile))
+    if manifest is None and create:
+        manifest = generate(fieldfile)
+    return manifest
+
+
+def srcset(fieldfile, fmt):
+    manifest = get_manifest(fieldfile)
+    if not manifest:
+        return ''
+    storage = fieldfile.storage
+    return ', '.join(f'{storage.url(name)} {width}w' for width, name in manifest['variants'].get(fmt, []))
+
+
+def variant_url(fieldfile, width, fmt='jpeg'):
+    """URL of the narrowest rendition at least ``width`` wide, falling back to the original."""
+    manifest = get_manifest(fieldfile)
+    if not manifest:
+        return ''
+    candidates = manifest['variants'].get(fmt)
+    if not candidates:
+        return fieldfile.url
+    for candidate_width, name in candidates:
+        if candidate_width >= width:
+            break
+    return fieldfile.storage.url(name)
+
+
+def picture(fieldfile, fallback_width=640):
+    """Everything a <picture> element needs: modern-format sources plus a JPEG <img>."""
+    manifest = get_manifest(fieldfile)
+    if not manifest:
+        return None
+    sources = [
+        {'type': FORMATS[fmt][2], 'srcset': srcset(fieldfile, fmt)}
+        for fmt in manifest['variants'] if fmt != 'jpeg'
+    ]
+    return {
+        'sources': sources,
+        'src': variant_url(fieldfile, fallback_width),
+        'srcset': srcset(fieldfile, 'jpeg'),
+        'width': manifest['width'],
+        'height': manifest['height'],
+    }
+
+
+def referenced_digests(fieldfiles):
+    """Digests of every source still in use, reading sources only when the cache has forgotten them."""
+    digests = set()
+    for fieldfile in fieldfiles:
+        manifest = get_manifest(fieldfile, create=False)
+        if manifest and manifest['digest']:
+            digests.add(manifest['digest'])
+            continue
+        try:
+            digests.add(source_digest(fieldfile))
+        except OSError:
+            pass
+    return digests
+
+
+def stored_variants(storage):
+    """Walk the variants directory, yielding every stored rendition name."""
+    prefix = _config('PREFIX', 'variants')
+    try:
+        buckets, _ = storage.listdir(prefix)
+    except (OSError, NotImplementedError):
+        return
+    for bucket in buckets:
+        _, files = storage.listdir(posixpath.join(prefix, bucket))
+        for filename in files:
+            yield posixpath.join(prefix, bucket, filename)
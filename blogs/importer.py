@@ -0,0 +1,280 @@
+"""
+Bulk import of users, posts and comments from JSONL or CSV.
+
+Records stream through a generator pipeline (read, batch, resolve, write),
+so memory depends on the batch size rather than the file. Each batch
+resolves its authors, categories and posts with one ``__in`` query per
+kind, remembered in small maps; allocates its slugs with one prefix query;
+and is written with bulk_create inside its own transaction.
+
+bulk_create skips the save signals, so ``finish()`` rebuilds the search
+index and the counters once at the end. It also bumps the ``chrome`` stamp,
+which every cached page depends on, instead of one stamp per post.
+
+Record fields (CSV headers or JSON keys):
+
+    users     username, email, first_name, last_name, is_staff, password
+    posts     title, slug, category, author, short_description, blog_body,
+              status, is_featured, feauture_image, created_at
+    comments  post (slug), user (username), comment, created_at
+
+``password`` must already be a Django password hash, as in a dumpdata
+export; anything else leaves the account with an unusable password.
+Hashing plain passwords row by row would take longer than the import.
+"""
+import csv
+import itertools
+import json
+from datetime import datetime, time
+
+from django.contrib.auth.hashers import identify_hasher, make_password
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import counters, page_cache, search
+from .models import Blog, Category, Comment
+from .slugs import SlugAllocator
+
+KINDS = ('users', 'posts', 'comments')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'on'}
+
+
+class RowError(ValueError):
+    pass
+
+
+def read_records(stream, fmt):
+    """Yield (line number, record) from a JSONL or CSV text stream; unparseable lines carry a RowError."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+        return
+    for line_number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as exc:
+            record = RowError(f'invalid JSON: {exc.msg}')
+        if not isinstance(record, (dict, RowError)):
+            record = RowError('not a JSON object')
+        yield line_number, record
+
+
+def batched(records, size):
+    records = iter(records)
+    while batch := list(itertools.islice(records, size)):
+        yield batch
+
+
+def text(record, field, required=False):
+    value = record.get(field)
+    value = '' if value is None else str(value).strip()
+    if required and not value:
+        raise RowError(f'missing {field}')
+    return value
+
+
+def flag(record, field):
+    value = record.get(field)
+    if isinstance(value, bool):
+        return value
+    return str(value or '').strip().lower() in TRUE_VALUES
+
+
+def timestamp(record, field='created_at'):
+    value = text(record, field)
+    if not value:
+        return None
+    try:
+        # Both return None for text that is not a date, but raise for an impossible one like 2024-13-45
+        parsed = parse_datetime(value)
+        day = None if parsed else parse_date(value)
+    except ValueError:
+        raise RowError(f'bad {field}: {value!r}')
+    if parsed is None:
+        if day is None:
+            raise RowError(f'bad {field}: {value!r}')
+        parsed = datetime.combine(day, time())
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class Importer:
+    """
+    Imports one kind of record. ``run()`` is a generator that yields the
+    running total after each committed batch, so the caller can report
+    progress. When it stops, exhausted or not, it calls ``finish()`` so the
+    batches already committed are indexed and counted.
+    """
+
+    def __init__(self, kind, batch_size=1000, create_categories=True):
+        if kind not in KINDS:
+            raise ValueError(f'kind must be one of {", ".join(KINDS)}')
+        self.kind = kind
+        self.batch_size = batch_size
+        self.create_categories = create_categories
+        self.users = {}       # username -> pk
+        self.categories = {}  # category name -> pk
+        self.imported = 0
+        self.rejected = 0
+        self.errors = []      # the first few (line, reason) pairs
+
+    def reject(self, line, reason):
+        self.rejected += 1
+        if len(self.errors) < 20:
+            self.errors.append((line, str(reason)))
+
+    def run(self, records):
+        write = getattr(self, f'write_{self.kind}')
+        try:
+            for batch in batched(records, self.batch_size):
+                valid = []
+                for line, record in batch:
+                    if isinstance(record, RowError):
+                        self.reject(line, record)
+                    else:
+                        valid.append((line, record))
+                with transaction.atomic():
+                    self.imported += write(valid)
+                yield self.imported
+        finally:
+            self.finish()
+
+    def finish(self):
+        if self.kind == 'posts':
+            search.rebuild_index()
+        counters.recount()
+        page_cache.bump('chrome', 'posts')
+
+    def resolve_users(self, usernames):
+        missing = {name for name in usernames if name and name not in self.users}
+        if missing:
+            self.users.update(User.objects.filter(username__in=missing).values_list('username', 'pk'))
+
+    def resolve_categories(self, names):
+        missing = {name[:50] for name in names if name and name[:50] not in self.categories}
+        if not missing:
+            return
+        self.categories.update(Category.objects.filter(category_name__in=missing).values_list('category_name', 'pk'))
+        new = missing - set(self.categories)
+        if new and self.create_categories:
+            Category.objects.bulk_create([Category(category_name=name) for name in new], ignore_conflicts=True)
+            self.categories.update(Category.objects.filter(category_name__in=new).values_list('category_name', 'pk'))
+
+    def restore_dates(self, model, objects, dates):
+        # bulk_create stamps auto_now_add with the current time; put the archive's dates back.
+        # bulk_update would build one CASE over the whole batch, which SQLite evaluates per row.
+        field = model._meta.get_field('created_at')
+        rows = [
+            (field.get_db_prep_value(created_at, connection), obj.pk)
+            for obj, created_at in zip(objects, dates) if created_at is not None
+        ]
+        if rows:
+            quote = connection.ops.quote_name
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'UPDATE {quote(model._meta.db_table)} SET {quote(field.column)} = %s WHERE {quote(model._meta.pk.column)} = %s',
+                    rows,
+                )
+
+    def write_users(self, batch):
+        existing = set(
+            User.objects.filter(username__in=[text(record, 'username') for _, record in batch])
+            .values_list('username', flat=True)
+        )
+        users = []
+        for line, record in batch:
+            try:
+                username = text(record, 'username', required=True)[:150]
+                if username in existing:
+                    raise RowError(f'user {username!r} already exists')
+                password = text(record, 'password')
+                try:
+                    identify_hasher(password)
+                except ValueError:
+                    password = make_password(None)
+            except RowError as exc:
+                self.reject(line, exc)
+                continue
+            existing.add(username)
+            users.append(User(
+                username=username,
+                email=text(record, 'email'),
+                first_name=text(record, 'first_name')[:150],
+                last_name=text(record, 'last_name')[:150],
+                is_staff=flag(record, 'is_staff'),
+                password=password,
+            ))
+        User.objects.bulk_create(users)
+        return len(users)
+
+    def write_posts(self, batch):
+        self.resolve_users(text(record, 'author') for _, record in batch)
+        self.resolve_categories(text(record, 'category') for _, record in batch)
+        slugs = SlugAllocator()
+        slugs.prefetch([text(record, 'slug') or text(record, 'title') for _, record in batch])
+
+        posts, dates = [], []
+        for line, record in batch:
+            try:
+                title = text(record, 'title', required=True)
+                author = text(record, 'author', required=True)
+                category = text(record, 'category', required=True)[:50]
+                if author not in self.users:
+                    raise RowError(f'unknown author {author!r}')
+                if category not in self.categories:
+                    raise RowError(f'unknown category {category!r}')
+                created_at = timestamp(record)
+            except RowError as exc:
+                self.reject(line, exc)
+                continue
+            posts.append(Blog(
+                title=title[:100],
+                slug=slugs.allocate(text(record, 'slug') or title),
+                category_id=self.categories[category],
+                author_id=self.users[author],
+                feauture_image=text(record, 'feauture_image') or text(record, 'image'),
+                short_description=text(record, 'short_description'),
+                blog_body=text(record, 'blog_body'),
+                status='Published' if text(record, 'status').lower() == 'published' else 'Draft',
+                is_featured=flag(record, 'is_featured'),
+            ))
+            dates.append(created_at)
+
+        Blog.objects.bulk_create(posts)
+        self.restore_dates(Blog, posts, dates)
+        return len(posts)
+
+    def write_comments(self, batch):
+        self.resolve_users(text(record, 'user') for _, record in batch)
+        # Posts are looked up per batch: an archive can have far more posts than we want to hold
+        post_ids = dict(
+            Blog.objects.filter(slug__in={text(record, 'post') for _, record in batch})
+            .values_list('slug', 'pk')
+        )
+
+        comments, dates = [], []
+        for line, record in batch:
+            try:
+                slug = text(record, 'post', required=True)
+                username = text(record, 'user', required=True)
+                body = text(record, 'comment', required=True)
+                if slug not in post_ids:
+                    raise RowError(f'unknown post {slug!r}')
+                if username not in self.users:
+                    raise RowError(f'unknown user {username!r}')
+                created_at = timestamp(record)
+            except RowError as exc:
+                self.reject(line, exc)
+                continue
+            comments.append(Comment(user_id=self.users[username], blog_id=post_ids[slug], comment=body))
+            dates.append(created_at)
+
+        Comment.objects.bulk_create(comments)
+        self.restore_dates(Comment, comments, dates)
+        return len(comments)
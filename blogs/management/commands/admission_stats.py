@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from blog_main import admission
+
+
+class Command(BaseCommand):
+    help = 'Shows admitted and shed request counts for each rate-limited route'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'Route':<12}{'Admitted':>10}{'429':>8}{'503':>8}{'In flight':>11}{'Shed':>8}")
+        for route, counts in admission.stats().items():
+            shed = counts['rate_limited'] + counts['overloaded']
+            total = counts['admitted'] + shed
+            share = f'{shed / total:.1%}' if total else '-'
+            self.stdout.write(
+                f"{route:<12}{counts['admitted']:>10}{counts['rate_limited']:>8}"
+                f"{counts['overloaded']:>8}{counts['in_flight']:>11}{share:>8}"
+            )
+        if options['reset']:
+            admission.reset_stats()
+            self.stdout.write(self.style.WARNING('Counters reset'))
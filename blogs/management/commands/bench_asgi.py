@@ -0,0 +1,87 @@
+import asyncio
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from blog_main import bench
+from blog_main.urls import build_urlpatterns
+from blogs.models import Blog, Category
+
+
+def urlconf(async_reads):
+    module = types.ModuleType('bench_asgi_urls')
+    module.urlpatterns = build_urlpatterns(async_reads)
+    return module
+
+
+class Command(BaseCommand):
+    help = 'Compares the sync views under WSGI with the async read views under ASGI, in-process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Requests per stack (default 500)')
+        parser.add_argument('--concurrency', type=int, default=20, help='Requests in flight (default 20)')
+        parser.add_argument('--path', action='append', dest='paths', help='Path to request; repeatable')
+        parser.add_argument('--page-cache', action='store_true', help='Leave the page cache on (off by default so the views run)')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self.default_paths()
+        total, concurrency = options['requests'], options['concurrency']
+        plan = [paths[i % len(paths)] for i in range(total)]
+        # Admission control would shed the benchmark's own burst of searches
+        overrides = {'PAGE_CACHE': {'ENABLED': options['page_cache']}, 'ADMISSION': {'ENABLED': False}}
+
+        self.stdout.write(f'{total} requests over {len(paths)} paths, {concurrency} in flight')
+        with override_settings(ROOT_URLCONF=urlconf(False), **overrides):
+            wsgi = self.run_wsgi(plan, concurrency)
+        with override_settings(ROOT_URLCONF=urlconf(True), **overrides):
+            asgi = asyncio.run(self.run_asgi(plan, concurrency))
+
+        self.stdout.write(bench.format_summary('WSGI (sync views)', wsgi))
+        self.stdout.write(bench.format_summary('ASGI (async views)', asgi))
+        if wsgi['throughput']:
+            ratio = asgi['throughput'] / wsgi['throughput']
+            self.stdout.write(self.style.SUCCESS(f'ASGI throughput: {ratio:.2f}x WSGI'))
+
+    def default_paths(self):
+        post = Blog.objects.published().order_by('-created_at').values_list('slug', flat=True).first()
+        category = Category.objects.values_list('pk', flat=True).first()
+        if post is None or category is None:
+            raise CommandError('Needs at least one published post and one category; pass --path instead')
+        word = post.split('-')[0]
+        return ['/', '/categories/', f'/category/{category}/', f'/{post}/', f'/search/?keyword={word}']
+
+    def check_status(self, path, status):
+        if status != 200:
+            raise CommandError(f'{path} returned {status}')
+
+    def run_wsgi(self, plan, concurrency):
+        handler = WSGIHandler()
+
+        def fetch(path):
+            status, elapsed, _ = bench.wsgi_request(handler, path)
+            self.check_status(path, status)
+            return elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(fetch, plan))
+        return bench.summarize(latencies, time.perf_counter() - started)
+
+    async def run_asgi(self, plan, concurrency):
+        handler = ASGIHandler()
+        slots = asyncio.Semaphore(concurrency)
+
+        async def fetch(path):
+            async with slots:
+                status, elapsed, _ = await bench.asgi_request(handler, path)
+            self.check_status(path, status)
+            return elapsed
+
+        started = time.perf_counter()
+        latencies = await asyncio.gather(*(fetch(path) for path in plan))
+        return bench.summarize(latencies, time.perf_counter() - started)
@@ -0,0 +1,112 @@
+import time
+import types
+
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import path
+
+from blog_main import auth_cache, bench
+from blog_main.middleware import QueryRecorder
+
+VISITORS = ('anonymous', 'logged in')
+
+
+def probe(request):
+    """What every page does before its own work: who is asking, and any messages for them."""
+    name = request.user.get_username() if request.user.is_authenticated else ''
+    return HttpResponse(f'{name} {len(messages.get_messages(request))}')
+
+
+def urlconf():
+    module = types.ModuleType('bench_auth_urls')
+    module.urlpatterns = [path('probe/', probe)]
+    return module
+
+
+def profiles():
+    stock_middleware = [
+        auth_cache.STOCK_SESSION_MIDDLEWARE if entry == auth_cache.LAZY_SESSION_MIDDLEWARE else entry
+        for entry in settings.MIDDLEWARE
+    ]
+    return {
+        'stock': {
+            'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+            'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+            'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+            'MIDDLEWARE': stock_middleware,
+        },
+        'fast': auth_cache.fast_path_settings(stock_middleware, auth_cache.config('SESSION_ENGINE')),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures the per-request cost of sessions, authentication and messages, with the stock '
+        'settings and with the fast path (blog_main/auth_cache.py), for anonymous and logged-in visitors'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000, help='Requests per profile and visitor (default 2000)')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            user = User.objects.create_user('bench-auth', password='bench-auth')
+            results = {}
+            for profile, overrides in profiles().items():
+                with override_settings(
+                    ROOT_URLCONF=urlconf(), ADMISSION={'ENABLED': False},
+                    CACHES=bench.locmem_caches('bench-auth'),
+                    **overrides,
+                ):
+                    results[profile] = self.run_profile(user, options['requests'])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for profile, visitors in results.items():
+            for visitor, summary in visitors.items():
+                line = bench.format_summary(f'{profile} {visitor}', summary)
+                self.stdout.write(f"{line}   queries {summary['queries']:.1f}   session cookies {summary['session_cookies']}")
+        for visitor in VISITORS:
+            stock, fast = results['stock'][visitor]['mean_ms'], results['fast'][visitor]['mean_ms']
+            if fast:
+                self.stdout.write(self.style.SUCCESS(f'{visitor.capitalize()} mean: {stock / fast:.2f}x faster with the fast path'))
+
+    def run_profile(self, user, count):
+        client = Client()
+        client.force_login(user)
+        cookies = {
+            'anonymous': {},
+            'logged in': {'Cookie': f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'},
+        }
+        handler = WSGIHandler()
+        summaries = {}
+        for visitor in VISITORS:
+            # Warm up: the first request loads the middleware and fills the caches
+            bench.wsgi_request(handler, '/probe/', headers=cookies[visitor])
+            recorder, latencies, session_cookies = QueryRecorder(), [], 0
+            started = time.perf_counter()
+            with connection.execute_wrapper(recorder):
+                for _ in range(count):
+                    headers = []
+                    _, elapsed, _ = bench.wsgi_request(handler, '/probe/', response_headers=headers, headers=cookies[visitor])
+                    latencies.append(elapsed)
+                    session_cookies += any(
+                        name == 'Set-Cookie' and value.startswith(f'{settings.SESSION_COOKIE_NAME}=')
+                        for name, value in headers
+                    )
+            summaries[visitor] = {
+                **bench.summarize(latencies, time.perf_counter() - started),
+                'queries': recorder.count / count,
+                'session_cookies': session_cookies,
+            }
+        return summaries
+
@@ -0,0 +1,100 @@
+import os
+import time
+import types
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import re_path
+from django.views.static import serve
+
+from blog_main import bench
+from blog_main.media import serve_media
+
+STACKS = {
+    'static.serve': '/legacy/',
+    'serve_media': '/media/',
+}
+
+
+def urlconf():
+    module = types.ModuleType('bench_media_urls')
+    module.urlpatterns = [
+        re_path(r'^legacy/(?P<path>.*)$', serve, {'document_root': settings.MEDIA_ROOT}),
+        re_path(r'^media/(?P<path>.*)$', serve_media),
+    ]
+    return module
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares django.views.static.serve with blog_main.media.serve_media on files under MEDIA_ROOT: '
+        'full downloads, revalidation and Range requests. In-process, so sendfile() is not exercised.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=300, help='Requests per scenario and stack (default 300)')
+        parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight (default 8)')
+        parser.add_argument('--path', action='append', dest='paths', help='File under MEDIA_ROOT; repeatable')
+
+    def handle(self, *args, **options):
+        files = options['paths'] or self.default_files()
+        if not files:
+            raise CommandError(f'No files under {settings.MEDIA_ROOT}; pass --path')
+
+        with override_settings(ROOT_URLCONF=urlconf()):
+            handler = WSGIHandler()
+            for scenario in ('full', 'revalidate', 'range'):
+                self.stdout.write(self.style.MIGRATE_HEADING(scenario))
+                for label, prefix in STACKS.items():
+                    plan = self.plan(prefix, files, scenario, options['requests'])
+                    summary, statuses, sent = self.run(handler, plan, options['concurrency'])
+                    seen = ', '.join(f'{status} x{count}' for status, count in sorted(statuses.items()))
+                    self.stdout.write(f'{bench.format_summary(label, summary)}   {sent / 1024 / 1024:8.1f} MB   [{seen}]')
+
+    def default_files(self):
+        found = []
+        for root, _, names in os.walk(settings.MEDIA_ROOT):
+            for name in names:
+                if name.endswith(('.gz', '.br')):
+                    # Precompressed copies are served as an encoding of their original
+                    continue
+                found.append(os.path.relpath(os.path.join(root, name), settings.MEDIA_ROOT).replace(os.sep, '/'))
+        return sorted(found)[:20]
+
+    def plan(self, prefix, files, scenario, total):
+        requests = []
+        for name in files:
+            url = prefix + name
+            headers = {}
+            if scenario == 'revalidate':
+                # Revalidate with whatever validators this stack handed out
+                first = Client(HTTP_HOST='localhost').get(url)
+                if first.status_code != 200:
+                    raise CommandError(f'{url} returned {first.status_code}')
+                if first.get('ETag'):
+                    headers['If-None-Match'] = first['ETag']
+                if first.get('Last-Modified'):
+                    headers['If-Modified-Since'] = first['Last-Modified']
+                first.close()
+            elif scenario == 'range':
+                headers['Range'] = 'bytes=0-65535'
+            requests.append((url, headers))
+        return [requests[i % len(requests)] for i in range(total)]
+
+    def run(self, handler, plan, concurrency):
+        def fetch(request):
+            url, headers = request
+            return bench.wsgi_request(handler, url, headers=headers)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(fetch, plan))
+        elapsed = time.perf_counter() - started
+        statuses = Counter(status for status, _, _ in results)
+        sent = sum(size for _, _, size in results)
+        return bench.summarize([seconds for _, seconds, _ in results], elapsed), statuses, sent
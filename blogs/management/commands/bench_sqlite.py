@@ -0,0 +1,174 @@
+import json
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.test.utils import override_settings
+
+from blog_main import bench, sqlite_profile
+from blogs.models import Blog, Comment
+
+PROFILES = ('stock', 'tuned')
+
+
+def read_once(rng, samples):
+    # What the home page and a post page ask the database for
+    list(Blog.objects.published().summaries().order_by('-created_at', '-id')[:10])
+    blog = Blog.objects.published().with_relations().get(slug=rng.choice(samples['slugs']))
+    list(blog.comments.select_related('user').order_by('-created_at', '-id')[:20])
+
+
+def write_once(rng, samples):
+    # A comment post: read the post, then insert; the counter signals add their UPDATEs
+    with transaction.atomic():
+        blog = Blog.objects.get(pk=rng.choice(samples['blog_ids']))
+        Comment.objects.create(blog=blog, user_id=rng.choice(samples['user_ids']), comment='Contention benchmark')
+
+
+def worker(role, name, options, seconds, seed, samples, start, results):
+    """One forked process running ``role`` against the database file ``name`` until time is up."""
+    try:
+        database = connections['default']
+        database.settings_dict['NAME'] = name
+        database.settings_dict['OPTIONS'] = options
+        operation = read_once if role == 'reader' else write_once
+        rng = random.Random(seed)
+        latencies, locked = [], 0
+        start.wait()
+        deadline = time.perf_counter() + seconds
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                operation(rng, samples)
+            except OperationalError:
+                # "database is locked": the request would have been a 500
+                locked += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+        database.close()
+        results.put((role, latencies, locked, None))
+    except Exception as e:
+        results.put((role, [], 0, repr(e)))
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs reader and writer processes against one SQLite file, first with the stock settings '
+        'and then with the tuned profile (blog_main/sqlite_profile.py), and compares their throughput'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4, help='Reader processes (default 4)')
+        parser.add_argument('--writers', type=int, default=2, help='Writer processes (default 2)')
+        parser.add_argument('--seconds', type=float, default=5.0, help='Run time per profile (default 5)')
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=10000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the results to this JSON file')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark compares SQLite settings; the default database is not SQLite')
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            raise CommandError('Needs the fork start method (Linux, macOS)')
+
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=bench.locmem_caches('bench-sqlite')):
+            template = os.path.join(directory, 'template.sqlite3')
+            samples = self.seed(template, options)
+            results = {}
+            for profile in PROFILES:
+                name = os.path.join(directory, f'{profile}.sqlite3')
+                self.copy(template, name, journal_mode='WAL' if profile == 'tuned' else 'DELETE')
+                profile_options = sqlite_profile.tuned_options() if profile == 'tuned' else {}
+                results[profile] = self.run_profile(context, name, profile_options, samples, options)
+                self.report(profile, results[profile])
+
+        self.compare(results)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+    def seed(self, template, options):
+        """Build the dataset once in ``template``; every profile starts from a copy."""
+        old_name = connection.settings_dict['NAME']
+        connection.settings_dict['TEST']['NAME'] = template
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            started = time.perf_counter()
+            bench.seed_dataset(
+                users=options['users'], categories=10, posts=options['posts'],
+                comments=options['comments'], seed=options['seed'],
+            )
+            self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+            samples = {
+                'slugs': list(Blog.objects.published().values_list('slug', flat=True)),
+                'blog_ids': list(Blog.objects.published().values_list('pk', flat=True)),
+                'user_ids': list(User.objects.values_list('pk', flat=True)),
+            }
+        finally:
+            # Forked workers must not share this process's connection
+            connection.close()
+            connection.settings_dict['NAME'] = old_name
+        return samples
+
+    def copy(self, source, target, journal_mode):
+        # The backup API includes anything still in source's WAL file
+        source_db, target_db = sqlite3.connect(source), sqlite3.connect(target)
+        try:
+            source_db.backup(target_db)
+            target_db.execute(f'PRAGMA journal_mode={journal_mode}')
+        finally:
+            source_db.close()
+            target_db.close()
+
+    def run_profile(self, context, name, profile_options, samples, options):
+        roles = ['reader'] * options['readers'] + ['writer'] * options['writers']
+        start = context.Barrier(len(roles))
+        queue = context.Queue()
+        processes = [
+            context.Process(
+                target=worker,
+                args=(role, name, profile_options, options['seconds'], options['seed'] + number, samples, start, queue),
+            )
+            for number, role in enumerate(roles)
+        ]
+        for process in processes:
+            process.start()
+        # Drain before joining: a child cannot exit while its results sit in the pipe
+        finished = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+
+        failures = [error for _, _, _, error in finished if error]
+        if failures:
+            raise CommandError(f'A worker failed: {failures[0]}')
+        summary = {}
+        for role in ('reader', 'writer'):
+            latencies = [value for name, values, _, _ in finished if name == role for value in values]
+            summary[role] = {
+                **bench.summarize(latencies, options['seconds']),
+                'processes': roles.count(role),
+                'locked': sum(locked for name, _, locked, _ in finished if name == role),
+            }
+        return summary
+
+    def report(self, profile, summary):
+        for role, numbers in summary.items():
+            line = bench.format_summary(f'{profile} {role}s x{numbers["processes"]}', numbers)
+            self.stdout.write(f'{line}   locked {numbers["locked"]}')
+
+    def compare(self, results):
+        for role in ('reader', 'writer'):
+            stock, tuned = results['stock'][role]['throughput'], results['tuned'][role]['throughput']
+            if stock:
+                self.stdout.write(self.style.SUCCESS(f'{role.capitalize()} throughput: {tuned / stock:.2f}x with the tuned profile'))
@@ -0,0 +1,229 @@
+import json
+import platform
+import random
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+
+from blog_main import bench
+from blog_main.middleware import QueryRecorder
+from blogs import exporter, feeds
+from blogs.models import Blog, Category, Comment
+
+# url_name -> (weight, needs a logged-in manager)
+MIX = {
+    'home': (20, False),
+    'blogs': (25, False),
+    'blog_comments': (5, False),
+    'posts_by_category': (10, False),
+    'categories_list': (5, False),
+    'search': (10, False),
+    'register': (1, False),
+    'login': (2, False),
+    'dashboard': (3, True),
+    'posts': (3, True),
+    'posts_data': (2, True),
+    'add_post': (1, True),
+    'edit_post': (1, True),
+    'add_category': (1, True),
+    'edit_category': (1, True),
+    'users_list': (2, True),
+    'bulk_users': (1, True),
+    'add_user': (1, True),
+    'edit_user': (1, True),
+    'export_content': (1, True),
+    'feed': (4, False),
+    'category_feed': (2, False),
+    'sitemap': (1, False),
+    'sitemap_section': (1, False),
+}
+
+# These change data on GET; replaying them would rewrite the dataset mid-run
+SKIPPED = {'logout', 'delete_comment', 'delete_category', 'delete_post', 'toggle_featured', 'delete_user'}
+
+# Extra query strings per route
+QUERY = {
+    'search': lambda rng: '?keyword=' + rng.choice(bench.WORDS),
+    'users_list': lambda rng: rng.choice(['', '?sort=-posts', '?page=3', '?q=user-1']),
+}
+
+
+def named_routes(patterns=None):
+    """(url_name, URL kwargs) for every named route outside namespaced includes such as the admin."""
+    for entry in get_resolver().url_patterns if patterns is None else patterns:
+        if isinstance(entry, URLResolver):
+            if not entry.namespace:
+                yield from named_routes(entry.url_patterns)
+        elif entry.name:
+            yield entry.name, list(entry.pattern.regex.groupindex)
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a throwaway test database, replays a weighted request mix over every named route '
+        'and writes per-route latency, throughput, query counts and response sizes to JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--requests', type=int, default=1000, help='Timed requests (default 1000)')
+        parser.add_argument('--concurrency', type=int, default=4, help='Requests in flight (default 4)')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the dataset and the request mix')
+        parser.add_argument('--output', default='benchmark.json', help='Where to write the results')
+        parser.add_argument('--baseline', help='Earlier results to compare against; regressions fail the command')
+        parser.add_argument(
+            '--threshold', type=float, default=25.0,
+            help='Allowed p95 slowdown against the baseline, in percent (default 25)',
+        )
+
+    def handle(self, *args, **options):
+        routes = dict(named_routes())
+        unknown = set(routes) - set(MIX) - SKIPPED
+        if unknown:
+            self.stdout.write(self.style.WARNING(f"Not in the request mix: {', '.join(sorted(unknown))}"))
+
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Admission control off: the mix replays logins and comments far faster than any visitor
+            with override_settings(CACHES=bench.locmem_caches('benchmark'), ADMISSION={'ENABLED': False}):
+                results = self.run_benchmark(routes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        self.report(results)
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}"))
+
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                baseline = json.load(baseline)
+            if baseline.get('meta', {}).get('dataset') != results['meta']['dataset']:
+                self.stdout.write(self.style.WARNING('The baseline was run on a different dataset'))
+            regressions = self.compare(results, baseline, options['threshold'])
+            if regressions:
+                for line in regressions:
+                    self.stdout.write(self.style.ERROR(line))
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
+
+    def run_benchmark(self, routes, options):
+        rng = random.Random(options['seed'])
+        started = time.perf_counter()
+        manager = bench.seed_dataset(
+            users=options['users'], categories=options['categories'], posts=options['posts'],
+            comments=options['comments'], seed=options['seed'],
+        )
+        self.stdout.write(f'Seeded in {time.perf_counter() - started:.1f}s')
+
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(manager)
+        session_cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        samples = {
+            'slug': list(Blog.objects.published().values_list('slug', flat=True)),
+            'category_id': list(Category.objects.values_list('pk', flat=True)),
+            'post_id': list(Blog.objects.values_list('pk', flat=True)),
+            'user_id': list(User.objects.filter(is_superuser=False).values_list('pk', flat=True)),
+            'comment_id': list(Comment.objects.values_list('pk', flat=True)[:1000]),
+            'kind': list(exporter.KINDS),
+            'fmt': list(feeds.FEED_TYPES),
+            'section': list(feeds.sitemap_sections()),
+        }
+
+        def request_for(name):
+            _, needs_login = MIX[name]
+            kwargs = {param: rng.choice(samples[param]) for param in routes[name]}
+            url = reverse(name, kwargs=kwargs) + QUERY.get(name, lambda rng: '')(rng)
+            return name, url, {'Cookie': session_cookie} if needs_login else {}
+
+        active = [name for name in MIX if name in routes]
+        weights = [MIX[name][0] for name in active]
+        warmup = [request_for(name) for name in active]
+        plan = [request_for(name) for name in rng.choices(active, weights=weights, k=options['requests'])]
+
+        handler = WSGIHandler()
+
+        def fetch(request):
+            name, url, headers = request
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                status, seconds, size = bench.wsgi_request(handler, url, headers=headers)
+            return name, url, status, seconds, size, recorder.count
+
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            for name, url, status, *_ in pool.map(fetch, warmup):
+                if status >= 400:
+                    raise CommandError(f'{name} ({url}) returned {status}')
+            started = time.perf_counter()
+            measured = list(pool.map(fetch, plan))
+            elapsed = time.perf_counter() - started
+
+        per_route = defaultdict(list)
+        for name, _, status, seconds, size, queries in measured:
+            per_route[name].append((status, seconds, size, queries))
+
+        return {
+            'meta': {
+                'timestamp': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'database': connection.vendor,
+                'dataset': {key: options[key] for key in ('users', 'categories', 'posts', 'comments', 'seed')},
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'skipped_routes': sorted(SKIPPED & set(routes)),
+            },
+            'overall': bench.summarize([row[3] for row in measured], elapsed),
+            'routes': {name: self.route_summary(rows, elapsed) for name, rows in sorted(per_route.items())},
+        }
+
+    def route_summary(self, rows, elapsed):
+        summary = bench.summarize([seconds for _, seconds, _, _ in rows], elapsed)
+        summary['errors'] = sum(1 for status, _, _, _ in rows if status >= 400)
+        # Several dashboard routes only redirect on GET; make that visible
+        summary['statuses'] = dict(sorted(Counter(str(status) for status, _, _, _ in rows).items()))
+        summary['queries_mean'] = round(sum(queries for *_, queries in rows) / len(rows), 2)
+        summary['queries_max'] = max(queries for *_, queries in rows)
+        summary['bytes_mean'] = round(sum(size for _, _, size, _ in rows) / len(rows))
+        return summary
+
+    def report(self, results):
+        self.stdout.write(bench.format_summary('overall', results['overall']))
+        for name, route in results['routes'].items():
+            self.stdout.write(
+                f"{bench.format_summary(name, route)}   queries {route['queries_mean']:>6.1f}"
+                f"   {route['bytes_mean']:>8} B   {' '.join(f'{s}x{n}' for s, n in route['statuses'].items())}"
+            )
+
+    def compare(self, results, baseline, threshold):
+        regressions = []
+        for name, route in results['routes'].items():
+            before = baseline.get('routes', {}).get(name)
+            if not before:
+                continue
+            allowed = before['p95_ms'] * (1 + threshold / 100)
+            # Sub-millisecond jitter is not a regression
+            if route['p95_ms'] > allowed and route['p95_ms'] - before['p95_ms'] > 1:
+                regressions.append(f"{name}: p95 {before['p95_ms']} ms -> {route['p95_ms']} ms")
+            # Page cache hits vary a little with request interleaving
+            if route['queries_mean'] > before['queries_mean'] * 1.1:
+                regressions.append(f"{name}: queries {before['queries_mean']} -> {route['queries_mean']}")
+            if route['errors'] > before.get('errors', 0):
+                regressions.append(f"{name}: errors {before.get('errors', 0)} -> {route['errors']}")
+        return regressions
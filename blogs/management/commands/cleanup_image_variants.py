@@ -0,0 +1,36 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from blogs import images
+from blogs.models import Blog
+
+
+class Command(BaseCommand):
+    help = 'Deletes image variants that no post uses any more'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='List stale variants without deleting them')
+        parser.add_argument('--generate', action='store_true', help='Also create missing variants for every post')
+
+    def handle(self, *args, **options):
+        posts = Blog.objects.exclude(feauture_image='').only('pk', 'feauture_image')
+        fieldfiles = [post.feauture_image for post in posts.iterator()]
+
+        if options['generate']:
+            for fieldfile in fieldfiles:
+                images.generate(fieldfile)
+            self.stdout.write(self.style.SUCCESS(f'Variants ready for {len(fieldfiles)} images'))
+
+        in_use = images.referenced_digests(fieldfiles)
+        stale = [
+            name for name in images.stored_variants(default_storage)
+            if images.digest_from_name(name) not in in_use
+        ]
+        for name in stale:
+            if options['dry_run']:
+                self.stdout.write(f'Would delete {name}')
+            else:
+                default_storage.delete(name)
+
+        verb = 'Found' if options['dry_run'] else 'Deleted'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(stale)} stale variants'))
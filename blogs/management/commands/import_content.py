@@ -0,0 +1,56 @@
+import gzip
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blogs.importer import KINDS, Importer, read_records
+
+
+class Command(BaseCommand):
+    help = 'Streams users, posts or comments from a JSONL or CSV file (optionally .gz) into the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('path', help="Input file, or - for stdin")
+        parser.add_argument('--format', choices=('jsonl', 'csv'), help='Defaults to the file extension')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT and transaction (default 1000)')
+        parser.add_argument('--progress', type=int, default=10000, help='Report progress every N rows (default 10000)')
+        parser.add_argument(
+            '--no-create-categories', action='store_false', dest='create_categories',
+            help='Reject posts whose category does not exist instead of creating it',
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.removesuffix('.gz').endswith('.csv') else 'jsonl')
+        importer = Importer(options['kind'], options['batch_size'], options['create_categories'])
+
+        started = time.perf_counter()
+        next_report = options['progress']
+        with self.open(path) as stream:
+            for count in importer.run(read_records(stream, fmt)):
+                if count >= next_report:
+                    self.stdout.write(f'{count} rows  {count / (time.perf_counter() - started):.0f} rows/s')
+                    next_report = count + options['progress']
+        elapsed = time.perf_counter() - started
+
+        for line, reason in importer.errors:
+            self.stdout.write(self.style.WARNING(f'line {line}: {reason}'))
+        if importer.rejected > len(importer.errors):
+            self.stdout.write(self.style.WARNING(f'... and {importer.rejected - len(importer.errors)} more'))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {importer.imported} {options['kind']} in {elapsed:.1f}s "
+            f'({importer.imported / elapsed:.0f} rows/s), rejected {importer.rejected}'
+        ))
+
+    def open(self, path):
+        if path == '-':
+            return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        try:
+            if path.endswith('.gz'):
+                return gzip.open(path, 'rt', encoding='utf-8', newline='')
+            return open(path, encoding='utf-8', newline='')
+        except OSError as exc:
+            raise CommandError(exc)
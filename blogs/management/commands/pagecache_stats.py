@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blogs import page_cache
+
+
+class Command(BaseCommand):
+    help = 'Shows anonymous page cache hit/miss counts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after printing them')
+
+    def handle(self, *args, **options):
+        if not settings.PAGE_CACHE.get('STATS', False):
+            self.stderr.write(self.style.WARNING('Counting is off; set PAGE_CACHE_STATS=True to collect these'))
+        stats = page_cache.stats()
+        self.stdout.write(f"Hits:     {stats['hit']}")
+        self.stdout.write(f"Misses:   {stats['miss']}")
+        self.stdout.write(f"Bypassed: {stats['bypass']}")
+        self.stdout.write(self.style.SUCCESS(f"Hit ratio: {stats['hit_ratio']:.1%}"))
+        if options['reset']:
+            page_cache.reset_stats()
+            self.stdout.write(self.style.WARNING('Counters reset'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from blogs.models import Blog
+from blogs.search import get_backend, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index from all published posts'
+
+    def handle(self, *args, **options):
+        rebuild_index()
+        count = Blog.objects.filter(status='Published').count()
+        backend = type(get_backend()).__name__
+        self.stdout.write(
+            self.style.SUCCESS(f'Indexed {count} published post(s) with {backend}')
+        )
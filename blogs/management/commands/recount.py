@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from blogs.counters import drifted, drifted_days, recount
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the denormalized post and comment counters'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report categories and days whose counters have drifted',
+        )
+
+    def handle(self, *args, **options):
+        if options['check']:
+            stale = list(drifted())
+            for category in stale:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'{category.category_name}: stored {category.post_count}/{category.published_count}, '
+                        f'actual {category.actual}/{category.actual_published}'
+                    )
+                )
+            if not stale:
+                self.stdout.write(self.style.SUCCESS('All category counters are correct'))
+            stale_days = drifted_days()
+            for stored, actual in stale_days:
+                self.stdout.write(
+                    self.style.WARNING(
+                        f'{actual.date}: stored {stored.posts}/{stored.published}/{stored.comments}, '
+                        f'actual {actual.posts}/{actual.published}/{actual.comments}'
+                    )
+                )
+            if not stale_days:
+                self.stdout.write(self.style.SUCCESS('All daily stats are correct'))
+            return
+
+        categories, authors, posts, days = recount()
+        self.stdout.write(
+            self.style.SUCCESS(f'Recounted {categories} categories, {authors} authors, {posts} posts and {days} days')
+        )
@@ -0,0 +1,36 @@
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from blog_main.replicas import replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'Copies the SQLite primary into the SQLite replica files, standing in for replication locally'
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite files can be copied; real replicas follow the primary on their own')
+        aliases = replica_aliases()
+        if not aliases:
+            raise CommandError('No replicas configured; set DATABASE_REPLICA_URLS')
+
+        primary.ensure_connection()
+        for alias in aliases:
+            replica = connections[alias]
+            if replica.vendor != 'sqlite':
+                raise CommandError(f'{alias} is not SQLite')
+            # Drop our own handle first; the online backup replaces the file's pages in place
+            replica.close()
+            try:
+                target = sqlite3.connect(replica.settings_dict['NAME'])
+                try:
+                    primary.connection.backup(target)
+                finally:
+                    target.close()
+            except sqlite3.Error as e:
+                self.stderr.write(self.style.WARNING(f'Could not copy to {alias}: {e}'))
+                continue
+            self.stdout.write(self.style.SUCCESS(f'Copied {DEFAULT_DB_ALIAS} to {alias} ({replica.settings_dict["NAME"]})'))
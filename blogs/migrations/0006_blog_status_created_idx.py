@@ -0,0 +1,17 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0005_comment'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['status', 'created_at', 'id'], name='blog_status_created_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from blogs.search import get_backend
+
+    backend = get_backend(schema_editor.connection)
+    for sql in backend.create_sql:
+        schema_editor.execute(sql)
+    if backend.populate_sql:
+        schema_editor.execute(backend.populate_sql)
+
+
+def drop_search_index(apps, schema_editor):
+    from blogs.search import get_backend
+
+    for sql in get_backend(schema_editor.connection).drop_sql:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0006_blog_status_created_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
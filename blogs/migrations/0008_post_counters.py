@@ -0,0 +1,54 @@
+# Generated by Django 5.1.4 on 2026-10-18 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def backfill_counters(apps, schema_editor):
+    Category = apps.get_model('blogs', 'Category')
+    AuthorStats = apps.get_model('blogs', 'AuthorStats')
+    User = apps.get_model('auth', 'User')
+    published = Q(blog__status='Published')
+
+    for category in Category.objects.annotate(total=Count('blog'), live=Count('blog', filter=published)):
+        Category.objects.filter(pk=category.pk).update(post_count=category.total, published_count=category.live)
+
+    AuthorStats.objects.bulk_create([
+        AuthorStats(user_id=user.pk, post_count=user.total, published_count=user.live)
+        for user in User.objects.annotate(total=Count('blog'), live=Count('blog', filter=published))
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('blogs', '0007_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='post_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('post_count', models.PositiveIntegerField(default=0)),
+                ('published_count', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Author stats',
+            },
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='post_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='published_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
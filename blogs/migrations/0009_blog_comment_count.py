@@ -0,0 +1,26 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:02
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_comment_count(apps, schema_editor):
+    Blog = apps.get_model('blogs', 'Blog')
+    for blog in Blog.objects.annotate(total=Count('comments')).filter(total__gt=0):
+        Blog.objects.filter(pk=blog.pk).update(comment_count=blog.total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0008_post_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blog',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comment_count, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:28
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate
+
+
+def backfill_daily_stats(apps, schema_editor):
+    Blog = apps.get_model('blogs', 'Blog')
+    Comment = apps.get_model('blogs', 'Comment')
+    DailyStat = apps.get_model('blogs', 'DailyStat')
+    days = {}
+    posts = (
+        Blog.objects.annotate(day=TruncDate('created_at')).order_by().values('day')
+        .annotate(posts=Count('pk'), published=Count('pk', filter=Q(status='Published')))
+        .values_list('day', 'posts', 'published')
+    )
+    for day, total, published in posts:
+        days[day] = DailyStat(date=day, posts=total, published=published)
+    comments = Comment.objects.annotate(day=TruncDate('created_at')).order_by().values('day').annotate(n=Count('pk'))
+    for row in comments:
+        days.setdefault(row['day'], DailyStat(date=row['day'])).comments = row['n']
+    DailyStat.objects.bulk_create(days.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0009_blog_comment_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyStat',
+            fields=[
+                ('date', models.DateField(primary_key=True, serialize=False)),
+                ('posts', models.PositiveIntegerField(default=0)),
+                ('published', models.PositiveIntegerField(default=0)),
+                ('comments', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Daily stats',
+            },
+        ),
+        migrations.RunPython(backfill_daily_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:32
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_comment_count(apps, schema_editor):
+    AuthorStats = apps.get_model('blogs', 'AuthorStats')
+    Comment = apps.get_model('blogs', 'Comment')
+    for user_id, total in Comment.objects.order_by().values('user').annotate(total=Count('pk')).values_list('user', 'total'):
+        AuthorStats.objects.filter(user_id=user_id).update(comment_count=total)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0011_post_grid_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_comment_count, migrations.RunPython.noop),
+    ]
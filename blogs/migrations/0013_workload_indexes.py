@@ -0,0 +1,40 @@
+# Generated by Django 5.1.4 on 2026-10-18 18:37
+
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogs', '0012_author_comment_count'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='blog',
+            name='category',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='blogs.category'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['status', 'is_featured', 'created_at', 'id'], name='blog_featured_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['category', 'status', 'created_at', 'id'], name='blog_category_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='blog',
+            index=models.Index(fields=['category', 'created_at', 'id'], name='blog_category_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(django.db.models.functions.text.Lower('category_name'), name='category_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['blog', 'created_at', 'id'], name='comment_blog_created_idx'),
+        ),
+    ]
@@ -1,13 +1,32 @@
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User 
 
+class CategoryQuerySet(models.QuerySet):
+
+    def named(self, name):
+        """Case-insensitive name match, written as lower() = lower() so it can use category_name_lower_idx."""
+        # __iexact compiles to LIKE on SQLite and UPPER() on PostgreSQL, neither of which the index covers
+        return self.alias(name_lower=Lower('category_name')).filter(name_lower=Lower(Value(name)))
+
+
 class Category(models.Model):
     category_name = models.CharField(max_length=50, unique=True)
+    # Denormalized counters, kept current by blogs.counters
+    post_count = models.PositiveIntegerField(default=0)
+    published_count = models.PositiveIntegerField(default=0)
     created_at=models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = CategoryQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'Categories'
+        indexes = [
+            # add_category and edit_category check for clashing names ignoring case
+            models.Index(Lower('category_name'), name='category_name_lower_idx'),
+        ]
 
     def __str__(self):
         return self.category_name
@@ -18,21 +37,60 @@ STATUS_CHOICES = (
 
 )
     
+class BlogQuerySet(models.QuerySet):
+    """Named projections for post listings so each view doesn't rebuild its own filter."""
+
+    def published(self):
+        return self.filter(status="Published")
+
+    def with_relations(self):
+        # Author and category are shown on every card; join them instead of one query per row
+        return self.select_related('author', 'category')
+
+    def summaries(self):
+        # List pages never show the body, so leave the heaviest column behind
+        return self.with_relations().defer('blog_body')
+
+    def featured(self):
+        # is_featured=True compiles to a bare boolean term, which SQLite cannot match to an index
+        # column; IN (true) is planned as an equality and seeks on blog_featured_created_idx
+        return self.published().filter(is_featured__in=[True])
+
+
 class Blog(models.Model):
     title=models.CharField(max_length=100)
     slug=models.SlugField(max_length=150,unique=True,blank=True)
-    category = models.ForeignKey(Category,on_delete=models.CASCADE)
+    # No index of its own: blog_category_created_idx and blog_category_status_idx both lead with it
+    category = models.ForeignKey(Category,on_delete=models.CASCADE,db_index=False)
     author = models.ForeignKey(User,on_delete=models.CASCADE)
     feauture_image = models.ImageField(upload_to='uploads/%y/%m/%d')
     short_description =models.TextField(max_length=500)
     blog_body=models.TextField(max_length=2000)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES,default="Draft")
     is_featured = models.BooleanField(default=False)
+    # Denormalized, kept current by blogs.counters
+    comment_count = models.PositiveIntegerField(default=0)
     created_at=models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = BlogQuerySet.as_manager()
+
     class Meta:
         verbose_name_plural = 'Blogs'
+        indexes = [
+            # Keyset pagination seeks on (created_at, id) within published posts
+            models.Index(fields=['status', 'created_at', 'id'], name='blog_status_created_idx'),
+            # The home page's featured strip, newest first (see BlogQuerySet.featured)
+            models.Index(fields=['status', 'is_featured', 'created_at', 'id'], name='blog_featured_created_idx'),
+            # Category pages and feeds page through one category's published posts
+            models.Index(fields=['category', 'status', 'created_at', 'id'], name='blog_category_status_idx'),
+            # ...and the post grid through all of them, drafts included
+            models.Index(fields=['category', 'created_at', 'id'], name='blog_category_created_idx'),
+            # The dashboard post grid (dashboards/grid.py) sorts every post, or one author's, by these
+            models.Index(fields=['created_at', 'id'], name='blog_created_idx'),
+            models.Index(fields=['title', 'id'], name='blog_title_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='blog_author_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -46,7 +104,39 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # A post's comments are paged newest first by (created_at, id)
+            models.Index(fields=['blog', 'created_at', 'id'], name='comment_blog_created_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} - {self.blog.title[:30]}'
-    
\ No newline at end of file
+    
+
+class AuthorStats(models.Model):
+    """Per-user post and comment counters, kept current by blogs.counters."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='post_stats')
+    post_count = models.PositiveIntegerField(default=0)
+    published_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Author stats'
+
+    def __str__(self):
+        return f'{self.user.username} - {self.post_count} posts'
+
+
+class DailyStat(models.Model):
+    """Posts and comments per day of creation, kept current by blogs.counters."""
+    date = models.DateField(primary_key=True)
+    posts = models.PositiveIntegerField(default=0)
+    # Posts created that day which are published now
+    published = models.PositiveIntegerField(default=0)
+    comments = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'Daily stats'
+
+    def __str__(self):
+        return f'{self.date}: {self.posts} posts, {self.comments} comments'
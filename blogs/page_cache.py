@@ -0,0 +1,177 @@
+"""
+Full-page cache for anonymous readers.
+
+Cached pages are keyed by URL plus the current value of every version stamp
+they depend on. Saving or deleting content bumps the matching stamps once
+its transaction commits (see blogs.signals), so stale entries are never
+served; they simply stop being looked up and expire on their own.
+
+Version stamps:
+    chrome            categories, social links, about box (every page)
+    posts             any post change (home, categories list)
+    category:<id>     posts in one category
+    post:<slug>       one post and its comments
+
+Stamps and stats live in the default cache; page bodies in PAGE_CACHE['CACHE']
+so that culling pages can never evict a stamp.
+"""
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+
+VERSION_PREFIX = 'pagecache:v:'
+STATS_PREFIX = 'pagecache:stats:'
+STAT_NAMES = ('hit', 'miss', 'bypass')
+SKIPPED_HEADERS = {'set-cookie', 'x-page-cache'}
+
+
+def _config(name, default):
+    return getattr(settings, 'PAGE_CACHE', {}).get(name, default)
+
+
+def pages():
+    return caches[_config('CACHE', 'default')]
+
+
+def bump(*names):
+    """Invalidate every page that depends on any of these version stamps."""
+    stamp = time.time_ns()
+    cache.set_many({VERSION_PREFIX + name: stamp for name in names}, None)
+
+
+def bump_on_commit(*names):
+    """
+    bump() once the current transaction commits, or now outside one.
+
+    Bumping earlier lets a concurrent reader fetch the new stamp, render the
+    old rows and store them under it until TIMEOUT.
+    """
+    transaction.on_commit(lambda: bump(*names))
+
+
+def get_versions(names):
+    keys = [VERSION_PREFIX + name for name in names]
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        # A stamp that fell out of the cache must never read as an old value again
+        stamp = time.time_ns()
+        for key in missing:
+            cache.add(key, stamp, None)
+        found.update(cache.get_many(missing))
+    return [found.get(key, 0) for key in keys]
+
+
+def record(stat):
+    if not _config('STATS', False):
+        return
+    key = STATS_PREFIX + stat
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
+
+
+def stats():
+    values = cache.get_many([STATS_PREFIX + name for name in STAT_NAMES])
+    result = {name: values.get(STATS_PREFIX + name, 0) for name in STAT_NAMES}
+    lookups = result['hit'] + result['miss']
+    result['hit_ratio'] = result['hit'] / lookups if lookups else 0.0
+    return result
+
+
+def reset_stats():
+    cache.delete_many([STATS_PREFIX + name for name in STAT_NAMES])
+
+
+def is_cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Flash messages are per-visitor; never cache or serve over them
+    return not len(messages.get_messages(request))
+
+
+def page_key(request, versions):
+    raw = '|'.join([request.get_full_path()] + [str(v) for v in versions])
+    return 'pagecache:page:' + hashlib.md5(raw.encode()).hexdigest()
+
+
+def lookup(request, dependencies, kwargs):
+    """
+    Find the cached page for this request.
+
+    Returns ``(key, response)``: no key means the request bypasses the
+    cache, a key without a response is a miss that ``store()`` should fill.
+    """
+    if not _config('ENABLED', True) or not is_cacheable(request):
+        record('bypass')
+        return None, None
+
+    names = ['chrome'] + [name.format(**kwargs) for name in dependencies]
+    key = page_key(request, get_versions(names))
+    cached = pages().get(key)
+    if cached is None:
+        record('miss')
+        return key, None
+
+    record('hit')
+    status, headers, content = cached
+    response = HttpResponse(content, status=status)
+    for header, value in headers:
+        response[header] = value
+    response['X-Page-Cache'] = 'HIT'
+    return key, response
+
+
+def store(key, response):
+    if key is None:
+        response['X-Page-Cache'] = 'BYPASS'
+        return response
+    if response.status_code == 200 and not response.streaming and not response.cookies:
+        headers = [
+            (header, value) for header, value in response.items()
+            if header.lower() not in SKIPPED_HEADERS
+        ]
+        pages().set(key, (response.status_code, headers, response.content), _config('TIMEOUT', 600))
+    response['X-Page-Cache'] = 'MISS'
+    return response
+
+
+def cache_anonymous_page(*dependencies):
+    """
+    Serve this view from the page cache for anonymous GET/HEAD requests.
+
+    ``dependencies`` are version stamp names, formatted with the view's URL
+    kwargs, e.g. ``@cache_anonymous_page('post:{slug}')``. ``chrome`` is
+    always included because every page renders the site navigation. Works
+    on both sync and async views.
+    """
+    def decorator(view):
+        if iscoroutinefunction(view):
+            @functools.wraps(view)
+            async def async_wrapper(request, *args, **kwargs):
+                key, cached = await sync_to_async(lookup)(request, dependencies, kwargs)
+                if cached is not None:
+                    return cached
+                response = await view(request, *args, **kwargs)
+                return await sync_to_async(store)(key, response)
+            return async_wrapper
+
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            key, cached = lookup(request, dependencies, kwargs)
+            if cached is not None:
+                return cached
+            return store(key, view(request, *args, **kwargs))
+        return wrapper
+    return decorator
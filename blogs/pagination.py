@@ -0,0 +1,135 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+
+def encode_cursor(created_at, pk):
+    raw = f'{created_at.isoformat()}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Turn a cursor back into (created_at, pk). Bad cursors return None."""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode()).decode()
+        created_at, pk = raw.split('|', 1)
+        created_at, pk = datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    # encode_cursor() always writes an aware timestamp; a naive one was edited by hand
+    if settings.USE_TZ and timezone.is_naive(created_at):
+        return None
+    return created_at, pk
+
+
+class KeysetPage:
+    """One page of a listing ordered newest first by (created_at, id)."""
+
+    def __init__(self, items, newer_cursor, older_cursor, query_params):
+        self.items = items
+        self.newer_cursor = newer_cursor
+        self.older_cursor = older_cursor
+        self.query_params = query_params
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def has_newer(self):
+        return self.newer_cursor is not None
+
+    @property
+    def has_older(self):
+        return self.older_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_newer or self.has_older
+
+    def _url(self, key, cursor):
+        params = self.query_params.copy()
+        params.pop('before', None)
+        params.pop('after', None)
+        params[key] = cursor
+        return '?' + params.urlencode()
+
+    @property
+    def newer_url(self):
+        return self._url('after', self.newer_cursor) if self.has_newer else None
+
+    @property
+    def older_url(self):
+        return self._url('before', self.older_cursor) if self.has_older else None
+
+
+def keyset_window(request, queryset, per_page=None):
+    """
+    The unevaluated LIMIT query behind one page, plus the direction it reads in.
+
+    ?before=<cursor> walks to older posts and ?after=<cursor> back to newer
+    ones. Each page seeks on the (status, created_at, id) index, so page 500
+    costs the same as page 1. The extra row tells us whether another page
+    exists.
+    """
+    per_page = per_page or getattr(settings, 'BLOG_POSTS_PER_PAGE', 10)
+    after = decode_cursor(request.GET.get('after'))
+    if after:
+        created_at, pk = after
+        window = (
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk))
+            .order_by('created_at', 'id')
+        )
+        return window[:per_page + 1], 'newer'
+
+    before = decode_cursor(request.GET.get('before'))
+    if before:
+        created_at, pk = before
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk))
+    return queryset.order_by('-created_at', '-id')[:per_page + 1], 'older'
+
+
+def build_page(request, rows, direction, per_page):
+    if direction == 'newer':
+        has_more_newer = len(rows) > per_page
+        items = rows[:per_page][::-1]
+        has_more_older = True
+    else:
+        has_more_older = len(rows) > per_page
+        items = rows[:per_page]
+        has_more_newer = decode_cursor(request.GET.get('before')) is not None
+
+    newer_cursor = older_cursor = None
+    if items:
+        if has_more_newer:
+            newer_cursor = encode_cursor(items[0].created_at, items[0].pk)
+        if has_more_older:
+            older_cursor = encode_cursor(items[-1].created_at, items[-1].pk)
+
+    return KeysetPage(items, newer_cursor, older_cursor, request.GET)
+
+
+def paginate_keyset(request, queryset, per_page=None):
+    """Keyset pagination over (created_at, id), newest first; see keyset_window()."""
+    per_page = per_page or getattr(settings, 'BLOG_POSTS_PER_PAGE', 10)
+    window, direction = keyset_window(request, queryset, per_page)
+    return build_page(request, list(window), direction, per_page)
+
+
+async def apaginate_keyset(request, queryset, per_page=None):
+    """paginate_keyset() for async views, fetching the window with the async ORM."""
+    per_page = per_page or getattr(settings, 'BLOG_POSTS_PER_PAGE', 10)
+    window, direction = keyset_window(request, queryset, per_page)
+    rows = [row async for row in window]
+    return build_page(request, rows, direction, per_page)
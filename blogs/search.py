@@ -0,0 +1,269 @@
+"""
+Full-text search over published posts.
+
+The inverted index lives in ``blogs_search_index``: an FTS5 virtual table on
+SQLite and a tsvector column with a GIN index on PostgreSQL. Both are created
+by migration 0007 and kept in sync by the Blog save/delete signals. Views only
+ever call ``search_posts()``; the backend is picked from the active database.
+
+Unlike the public post listings (blogs/pagination.py), results are paged by
+LIMIT/OFFSET, capped at MAX_PAGE. A rank is no stable cursor key: it moves
+with every post indexed, so a (rank, id) cursor would skip or repeat hits.
+Nor would it save work, since every match is scored before the ORDER BY;
+OFFSET only adds skipping rows already scored.
+"""
+import re
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import Blog
+
+INDEX_TABLE = 'blogs_search_index'
+
+# Highlight markers that cannot appear in user text; swapped for <mark> after escaping.
+MARK_START = '\x02'
+MARK_END = '\x03'
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# Nobody pages this deep through ranked results, and OFFSET has to skip every row before the page
+MAX_PAGE = 100
+
+
+def tokenize(query):
+    return TOKEN_RE.findall((query or '').lower())[:10]
+
+
+def highlight(text):
+    """Escape indexed text and turn the backend's markers into <mark> tags."""
+    text = escape(text or '')
+    return mark_safe(text.replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SearchHit:
+    def __init__(self, blog, score, snippet):
+        self.blog = blog
+        self.score = score
+        self.snippet = snippet
+
+
+class SearchPage:
+    def __init__(self, hits, number, has_next, query_params):
+        self.hits = hits
+        self.number = number
+        self.has_next = has_next
+        self.query_params = query_params
+
+    def __iter__(self):
+        return iter(self.hits)
+
+    def __len__(self):
+        return len(self.hits)
+
+    def __bool__(self):
+        return bool(self.hits)
+
+    @property
+    def has_previous(self):
+        return self.number > 1
+
+    def _url(self, number):
+        params = self.query_params.copy()
+        params['page'] = number
+        return '?' + params.urlencode()
+
+    @property
+    def next_url(self):
+        return self._url(self.number + 1) if self.has_next else None
+
+    @property
+    def previous_url(self):
+        return self._url(self.number - 1) if self.has_previous else None
+
+
+class SQLiteBackend:
+    """FTS5 with the built-in bm25() ranking; title hits weigh most."""
+
+    create_sql = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {INDEX_TABLE} USING fts5("
+        "title, short_description, blog_body, tokenize='porter unicode61')",
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {INDEX_TABLE}']
+    populate_sql = (
+        f'INSERT INTO {INDEX_TABLE}(rowid, title, short_description, blog_body) '
+        "SELECT id, title, short_description, blog_body FROM blogs_blog WHERE status = 'Published'"
+    )
+
+    def index(self, cursor, blog):
+        cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s', [blog.pk])
+        cursor.execute(
+            f'INSERT INTO {INDEX_TABLE}(rowid, title, short_description, blog_body) VALUES (%s, %s, %s, %s)',
+            [blog.pk, blog.title, blog.short_description, blog.blog_body],
+        )
+
+    def remove(self, cursor, blog_id):
+        cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE rowid = %s', [blog_id])
+
+    def clear(self, cursor):
+        cursor.execute(f'DELETE FROM {INDEX_TABLE}')
+
+    def query(self, cursor, terms, limit, offset):
+        match = ' '.join(f'"{term}"*' for term in terms)
+        cursor.execute(
+            f"SELECT rowid, bm25({INDEX_TABLE}, 10.0, 4.0, 1.0) AS score, "
+            f"snippet({INDEX_TABLE}, -1, %s, %s, '…', 24) "
+            f"FROM {INDEX_TABLE} WHERE {INDEX_TABLE} MATCH %s "
+            "ORDER BY score, rowid DESC LIMIT %s OFFSET %s",
+            [MARK_START, MARK_END, match, limit, offset],
+        )
+        # bm25() is "lower is better"; flip it so callers can sort descending.
+        return [(pk, -score, snippet) for pk, score, snippet in cursor.fetchall()]
+
+
+class PostgresBackend:
+    """Weighted tsvector + GIN; ts_rank_cd with length normalisation."""
+
+    document_sql = (
+        "setweight(to_tsvector('english', coalesce(%s, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(%s, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(%s, '')), 'C')"
+    )
+    create_sql = [
+        f'CREATE TABLE IF NOT EXISTS {INDEX_TABLE} ('
+        'blog_id bigint PRIMARY KEY REFERENCES blogs_blog(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, '
+        'document tsvector NOT NULL)',
+        f'CREATE INDEX IF NOT EXISTS {INDEX_TABLE}_document_gin ON {INDEX_TABLE} USING GIN (document)',
+    ]
+    drop_sql = [f'DROP TABLE IF EXISTS {INDEX_TABLE}']
+    populate_sql = (
+        f'INSERT INTO {INDEX_TABLE}(blog_id, document) '
+        "SELECT id, "
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(short_description, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(blog_body, '')), 'C') "
+        "FROM blogs_blog WHERE status = 'Published'"
+    )
+
+    def index(self, cursor, blog):
+        cursor.execute(
+            f'INSERT INTO {INDEX_TABLE}(blog_id, document) VALUES (%s, {self.document_sql}) '
+            'ON CONFLICT (blog_id) DO UPDATE SET document = EXCLUDED.document',
+            [blog.pk, blog.title, blog.short_description, blog.blog_body],
+        )
+
+    def remove(self, cursor, blog_id):
+        cursor.execute(f'DELETE FROM {INDEX_TABLE} WHERE blog_id = %s', [blog_id])
+
+    def clear(self, cursor):
+        cursor.execute(f'TRUNCATE {INDEX_TABLE}')
+
+    def query(self, cursor, terms, limit, offset):
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        options = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=35, MinWords=15'
+        cursor.execute(
+            "SELECT b.id, ts_rank_cd(s.document, q, 32) AS score, "
+            "ts_headline('english', b.short_description || ' ' || b.blog_body, q, %s) "
+            f"FROM {INDEX_TABLE} s JOIN blogs_blog b ON b.id = s.blog_id, "
+            "to_tsquery('english', %s) q "
+            "WHERE s.document @@ q ORDER BY score DESC, b.id DESC LIMIT %s OFFSET %s",
+            [options, tsquery, limit, offset],
+        )
+        return cursor.fetchall()
+
+
+class FallbackBackend:
+    """Unindexed icontains matching for databases without a native engine."""
+
+    create_sql = drop_sql = []
+    populate_sql = None
+
+    def index(self, cursor, blog):
+        pass
+
+    def remove(self, cursor, blog_id):
+        pass
+
+    def clear(self, cursor):
+        pass
+
+    def query(self, cursor, terms, limit, offset):
+        condition = Q()
+        for term in terms:
+            condition &= (
+                Q(title__icontains=term) |
+                Q(short_description__icontains=term) |
+                Q(blog_body__icontains=term)
+            )
+        rows = (
+            Blog.objects.filter(condition, status='Published')
+            .order_by('-created_at', '-id')
+            .values_list('id', 'short_description')[offset:offset + limit]
+        )
+        return [(pk, 0.0, text) for pk, text in rows]
+
+
+BACKENDS = {
+    'sqlite': SQLiteBackend,
+    'postgresql': PostgresBackend,
+}
+
+
+def get_backend(conn=None):
+    conn = conn or connection
+    return BACKENDS.get(conn.vendor, FallbackBackend)()
+
+
+def index_post(blog):
+    """Add, refresh or drop one post depending on whether it is published."""
+    backend = get_backend()
+    with connection.cursor() as cursor:
+        if blog.status == 'Published':
+            backend.index(cursor, blog)
+        else:
+            backend.remove(cursor, blog.pk)
+
+
+def remove_post(blog_id):
+    with connection.cursor() as cursor:
+        get_backend().remove(cursor, blog_id)
+
+
+def rebuild_index():
+    """Drop every index row and re-index all published posts in one statement."""
+    backend = get_backend()
+    with transaction.atomic(), connection.cursor() as cursor:
+        backend.clear(cursor)
+        if backend.populate_sql:
+            cursor.execute(backend.populate_sql)
+
+
+def search_posts(query, page=1, per_page=None, query_params=None):
+    """
+    Ranked search over published posts.
+
+    Returns a SearchPage of SearchHit(blog, score, snippet). Costs one
+    index query plus one primary-key fetch for the page of posts.
+    """
+    per_page = per_page or getattr(settings, 'BLOG_POSTS_PER_PAGE', 10)
+    terms = tokenize(query)
+    if not terms:
+        return SearchPage([], 1, False, query_params)
+
+    page = min(max(page, 1), MAX_PAGE)
+    offset = (page - 1) * per_page
+    with connection.cursor() as cursor:
+        rows = get_backend().query(cursor, terms, per_page + 1, offset)
+
+    has_next = len(rows) > per_page and page < MAX_PAGE
+    rows = rows[:per_page]
+    blogs = Blog.objects.summaries().in_bulk([pk for pk, _, _ in rows])
+    hits = [
+        SearchHit(blogs[pk], score, highlight(snippet))
+        for pk, score, snippet in rows
+        if pk in blogs
+    ]
+    return SearchPage(hits, page, has_next, query_params)
@@ -0,0 +1,148 @@
+from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from assignments.models import About, SocialLink
+from blog_main import auth_cache
+
+from . import counters, images, page_cache, search
+from .models import AuthorStats, Blog, Category, Comment
+
+
+@receiver(post_init, sender=Blog)
+def remember_original_state(sender, instance, **kwargs):
+    instance._counter_state = counters.snapshot(instance)
+    instance._original_slug = instance.__dict__.get('slug')
+    image = instance.__dict__.get('feauture_image')
+    instance._original_image = getattr(image, 'name', image)
+
+
+@receiver(post_save, sender=Blog)
+def update_search_index(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    search.index_post(instance)
+
+
+@receiver(post_save, sender=Blog)
+def update_post_counters(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.post_added(instance)
+    else:
+        counters.post_changed(instance._counter_state, instance)
+
+
+@receiver(post_save, sender=Blog)
+@receiver(post_delete, sender=Blog)
+def invalidate_post_pages(sender, instance, **kwargs):
+    names = {'posts', f'post:{instance.slug}', f'category:{instance.category_id}'}
+    if instance._original_slug:
+        names.add(f'post:{instance._original_slug}')
+    if instance._counter_state:
+        names.add(f'category:{instance._counter_state[0]}')
+    page_cache.bump_on_commit(*names)
+
+
+@receiver(post_save, sender=Blog)
+def create_image_variants(sender, instance, raw=False, **kwargs):
+    image = instance.feauture_image
+    if raw or not image or image.name == instance._original_image:
+        return
+    # Render after commit so a failed save never leaves orphaned files behind
+    transaction.on_commit(lambda: images.generate(image))
+
+
+@receiver(post_save, sender=Blog)
+def refresh_original_state(sender, instance, **kwargs):
+    # Must stay the last post_save receiver: the ones above compare against the old state
+    remember_original_state(sender, instance)
+
+
+@receiver(post_delete, sender=Blog)
+def remove_from_search_index(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_delete, sender=Blog)
+def decrement_post_counters(sender, instance, **kwargs):
+    counters.post_removed(instance)
+
+
+def deleted_with_post(comment, origin):
+    """True when a comment is going because the post it belongs to is being deleted."""
+    return comment.blog_id in getattr(origin, '_deleted_post_ids', ())
+
+
+@receiver(pre_delete, sender=Blog)
+def remove_post_comments_from_counters(sender, instance, origin=None, **kwargs):
+    # Done once here; the per-comment receivers below skip comments deleted with their post.
+    # Whatever was deleted (a post, a category, a user), the cascade sends every pre_delete
+    # before any post_delete, and the set lives on the origin for just this delete().
+    counters.post_comments_removed(instance)
+    if origin is not None:
+        if not hasattr(origin, '_deleted_post_ids'):
+            origin._deleted_post_ids = set()
+        origin._deleted_post_ids.add(instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def increment_comment_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.comment_added(instance)
+
+
+@receiver(post_delete, sender=Comment)
+def decrement_comment_count(sender, instance, origin=None, **kwargs):
+    if not deleted_with_post(instance, origin):
+        counters.comment_removed(instance)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_pages(sender, instance, origin=None, **kwargs):
+    if deleted_with_post(instance, origin):
+        # invalidate_post_pages covers the post's own page
+        return
+    if Comment.blog.is_cached(instance):
+        slug = instance.blog.slug
+    else:
+        slug = Blog.objects.filter(pk=instance.blog_id).values_list('slug', flat=True).first()
+    if slug:
+        page_cache.bump_on_commit(f'post:{slug}')
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_pages(sender, instance, **kwargs):
+    page_cache.bump_on_commit('chrome', f'category:{instance.pk}')
+
+
+@receiver(post_save, sender=About)
+@receiver(post_delete, sender=About)
+@receiver(post_save, sender=SocialLink)
+@receiver(post_delete, sender=SocialLink)
+def invalidate_site_chrome(sender, **kwargs):
+    page_cache.bump_on_commit('chrome')
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Edits, password changes and logins (last_login) reach the next request at once
+    auth_cache.invalidate(instance.pk)
+
+
+@receiver(user_logged_out)
+def forget_logged_out_user(sender, request, user, **kwargs):
+    if user is not None:
+        auth_cache.invalidate(user.pk)
@@ -0,0 +1,102 @@
+"""
+Unique slug allocation for blog posts.
+
+Instead of probing ``slug``, ``slug-1``, ``slug-2``... one query at a time,
+the allocator loads every slug of the form ``base`` or ``base-...`` in one
+indexed range query and takes the next suffix after the highest one in use. Two writers can still
+pick the same slug at the same moment, so ``save_with_unique_slug`` saves
+inside a savepoint and re-allocates when the unique index rejects it.
+"""
+import re
+
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils.text import slugify
+
+from .models import Blog
+
+MAX_LENGTH = Blog._meta.get_field('slug').max_length
+SUFFIX_ROOM = 8  # "-" plus up to 7 digits
+# Prefixes per query; SQLite refuses expression trees deeper than 1000
+PREFETCH_CHUNK = 250
+SUFFIXED = re.compile(r'(.+)-(\d+)')
+
+
+def base_slug(text):
+    return slugify(text)[:MAX_LENGTH - SUFFIX_ROOM].strip('-') or 'post'
+
+
+class SlugAllocator:
+    """
+    Hands out unique slugs, remembering what it has already handed out.
+
+    One instance can serve a whole bulk import: ``prefetch()`` loads the
+    slugs for a batch of titles in one query, and later ``allocate()`` calls
+    for those titles need no query at all.
+    """
+
+    def __init__(self, exclude_pk=None):
+        self.exclude_pk = exclude_pk
+        # base -> (base itself taken?, highest numeric suffix in use)
+        self.taken = {}
+
+    def prefetch(self, texts):
+        bases = sorted({base_slug(text) for text in texts} - set(self.taken))
+        for start in range(0, len(bases), PREFETCH_CHUNK):
+            chunk = bases[start:start + PREFETCH_CHUNK]
+            condition = Q()
+            for base in chunk:
+                # The base itself or "base-...": a range on the unique index, where LIKE would scan
+                condition |= Q(slug=base) | Q(slug__gte=f'{base}-', slug__lt=f'{base}.')
+            slugs = Blog.objects.filter(condition)
+            if self.exclude_pk is not None:
+                slugs = slugs.exclude(pk=self.exclude_pk)
+            found = {base: (False, 0) for base in chunk}
+            # One pass over the matches: short bases like "post" also match "post-10-2"
+            for slug in slugs.values_list('slug', flat=True):
+                if slug in found:
+                    found[slug] = (True, found[slug][1])
+                match = SUFFIXED.fullmatch(slug)
+                if match and match.group(1) in found:
+                    used, highest = found[match.group(1)]
+                    found[match.group(1)] = (used, max(highest, int(match.group(2))))
+            self.taken.update(found)
+
+    def allocate(self, text):
+        base = base_slug(text)
+        if base not in self.taken:
+            self.prefetch([base])
+        used, highest = self.taken[base]
+        if used:
+            highest += 1
+            slug = f'{base}-{highest}'
+        else:
+            slug = base
+        self.taken[base] = (True, highest)
+        return slug
+
+
+def allocate_slug(text, exclude_pk=None):
+    """Next free slug for ``text`` in one query. ``exclude_pk`` lets a post keep its own slug."""
+    return SlugAllocator(exclude_pk=exclude_pk).allocate(text)
+
+
+def save_with_unique_slug(blog, source=None, attempts=5):
+    """
+    Give ``blog`` a free slug derived from ``source`` (default: its title) and save it.
+
+    A concurrent writer that grabs the same slug first makes our INSERT or
+    UPDATE fail on the unique index; we roll back to the savepoint, pick the
+    next suffix and try again.
+    """
+    source = source or blog.title
+    for attempt in range(attempts):
+        blog.slug = allocate_slug(source, exclude_pk=blog.pk)
+        try:
+            with transaction.atomic():
+                blog.save()
+            return blog
+        except IntegrityError:
+            slug_taken = Blog.objects.filter(slug=blog.slug).exclude(pk=blog.pk).exists()
+            if not slug_taken or attempt == attempts - 1:
+                raise
@@ -0,0 +1,34 @@
+from django import template
+
+from blogs import images
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/picture.html')
+def responsive_image(image, alt='', sizes='100vw', css_class='', style='', loading='lazy', fallback_width=640):
+    """
+    A <picture> with WebP and JPEG srcsets for a feature image.
+
+    Usage: {% responsive_image post.feauture_image alt=post.title sizes="(min-width: 768px) 50vw, 100vw" %}
+    """
+    return {
+        'image': image,
+        'picture': images.picture(image, fallback_width=fallback_width),
+        'alt': alt,
+        'sizes': sizes,
+        'css_class': css_class,
+        'style': style,
+        'loading': loading,
+    }
+
+
+@register.filter
+def variant_url(image, width):
+    """URL of a JPEG rendition at least ``width`` pixels wide, e.g. for CSS backgrounds."""
+    return images.variant_url(image, int(width))
+
+
+@register.filter
+def variant_url_webp(image, width):
+    return images.variant_url(image, int(width), fmt='webp')
@@ -1,3 +1,972 @@
-from django.test import TestCase
+"""
+Tests for the blog's hot paths: query plans, keyset pagination and the
+bookkeeping that keeps stored counters and slugs in step with the rows.
+"""
+import base64
+import csv
+import gzip
+import io
+import json
+import re
+import shutil
+import tempfile
+import time
+import types
+import unittest
+import xml.etree.ElementTree as ElementTree
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.db import IntegrityError, connection
+from django.http import QueryDict, StreamingHttpResponse
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from blog_main.urls import build_urlpatterns
+from blog_main.views import featured_posts_window, home_state
+from dashboards.grid import PostGrid
+from PIL import Image
+
+from . import context_processors, counters, exporter, feeds, images, page_cache
+from .conditional import post_state
+from .importer import Importer
+from .models import AuthorStats, Blog, Category, Comment, DailyStat
+from .search import MAX_PAGE, search_posts
+from .slugs import SlugAllocator, allocate_slug, save_with_unique_slug
+from .pagination import decode_cursor, encode_cursor, keyset_window, paginate_keyset
+from .views import blog_comments, category_posts, search_params
+
+# SQLite: "SCAN <table>" without an index is a full table scan; a temp B-tree is a sort in memory.
+# An index-ordered "SCAN ... USING INDEX" is allowed: under a LIMIT it stops after the page.
+SQLITE_FULL_SCAN = re.compile(r'\bSCAN (?!.*\bUSING\b.*\bINDEX\b)(?!CONSTANT ROW)\S+')
+SQLITE_SORT = re.compile(r'USE TEMP B-TREE FOR (ORDER|GROUP) BY')
+# PostgreSQL, with sequential scans and sorts disabled so any left are unavoidable
+POSTGRES_FULL_SCAN = re.compile(r'\bSeq Scan on\b')
+POSTGRES_SORT = re.compile(r'(^|->)\s*(Incremental )?Sort\b', re.MULTILINE)
+
+
+class QueryPlanTests(TestCase):
+    """
+    Each test EXPLAINs one hot queryset and fails when the plan reads a whole
+    table or sorts rows that an index should already return in order. Dropping
+    or reshaping an index, or a queryset drifting away from one, shows up here
+    instead of as production latency. Plans come from the schema alone (no
+    ANALYZE), which is what a fresh deployment runs with.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('planner', 'planner@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Plans')
+        cls.blog = Blog.objects.create(
+            title='Query plans', slug='query-plans', category=cls.category, author=cls.author,
+            short_description='short', blog_body='body', status='Published', is_featured=True,
+        )
+        cls.comment = Comment.objects.create(user=cls.author, blog=cls.blog, comment='Indexed')
+
+    def setUp(self):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Tiny test tables always look cheaper to scan; only index-less plans should remain
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                cursor.execute('SET LOCAL enable_sort = off')
+        elif connection.vendor != 'sqlite':
+            raise unittest.SkipTest(f'No plan checks for {connection.vendor}')
+
+    def request(self, **params):
+        return RequestFactory().get('/', params)
+
+    def cursor_of(self, row):
+        return encode_cursor(row.created_at, row.pk)
+
+    def assertIndexed(self, queryset, index=None):
+        """No full scan or unindexed sort; with ``index``, the plan must also use that index."""
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            full_scan, sort = SQLITE_FULL_SCAN, SQLITE_SORT
+        else:
+            full_scan, sort = POSTGRES_FULL_SCAN, POSTGRES_SORT
+        self.assertIsNone(full_scan.search(plan), f'Full table scan in:\n{plan}\n\nfor:\n{queryset.query}')
+        self.assertIsNone(sort.search(plan), f'Sort without an index in:\n{plan}\n\nfor:\n{queryset.query}')
+        if index:
+            self.assertIn(index, plan, f'{index} unused in:\n{plan}\n\nfor:\n{queryset.query}')
+
+    def assertWindowsIndexed(self, queryset, row, index, per_page=None):
+        """The first page and both cursor directions of a keyset listing."""
+        for params in ({}, {'before': self.cursor_of(row)}, {'after': self.cursor_of(row)}):
+            with self.subTest(params=params):
+                window, _ = keyset_window(self.request(**params), queryset, per_page)
+                self.assertIndexed(window, index)
+
+    def test_home_featured(self):
+        self.assertIndexed(featured_posts_window(), 'blog_featured_created_idx')
+
+    def test_home_latest(self):
+        self.assertWindowsIndexed(Blog.objects.published().summaries(), self.blog, 'blog_status_created_idx')
+
+    def test_category_page(self):
+        self.assertWindowsIndexed(category_posts(self.category.pk), self.blog, 'blog_category_status_idx')
+
+    def test_post_detail(self):
+        self.assertIndexed(Blog.objects.published().with_relations().filter(slug=self.blog.slug))
+
+    def test_post_comments(self):
+        self.assertWindowsIndexed(blog_comments(self.blog), self.comment, 'comment_blog_created_idx', per_page=20)
+
+    def test_feeds(self):
+        # As feeds.feed_response reads them
+        for posts, index in (
+            (Blog.objects.published(), 'blog_status_created_idx'),
+            (Blog.objects.published().filter(category=self.category), 'blog_category_status_idx'),
+        ):
+            self.assertIndexed(posts.order_by('-created_at', '-id').values_list('pk', 'updated_at')[:20], index)
+
+    def test_dashboard_recent_posts(self):
+        self.assertIndexed(
+            Blog.objects.filter(author=self.author).summaries().order_by('-created_at')[:10], 'blog_author_created_idx'
+        )
+
+    def test_post_grid(self):
+        staff = User(pk=0, is_staff=True)
+        for user, params, index in (
+            (staff, '', 'blog_created_idx'),
+            (staff, 'sort=title', 'blog_title_idx'),
+            (staff, 'status=Published&sort=-status', 'blog_status_created_idx'),
+            (staff, f'category={self.category.pk}', 'blog_category_created_idx'),
+            (self.author, 'sort=-created', 'blog_author_created_idx'),
+        ):
+            with self.subTest(user=user.pk, params=params):
+                self.assertIndexed(PostGrid(QueryDict(params), user).queryset()[:25], index)
+
+    def test_category_name_lookup(self):
+        self.assertIndexed(Category.objects.named('PLANS'), 'category_name_lower_idx')
+        self.assertTrue(Category.objects.named('PLANS').exists())
+
+
+class KeysetPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('pager', 'pager@example.com', 'pw')
+        category = Category.objects.create(category_name='Paging')
+        start = timezone.now().replace(microsecond=0)
+        # Posts 2, 3 and 4 share one timestamp, so only the id keeps their order
+        offsets = [0, 1, 2, 2, 2, 3, 4]
+        for number, offset in enumerate(offsets):
+            blog = Blog.objects.create(
+                title=f'Page {number}', slug=f'page-{number}', category=category, author=author,
+                short_description='short', blog_body='body', status='Published',
+            )
+            Blog.objects.filter(pk=blog.pk).update(created_at=start + timedelta(minutes=offset))
+        Blog.objects.create(
+            title='Draft', slug='draft', category=category, author=author,
+            short_description='short', blog_body='body',
+        )
+        cls.expected = list(Blog.objects.published().order_by('-created_at', '-id').values_list('pk', flat=True))
+
+    def page(self, **params):
+        return paginate_keyset(RequestFactory().get('/', params), Blog.objects.published(), per_page=2)
+
+    def test_cursor_round_trip(self):
+        blog = Blog.objects.get(slug='page-3')
+        self.assertEqual(decode_cursor(encode_cursor(blog.created_at, blog.pk)), (blog.created_at, blog.pk))
+
+    def test_walks_every_post_once_through_ties(self):
+        page, seen = self.page(), []
+        self.assertFalse(page.has_newer)
+        while True:
+            seen.extend(blog.pk for blog in page)
+            if not page.has_older:
+                break
+            page = self.page(before=page.older_cursor)
+        self.assertEqual(seen, self.expected)
+
+        # And back again from the oldest page
+        seen = [blog.pk for blog in page]
+        while page.has_newer:
+            page = self.page(after=page.newer_cursor)
+            seen = [blog.pk for blog in page] + seen
+        self.assertEqual(seen, self.expected)
+
+    def test_page_boundary_inside_a_tie(self):
+        tied = Blog.objects.filter(slug__in=['page-2', 'page-3', 'page-4']).order_by('-id')
+        first = tied[0]
+        page = self.page(before=encode_cursor(first.created_at, first.pk))
+        self.assertEqual([blog.pk for blog in page], [blog.pk for blog in tied[1:]])
+
+    def test_invalid_cursors(self):
+        def encoded(raw):
+            return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+        blog = Blog.objects.get(slug='page-3')
+        for cursor in (
+            '',
+            'not a cursor!',
+            encoded(b'no separator'),
+            encoded(b'2024-13-45T00:00:00+00:00|1'),
+            encoded(f'{blog.created_at.isoformat()}|one'.encode()),
+            encoded(b'\xff\xfe|1'),
+            # Never produced by encode_cursor(): the time zone was stripped
+            encoded(f'{blog.created_at.replace(tzinfo=None).isoformat()}|{blog.pk}'.encode()),
+        ):
+            with self.subTest(cursor=cursor):
+                self.assertIsNone(decode_cursor(cursor))
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        for params in ({'before': 'garbage'}, {'after': 'garbage'}):
+            with self.subTest(params=params):
+                page = self.page(**params)
+                self.assertEqual([blog.pk for blog in page], self.expected[:2])
+                self.assertFalse(page.has_newer)
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('finder', 'finder@example.com', 'pw')
+        category = Category.objects.create(category_name='Finds')
+        Blog.objects.create(
+            title='Searchable post', slug='searchable-post', category=category, author=author,
+            short_description='needle', blog_body='needle in the body', status='Published',
+        )
+
+    def test_finds_published_post(self):
+        self.assertEqual([hit.blog.slug for hit in search_posts('needle')], ['searchable-post'])
+
+    def test_signals_keep_the_index_in_sync(self):
+        blog = Blog.objects.get(slug='searchable-post')
+        blog.title = 'Renamed haystack'
+        blog.save()
+        self.assertEqual([hit.blog.slug for hit in search_posts('haystack')], ['searchable-post'])
+        self.assertEqual(list(search_posts('searchable')), [])
+        blog.status = 'Draft'
+        blog.save()
+        self.assertEqual(list(search_posts('needle')), [])
+        blog.status = 'Published'
+        blog.save()
+        self.assertEqual(len(search_posts('needle')), 1)
+        blog.delete()
+        self.assertEqual(list(search_posts('needle')), [])
+
+    def test_huge_page_is_clamped(self):
+        # Used to reach the backend as an OFFSET too large for SQLite
+        results = search_posts('needle', page=10 ** 20)
+        self.assertEqual(results.number, MAX_PAGE)
+        self.assertEqual(list(results), [])
+        self.assertFalse(results.has_next)
+
+    def test_page_parameter(self):
+        for raw, page in (('99999999999999999999', MAX_PAGE), ('abc', 1), ('-3', 1), ('2', 2)):
+            with self.subTest(page=raw):
+                self.assertEqual(search_params(RequestFactory().get('/search/', {'keyword': 'x', 'page': raw})), ('x', page))
+
+
+class CounterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('counted', 'counted@example.com', 'pw')
+        cls.reader = User.objects.create_user('reader', 'reader@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Counted')
+        cls.other = Category.objects.create(category_name='Elsewhere')
+
+    def create_post(self, status='Published', slug='counted-post'):
+        return Blog.objects.create(
+            title='Counted post', slug=slug, category=self.category, author=self.author,
+            short_description='short', blog_body='body', status=status,
+        )
+
+    def counts(self, blog=None):
+        """Every stored counter the post and its author and category touch."""
+        category = Category.objects.get(pk=self.category.pk)
+        author = AuthorStats.objects.get(user=self.author)
+        reader = AuthorStats.objects.get(user=self.reader)
+        day = DailyStat.objects.filter(date=timezone.localdate()).first() or DailyStat()
+        result = {
+            'category': (category.post_count, category.published_count),
+            'author': (author.post_count, author.published_count),
+            'reader_comments': reader.comment_count,
+            'day': (day.posts, day.published, day.comments),
+        }
+        if blog is not None:
+            result['blog_comments'] = Blog.objects.get(pk=blog.pk).comment_count
+        return result
+
+    def test_post_add_and_delete(self):
+        blog = self.create_post()
+        self.assertEqual(self.counts()['category'], (1, 1))
+        self.assertEqual(self.counts()['author'], (1, 1))
+        self.assertEqual(self.counts()['day'], (1, 1, 0))
+        blog.delete()
+        self.assertEqual(self.counts()['category'], (0, 0))
+        self.assertEqual(self.counts()['author'], (0, 0))
+        self.assertEqual(self.counts()['day'], (0, 0, 0))
+
+    def test_comment_add_and_delete(self):
+        blog = self.create_post()
+        comments = [Comment.objects.create(user=self.reader, blog=blog, comment=f'Comment {n}') for n in range(2)]
+        counts = self.counts(blog)
+        self.assertEqual((counts['blog_comments'], counts['reader_comments'], counts['day'][2]), (2, 2, 2))
+        comments[0].delete()
+        counts = self.counts(blog)
+        self.assertEqual((counts['blog_comments'], counts['reader_comments'], counts['day'][2]), (1, 1, 1))
+
+    def test_status_change(self):
+        blog = self.create_post(status='Draft')
+        self.assertEqual(self.counts()['category'], (1, 0))
+        blog.status = 'Published'
+        blog.save()
+        self.assertEqual(self.counts()['category'], (1, 1))
+        self.assertEqual(self.counts()['author'], (1, 1))
+        self.assertEqual(self.counts()['day'], (1, 1, 0))
+        blog = Blog.objects.get(pk=blog.pk)
+        blog.status = 'Draft'
+        blog.save()
+        self.assertEqual(self.counts()['category'], (1, 0))
+        self.assertEqual(self.counts()['day'], (1, 0, 0))
+
+    def test_category_change(self):
+        blog = self.create_post()
+        blog.category = self.other
+        blog.save()
+        self.assertEqual(self.counts()['category'], (0, 0))
+        other = Category.objects.get(pk=self.other.pk)
+        self.assertEqual((other.post_count, other.published_count), (1, 1))
+
+    def test_deleting_a_post_with_comments(self):
+        blog = self.create_post()
+        kept = self.create_post(slug='counted-kept')
+        Comment.objects.create(user=self.reader, blog=kept, comment='Stays')
+        Comment.objects.bulk_create([
+            Comment(user=self.reader if n % 2 else self.author, blog=blog, comment=f'Comment {n}') for n in range(50)
+        ])
+        counters.recount()
+        # Not one counter update and page-cache lookup per comment
+        with self.assertNumQueries(9):
+            blog.delete()
+        counts = self.counts()
+        self.assertEqual(counts['reader_comments'], 1)
+        self.assertEqual(AuthorStats.objects.get(user=self.author).comment_count, 0)
+        self.assertEqual(counts['day'][2], 1)
+        self.assertFalse(counters.drifted_days())
+
+    def comment_on(self, blog, count, user=None):
+        Comment.objects.bulk_create([
+            Comment(user=user or self.reader, blog=blog, comment=f'Comment {n}') for n in range(count)
+        ])
+
+    def test_deleting_a_category_with_commented_posts(self):
+        doomed = Blog.objects.create(
+            title='Doomed', slug='counted-elsewhere', category=self.other, author=self.author,
+            short_description='short', blog_body='body', status='Published',
+        )
+        kept = self.create_post()
+        self.comment_on(doomed, 2)
+        self.comment_on(kept, 3)
+        counters.recount()
+        Category.objects.get(pk=self.other.pk).delete()
+        counts = self.counts()
+        self.assertEqual(counts['reader_comments'], 3)
+        self.assertEqual(counts['author'], (1, 1))
+        self.assertEqual(counts['day'], (1, 1, 3))
+        self.assertFalse(counters.drifted().exists())
+        self.assertFalse(counters.drifted_days())
+
+    def test_deleting_a_user_with_commented_posts(self):
+        doomed_author = User.objects.create_user('doomed', 'doomed@example.com', 'pw')
+        doomed = Blog.objects.create(
+            title='Doomed', slug='counted-doomed', category=self.category, author=doomed_author,
+            short_description='short', blog_body='body', status='Published',
+        )
+        kept = self.create_post()
+        self.comment_on(doomed, 2)
+        self.comment_on(kept, 3)
+        # The user's own comments on posts that stay go one at a time
+        self.comment_on(kept, 1, user=doomed_author)
+        counters.recount()
+        User.objects.get(pk=doomed_author.pk).delete()
+        counts = self.counts(kept)
+        self.assertEqual(counts['reader_comments'], 3)
+        self.assertEqual(counts['blog_comments'], 3)
+        self.assertEqual(counts['category'], (1, 1))
+        self.assertEqual(counts['day'], (1, 1, 3))
+        self.assertFalse(counters.drifted().exists())
+        self.assertFalse(counters.drifted_days())
+
+    def test_decrements_clamp_at_zero(self):
+        blog = self.create_post()
+        comment = Comment.objects.create(user=self.reader, blog=blog, comment='Drifted')
+        # Counters already drifted low, as after a raw DELETE
+        Category.objects.update(post_count=0, published_count=0)
+        AuthorStats.objects.update(post_count=0, published_count=0, comment_count=0)
+        Blog.objects.update(comment_count=0)
+        DailyStat.objects.update(posts=0, published=0, comments=0)
+        comment.delete()
+        blog.delete()
+        counts = self.counts()
+        self.assertEqual(counts['category'], (0, 0))
+        self.assertEqual(counts['author'], (0, 0))
+        self.assertEqual(counts['reader_comments'], 0)
+        self.assertEqual(counts['day'], (0, 0, 0))
+
+    def test_recount_repairs_drift(self):
+        blog = self.create_post()
+        self.create_post(status='Draft', slug='counted-draft')
+        Comment.objects.create(user=self.reader, blog=blog, comment='Counted')
+        expected = self.counts(blog)
+
+        Category.objects.update(post_count=7, published_count=5)
+        AuthorStats.objects.update(post_count=9, published_count=0, comment_count=4)
+        Blog.objects.update(comment_count=3)
+        DailyStat.objects.all().delete()
+        self.assertTrue(counters.drifted().exists())
+        self.assertTrue(counters.drifted_days())
+
+        counters.recount()
+        self.assertEqual(self.counts(blog), expected)
+        self.assertEqual(expected['category'], (2, 1))
+        self.assertFalse(counters.drifted().exists())
+        self.assertEqual(counters.drifted_days(), [])
+
+
+class PageCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('cached', 'cached@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Cached')
+        cls.blog = Blog.objects.create(
+            title='Cached post', slug='cached-post', category=cls.category, author=author,
+            short_description='short', blog_body='body', status='Published',
+        )
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+
+    def test_tests_use_local_memory(self):
+        # A file cache would carry pages and rate limits over from the previous run
+        for alias in ('default', 'pages'):
+            self.assertEqual(caches[alias].__class__.__name__, 'LocMemCache')
+
+    def test_hit_then_bump(self):
+        url = f'/{self.blog.slug}/'
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        page_cache.bump(f'post:{self.blog.slug}')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+
+    def test_saving_bumps_after_commit(self):
+        url = f'/{self.blog.slug}/'
+        names = [f'post:{self.blog.slug}', 'posts', f'category:{self.category.pk}']
+        self.client.get(url)
+        before = page_cache.get_versions(names)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.blog.title = 'Edited'
+            self.blog.save()
+            # A reader before the commit must not see a new stamp and cache the old post under it
+            self.assertEqual(page_cache.get_versions(names), before)
+            self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+        after = page_cache.get_versions(names)
+        self.assertTrue(all(new != old for new, old in zip(after, before)))
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+
+    def test_culling_pages_keeps_stamps(self):
+        self.client.get('/')
+        stamps = page_cache.get_versions(['chrome', 'posts'])
+        caches['pages'].clear()
+        self.assertEqual(page_cache.get_versions(['chrome', 'posts']), stamps)
+        self.assertEqual(self.client.get('/')['X-Page-Cache'], 'MISS')
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('validated', 'validated@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Validated')
+        cls.blog = Blog.objects.create(
+            title='Validated post', slug='validated-post', category=cls.category, author=cls.author,
+            short_description='short', blog_body='body', status='Published',
+        )
+        cls.url = f'/{cls.blog.slug}/'
+
+    def setUp(self):
+        cache.clear()
+        caches['pages'].clear()
+
+    def test_if_none_match(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=0, must-revalidate')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_if_modified_since(self):
+        response = self.client.get(self.url)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_changes_miss(self):
+        def edit_post():
+            self.blog.title = 'Edited'
+            self.blog.save()
+
+        for change in (
+            edit_post,
+            lambda: Comment.objects.create(user=self.author, blog=self.blog, comment='New'),
+            lambda: Category.objects.create(category_name='New in the navigation'),
+        ):
+            with self.subTest(change=change):
+                etag = self.client.get(self.url)['ETag']
+                with self.captureOnCommitCallbacks(execute=True):
+                    change()
+                self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_viewers_get_different_etags(self):
+        anonymous = self.client.get(self.url)['ETag']
+        self.client.force_login(self.author)
+        response = self.client.get(self.url)
+        self.assertNotEqual(response['ETag'], anonymous)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=0, must-revalidate')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=anonymous).status_code, 200)
+
+    def test_last_modified_moves_without_a_newer_row(self):
+        request = RequestFactory().get(self.url)
+        comment = Comment.objects.create(user=self.author, blog=self.blog, comment='Going')
+        before = post_state(request, self.blog.slug)[0]
+        with self.captureOnCommitCallbacks(execute=True):
+            comment.delete()
+        self.assertGreater(post_state(request, self.blog.slug)[0], before)
+
+        before = home_state(request)[0]
+        self.category.category_name = 'Renamed'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.category.save()
+        self.assertGreater(home_state(request)[0], before)
+
+
+class ChromeMemoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        memo = context_processors._chrome
+        self.addCleanup(memo.update, dict(memo))
+        memo.update(version=None, expires=0, data=None)
+
+    def names(self):
+        return [category.category_name for category in context_processors.get_chrome()['categories']]
+
+    def test_reused_until_bumped(self):
+        Category.objects.create(category_name='First')
+        with self.assertNumQueries(3):
+            self.assertEqual(self.names(), ['First'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.names(), ['First'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Category.objects.create(category_name='Second')
+        with self.assertNumQueries(3):
+            self.assertEqual(self.names(), ['First', 'Second'])
+
+    def test_expires(self):
+        Category.objects.create(category_name='First')
+        self.names()
+        # Changed without a bump, as when a worker loaded it just before an edit committed
+        Category.objects.update(category_name='Renamed')
+        self.assertEqual(self.names(), ['First'])
+        later = time.monotonic() + context_processors.MEMO_SECONDS + 1
+        with mock.patch('blogs.context_processors.time.monotonic', return_value=later):
+            self.assertEqual(self.names(), ['Renamed'])
+
+
+class SlugTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('slugger', 'slugger@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Slugs')
+        for slug in ('hello', 'hello-1', 'hello-7', 'hello-world', 'hello-world-3'):
+            cls.post(slug).save()
+
+    @classmethod
+    def post(cls, slug='', title='Hello'):
+        return Blog(
+            title=title, slug=slug, category=cls.category, author=cls.author,
+            short_description='short', blog_body='body',
+        )
+
+    def test_free_base(self):
+        self.assertEqual(allocate_slug('Brand new'), 'brand-new')
+
+    def test_next_suffix_after_highest(self):
+        self.assertEqual(allocate_slug('Hello'), 'hello-8')
+        # "hello-world-3" belongs to the base "hello-world", not "hello"
+        self.assertEqual(allocate_slug('Hello world'), 'hello-world-4')
+
+    def test_exclude_pk_ignores_the_posts_own_slug(self):
+        post = Blog.objects.get(slug='hello-world')
+        self.assertEqual(allocate_slug('Hello world', exclude_pk=post.pk), 'hello-world')
+        # Its own suffix no longer counts as in use
+        post = Blog.objects.get(slug='hello-world-3')
+        self.assertEqual(allocate_slug('Hello world', exclude_pk=post.pk), 'hello-world-1')
+
+    def test_allocator_remembers_what_it_handed_out(self):
+        allocator = SlugAllocator()
+        with self.assertNumQueries(1):
+            allocator.prefetch(['Hello', 'Fresh', 'Fresh'])
+        with self.assertNumQueries(0):
+            slugs = [allocator.allocate(title) for title in ('Hello', 'Fresh', 'Fresh', 'Hello')]
+        self.assertEqual(slugs, ['hello-8', 'fresh', 'fresh-1', 'hello-9'])
+
+    def test_retries_when_another_writer_took_the_slug(self):
+        # The first allocation returns a slug another writer saved a moment ago
+        real = allocate_slug
+        calls = []
+
+        def racing(text, exclude_pk=None):
+            calls.append(text)
+            return 'hello' if len(calls) == 1 else real(text, exclude_pk=exclude_pk)
+
+        post = self.post(title='Hello')
+        with mock.patch('blogs.slugs.allocate_slug', side_effect=racing):
+            save_with_unique_slug(post)
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(Blog.objects.get(pk=post.pk).slug, 'hello-8')
+        # The savepoint kept the surrounding transaction usable
+        self.assertEqual(Blog.objects.filter(slug__startswith='hello').count(), 6)
+
+    def test_gives_up_after_attempts(self):
+        post = self.post(title='Hello')
+        with mock.patch('blogs.slugs.allocate_slug', return_value='hello') as allocate:
+            with self.assertRaises(IntegrityError):
+                save_with_unique_slug(post, attempts=3)
+        self.assertEqual(allocate.call_count, 3)
+        self.assertFalse(Blog.objects.filter(title='Hello', slug='').exists())
+
+
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings_override = override_settings(
+            MEDIA_ROOT=media,
+            STORAGES={'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}},
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        cache.clear()
+
+    def upload(self, mode, size=(800, 600)):
+        output = io.BytesIO()
+        Image.new(mode, size).save(output, 'PNG')
+        name = default_storage.save('uploads/test.png', ContentFile(output.getvalue()))
+        return Blog(feauture_image=name).feauture_image
+
+    def test_renditions(self):
+        image = self.upload('RGB')
+        manifest = images.generate(image)
+        self.assertEqual([width for width, _ in manifest['variants']['jpeg']], [320, 640, 800])
+        self.assertEqual(images.get_manifest(image), manifest)
+        self.assertIn('/variants/', images.variant_url(image, 600))
+
+    def test_unrenderable_image_uses_the_original(self):
+        # Pillow opens 16-bit greyscale PNGs but cannot resize them
+        image = self.upload('I;16')
+        with self.assertLogs('blogs.images', 'WARNING'):
+            self.assertEqual(images.variant_url(image, 600), image.url)
+        # The failure is cached, not retried on every page
+        with mock.patch('blogs.images.generate') as generate:
+            self.assertEqual(images.variant_url(image, 600), image.url)
+        generate.assert_not_called()
+
+    def test_one_worker_generates_at_a_time(self):
+        image = self.upload('RGB')
+        cache.add(images.manifest_key(image) + ':lock', 1)
+        with mock.patch('blogs.images.render') as render:
+            self.assertEqual(images.variant_url(image, 600), image.url)
+        render.assert_not_called()
+        # Nothing cached: once the lock is gone the next page generates them
+        self.assertIsNone(cache.get(images.manifest_key(image)))
+
+
+class ImporterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('importer', 'importer@example.com', 'pw')
+
+    def post(self, title, created_at='2024-01-02'):
+        return {'title': title, 'author': 'importer', 'category': 'Imported', 'status': 'published', 'created_at': created_at}
+
+    def test_impossible_date_rejects_only_that_row(self):
+        importer = Importer('posts')
+        records = enumerate([self.post('First'), self.post('Bad date', '2024-13-45'), self.post('Third')], 1)
+        self.assertEqual(list(importer.run(records)), [2])
+        self.assertEqual(importer.rejected, 1)
+        self.assertEqual(importer.errors[0][0], 2)
+        self.assertIn('created_at', importer.errors[0][1])
+        self.assertEqual(Category.objects.get(category_name='Imported').post_count, 2)
+
+    def test_committed_batches_are_counted_when_a_later_one_fails(self):
+        importer = Importer('posts', batch_size=1)
+        write_posts = importer.write_posts
+        calls = []
+
+        def write(batch):
+            calls.append(batch)
+            if len(calls) == 2:
+                raise RuntimeError('disk full')
+            return write_posts(batch)
+
+        importer.write_posts = write
+        with self.assertRaises(RuntimeError):
+            for _ in importer.run(enumerate([self.post('Kept'), self.post('Lost')], 1)):
+                pass
+        # finish() ran anyway: the first batch is in the counters and the search index
+        self.assertEqual(Category.objects.get(category_name='Imported').post_count, 1)
+        self.assertEqual([hit.blog.title for hit in search_posts('kept')], ['Kept'])
+
+
+class ExporterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('exporter', 'exporter@example.com', 'pw', is_staff=True)
+        cls.reader = User.objects.create_user('exported', 'exported@example.com', 'pw')
+        category = Category.objects.create(category_name='Exported')
+        for n, status in enumerate(('Published', 'Published', 'Draft')):
+            blog = Blog.objects.create(
+                title=f'Exported, "quoted" {n}', slug=f'exported-{n}', category=category, author=cls.staff,
+                short_description='short', blog_body='line one\nline two', status=status,
+            )
+            Comment.objects.create(user=cls.reader, blog=blog, comment=f'Comment {n}')
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get('/dashboard/export/posts/', params)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b''.join(response.streaming_content)
+
+    def test_jsonl(self):
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertIn('filename="posts.jsonl"', response['Content-Disposition'])
+        rows = [json.loads(line) for line in body.decode().splitlines()]
+        self.assertEqual([row['slug'] for row in rows], ['exported-0', 'exported-1'])
+        self.assertEqual(list(rows[0]), [name for name, _ in exporter.FIELDS['posts']])
+        self.assertEqual(rows[0]['blog_body'], 'line one\nline two')
+        self.assertEqual((rows[0]['author'], rows[0]['category']), ('exporter', 'Exported'))
+
+    def test_csv_with_drafts(self):
+        response, body = self.export(format='csv', drafts='1')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.DictReader(io.StringIO(body.decode(), newline='')))
+        self.assertEqual([row['status'] for row in rows], ['Published', 'Published', 'Draft'])
+        self.assertEqual(rows[2]['title'], 'Exported, "quoted" 2')
+        self.assertEqual(rows[2]['blog_body'], 'line one\nline two')
+
+    def test_gzip(self):
+        response, body = self.export(gzip='1')
+        self.assertIn('filename="posts.jsonl.gz"', response['Content-Disposition'])
+        self.assertEqual(len(gzip.decompress(body).decode().splitlines()), 2)
+
+    def test_comments_in_small_blocks(self):
+        # Blocks far smaller than a row still reassemble into the same lines
+        lines = list(exporter.encode_jsonl('comments', exporter.rows('comments')))
+        self.assertEqual(b''.join(exporter.blocks(lines, size=1)).decode(), ''.join(lines))
+        self.assertEqual([json.loads(line)['comment'] for line in lines], ['Comment 0', 'Comment 1'])
+
+    def test_staff_only(self):
+        self.assertEqual(self.client.get('/dashboard/export/posts/').status_code, 302)
+        self.client.force_login(self.reader)
+        self.assertEqual(self.client.get('/dashboard/export/posts/').status_code, 302)
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get('/dashboard/export/users/').status_code, 404)
+
+
+@override_settings(FEEDS={'ITEMS': 20, 'MAX_AGE': 300, 'SITEMAP_SECTION_SIZE': 2})
+class FeedTests(TestCase):
+    ATOM = '{http://www.w3.org/2005/Atom}'
+    SITEMAP = '{http://www.sitemaps.org/schemas/sitemap/0.9}'
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('syndicated', 'syndicated@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Syndicated')
+        other = Category.objects.create(category_name='Elsewhere')
+        cls.posts = [
+            Blog.objects.create(
+                title=f'Feed post {n}', slug=f'feed-post-{n}', category=cls.category if n % 2 else other,
+                author=author, short_description=f'Summary {n}', blog_body='body', status='Published',
+            )
+            for n in range(4)
+        ]
+        Blog.objects.create(
+            title='Feed draft', slug='feed-draft', category=cls.category, author=author,
+            short_description='short', blog_body='body', status='Draft',
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def xml(self, url, **headers):
+        response = self.client.get(url, **headers)
+        self.assertEqual(response.status_code, 200)
+        return response, ElementTree.fromstring(response.content)
+
+    def test_rss(self):
+        response, root = self.xml('/feeds/rss.xml')
+        self.assertTrue(response['Content-Type'].startswith('application/rss+xml'))
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        titles = [item.findtext('title') for item in root.iter('item')]
+        self.assertEqual(titles, [f'Feed post {n}' for n in (3, 2, 1, 0)])
+        self.assertTrue(root.find('channel/item/link').text.endswith('/feed-post-3/'))
+
+    def test_atom(self):
+        response, root = self.xml('/feeds/atom.xml')
+        self.assertTrue(response['Content-Type'].startswith('application/atom+xml'))
+        self.assertEqual(len(root.findall(f'{self.ATOM}entry')), 4)
+
+    def test_category_feed(self):
+        _, root = self.xml(f'/feeds/category/{self.category.pk}/rss.xml')
+        self.assertEqual([item.findtext('title') for item in root.iter('item')], ['Feed post 3', 'Feed post 1'])
+        self.assertIn('Syndicated', root.findtext('channel/title'))
+        self.assertEqual(self.client.get('/feeds/category/999999/rss.xml').status_code, 404)
+        self.assertEqual(self.client.get('/feeds/json.xml').status_code, 404)
+
+    def test_fragments_are_reused(self):
+        self.client.get('/feeds/rss.xml')
+        post = self.posts[0]
+        post.title = 'Feed post renamed'
+        post.save()
+        with mock.patch('blogs.feeds.render_fragment', wraps=feeds.render_fragment) as render:
+            _, root = self.xml('/feeds/rss.xml')
+        # Only the edited post is rendered again
+        self.assertEqual([call.args[1].pk for call in render.call_args_list], [post.pk])
+        self.assertIn('Feed post renamed', [item.findtext('title') for item in root.iter('item')])
+
+    def test_not_modified(self):
+        for url in ('/feeds/rss.xml', '/sitemap.xml', self.section_url(self.posts[0])):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+                self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def section_url(self, post):
+        return f'/sitemap-{(post.pk - 1) // 2}.xml'
+
+    def test_sitemap(self):
+        _, root = self.xml('/sitemap.xml')
+        sections = {(post.pk - 1) // 2 for post in self.posts}
+        locations = [loc.text for loc in root.iter(f'{self.SITEMAP}loc')]
+        self.assertEqual(locations, [f'http://testserver/sitemap-{section}.xml' for section in sorted(sections)])
+        urls = []
+        for section in sorted(sections):
+            _, urlset = self.xml(f'/sitemap-{section}.xml')
+            urls += [loc.text for loc in urlset.iter(f'{self.SITEMAP}loc')]
+        self.assertEqual(urls, [f'http://testserver/feed-post-{n}/' for n in range(4)])
+        self.assertEqual(self.client.get('/sitemap-999999.xml').status_code, 404)
+
+    def test_only_the_changed_section_gets_a_new_etag(self):
+        changed, unchanged = self.section_url(self.posts[0]), self.section_url(self.posts[3])
+        self.assertNotEqual(changed, unchanged)
+        before = {url: self.client.get(url)['ETag'] for url in (changed, unchanged, '/sitemap.xml')}
+        self.posts[0].title = 'Feed post edited'
+        self.posts[0].save()
+        self.assertNotEqual(self.client.get(changed)['ETag'], before[changed])
+        self.assertEqual(self.client.get(unchanged)['ETag'], before[unchanged])
+        self.assertNotEqual(self.client.get('/sitemap.xml')['ETag'], before['/sitemap.xml'])
+
+
+def urlconf(async_reads):
+    module = types.ModuleType(f'test_urls_{"async" if async_reads else "sync"}')
+    module.urlpatterns = build_urlpatterns(async_reads)
+    return module
+
+
+SYNC_URLS = urlconf(False)
+ASYNC_URLS = urlconf(True)
+CSRF_TOKEN_RE = re.compile(rb'name="csrfmiddlewaretoken" value="[^"]*"')
+
+
+@override_settings(PAGE_CACHE={'ENABLED': False}, BLOG_POSTS_PER_PAGE=2, BLOG_COMMENTS_PER_PAGE=2)
+class AsyncViewTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user('asynchronous', 'asynchronous@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Async')
+        start = timezone.now()
+        for n in range(5):
+            blog = Blog.objects.create(
+                title=f'Async post {n}', slug=f'async-post-{n}', category=cls.category, author=author,
+                short_description='short', blog_body='body', status='Published',
+            )
+            Blog.objects.filter(pk=blog.pk).update(created_at=start - timedelta(minutes=n))
+        cls.blog = blog
+        for n in range(3):
+            Comment.objects.create(user=author, blog=blog, comment=f'Async comment {n}')
+
+    async def get_both(self, path):
+        """The sync view's response under WSGI, and the async view's under ASGI."""
+        with override_settings(ROOT_URLCONF=SYNC_URLS):
+            sync = await sync_to_async(self.client.get)(path)
+        with override_settings(ROOT_URLCONF=ASYNC_URLS):
+            response = await self.async_client.get(path)
+            # resolver_match is lazy: resolve it while the async URLconf is active
+            self.assertTrue(iscoroutinefunction(response.resolver_match.func))
+        return sync, response
+
+    async def assertSameResponse(self, path):
+        sync, response = await self.get_both(path)
+        self.assertEqual(response.status_code, sync.status_code)
+        # The CSRF token is masked afresh on every render
+        self.assertEqual(CSRF_TOKEN_RE.sub(b'', response.content), CSRF_TOKEN_RE.sub(b'', sync.content))
+        return response
+
+    async def test_list_pages(self):
+        for path in ('/', f'/category/{self.category.pk}/', '/categories/'):
+            with self.subTest(path=path):
+                response = await self.assertSameResponse(path)
+                self.assertEqual(response.status_code, 200)
+
+    async def test_keyset_cursors(self):
+        for base in ('/', f'/category/{self.category.pk}/'):
+            path, titles = base, []
+            while path:
+                with self.subTest(path=path):
+                    response = await self.assertSameResponse(path)
+                page = response.context['posts']
+                titles += [post.title for post in page]
+                path = base + page.older_url if page.has_older else None
+            self.assertEqual(titles, [f'Async post {n}' for n in range(5)])
+            # And back again from the last page
+            response = await self.assertSameResponse(base + page.newer_url)
+            self.assertEqual([post.title for post in response.context['posts']], ['Async post 2', 'Async post 3'])
+
+    async def test_detail_with_comment_pages(self):
+        path = f'/{self.blog.slug}/'
+        response = await self.assertSameResponse(path)
+        comments = response.context['comments']
+        self.assertEqual(len(comments), 2)
+        await self.assertSameResponse(path + comments.older_url)
+
+    async def test_not_found(self):
+        for path in ('/category/999999/', '/no-such-post/'):
+            with self.subTest(path=path):
+                response = await self.assertSameResponse(path)
+                self.assertEqual(response.status_code, 404)
+
+    async def test_not_modified(self):
+        with override_settings(ROOT_URLCONF=ASYNC_URLS):
+            response = await self.async_client.get('/')
+            response = await self.async_client.get('/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
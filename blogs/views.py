@@ -1,26 +1,45 @@
+from django.conf import settings
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib import messages
+from django.http import JsonResponse
+from django.template.loader import render_to_string
 from .models import Blog, Category, Comment
-from django.db.models import Q
+from .conditional import categories_state, conditional_page, post_state, window_state
+from .page_cache import cache_anonymous_page
+from .pagination import keyset_window, paginate_keyset
+from .search import MAX_PAGE, search_posts
 from django.contrib.auth.decorators import login_required
 
+def category_posts(category_id):
+    return Blog.objects.published().summaries().filter(category_id=category_id)
+
+def category_page_state(request, category_id):
+    window, _ = keyset_window(request, category_posts(category_id))
+    return window_state(window)
+
+@conditional_page(category_page_state)
+@cache_anonymous_page('category:{category_id}')
 def posts_by_category(request, category_id):
     category = get_object_or_404(Category, id=category_id)  
-    posts = Blog.objects.filter(category=category, status="Published")
+    posts = paginate_keyset(request, category_posts(category.id))
     
     context = {
         'posts': posts,
+        'page': posts,
         'category': category,
-        'categories': Category.objects.all(),
     }
     return render(request, 'posts_by_category.html', context)
 
+def blog_comments(blog):
+    return Comment.objects.filter(blog=blog).select_related('user')
+
+@conditional_page(post_state)
+@cache_anonymous_page('post:{slug}')
 def blogs(request, slug):
-    blog = get_object_or_404(Blog, slug=slug, status='Published')
+    blog = get_object_or_404(Blog.objects.published().with_relations(), slug=slug)
     
-    # Get all comments for this blog
-    comments = Comment.objects.filter(blog=blog)
-    comment_count = comments.count()
+    # First page of comments; the rest load on demand from blog_comments
+    comments = paginate_keyset(request, blog_comments(blog), per_page=settings.BLOG_COMMENTS_PER_PAGE)
     
     # Handle comment submission
     if request.method == 'POST':
@@ -44,25 +63,48 @@ def blogs(request, slug):
     context = {
         'blog': blog,
         'comments': comments,
-        'comment_count': comment_count,
-        'categories': Category.objects.all(), 
+        'comment_count': blog.comment_count,
     }
     return render(request, 'blogs.html', context)
 
+@cache_anonymous_page('post:{slug}')
+def comments_page(request, slug):
+    """Further pages of a post's comments, as an HTML fragment or JSON (?format=json)"""
+    blog = get_object_or_404(Blog.objects.published().select_related('author'), slug=slug)
+    comments = paginate_keyset(request, blog_comments(blog), per_page=settings.BLOG_COMMENTS_PER_PAGE)
+    context = {
+        'blog': blog,
+        'comments': comments,
+    }
+    
+    if request.GET.get('format') == 'json':
+        html = render_to_string('includes/comment_list.html', context, request=request)
+        return JsonResponse({
+            'html': html,
+            'count': blog.comment_count,
+            'next': comments.older_cursor and f"{request.path}?before={comments.older_cursor}",
+        })
+    return render(request, 'includes/comment_list.html', context)
+
+def search_params(request):
+    keyword = request.GET.get('keyword', '').strip()
+    try:
+        page = min(max(int(request.GET.get('page', 1)), 1), MAX_PAGE)
+    except ValueError:
+        page = 1
+    return keyword, page
+
 def search(request):
-    keyword = request.GET.get('keyword')
-    blogs = Blog.objects.filter(
-        Q(title__icontains=keyword) | 
-        Q(short_description__icontains=keyword) | 
-        Q(blog_body__icontains=keyword), 
-        status="Published"
-    ) 
+    keyword, page = search_params(request)
+    results = search_posts(keyword, page=page, query_params=request.GET)
     context = {
-        'blogs': blogs,
+        'results': results,
         'keyword': keyword,  # ✅ Add this!
     }
     return render(request, 'search.html', context)
 
+@conditional_page(categories_state)
+@cache_anonymous_page('posts')
 def categories_list(request):
     categories = Category.objects.all()
     context = {
@@ -0,0 +1,266 @@
+"""
+The management grids: filters, sorting and pages for dashboards.views.posts
+and dashboards.views.users_list.
+
+A page costs a fixed handful of queries whatever the table size:
+
+* the rows: one LIMIT/OFFSET query ordered by an indexed sort key, joined
+  to the related rows it shows (author and category for posts, the stored
+  AuthorStats counters for users, so activity counts need no GROUP BY);
+* the total: read from the stored counters (DailyStat, Category,
+  AuthorStats) when the filters match one of them, otherwise a COUNT over
+  at most COUNT_CAP rows, so a broad search never scans the table just to
+  number the pages.
+"""
+from django.contrib.auth.models import User
+from django.core.paginator import Paginator
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from blogs.models import AuthorStats, Blog, Category, DailyStat
+
+PER_PAGE_CHOICES = (25, 50, 100)
+COUNT_CAP = 10000
+STATUSES = ('Published', 'Draft')
+ROLES = {
+    'manager': Q(is_superuser=True),
+    'staff': Q(is_staff=True, is_superuser=False),
+    'user': Q(is_staff=False, is_superuser=False),
+}
+
+
+class CountedPaginator(Paginator):
+    """A Paginator that is told its total instead of running COUNT(*) itself."""
+
+    def __init__(self, object_list, per_page, count, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        return self.known_count
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class Grid:
+    """
+    Query string parsing, sorting, counting and links shared by the grids.
+
+    Subclasses set SORTS (?sort= value -> ordering; each leads with an
+    indexed column and ends with id so pages never overlap), DEFAULT_SORT
+    and DESCENDING_FIRST, and provide queryset() and filtered.
+    """
+    SORTS = {}
+    DEFAULT_SORT = ''
+    # Columns whose header opens newest/largest first; everything else opens A-Z
+    DESCENDING_FIRST = ()
+
+    def __init__(self, params):
+        self.params = params
+        sort = params.get('sort', self.DEFAULT_SORT)
+        self.sort = sort if sort.lstrip('-') in self.SORTS else self.DEFAULT_SORT
+        per_page = _int(params.get('per_page'))
+        self.per_page = per_page if per_page in PER_PAGE_CHOICES else PER_PAGE_CHOICES[0]
+
+    def queryset(self):
+        raise NotImplementedError
+
+    def ordered(self, rows):
+        descending = self.sort.startswith('-')
+        ordering = self.SORTS[self.sort.lstrip('-')]
+        return rows.order_by(*(f'-{field}' if descending else field for field in ordering))
+
+    def stored_count(self):
+        """The total from stored counters, or None when none matches the filters."""
+        return None
+
+    @cached_property
+    def count(self):
+        """(total, exact): a capped count is reported as not exact."""
+        stored = self.stored_count()
+        if stored is not None:
+            return stored, True
+        capped = self.queryset().order_by()[:COUNT_CAP + 1].count()
+        return min(capped, COUNT_CAP), capped <= COUNT_CAP
+
+    def page(self, number):
+        total, _ = self.count
+        return CountedPaginator(self.queryset(), self.per_page, total).get_page(number)
+
+    def url(self, **changes):
+        """This grid's query string with some parameters changed; None removes one."""
+        params = self.params.copy()
+        params.pop('page', None)
+        for key, value in changes.items():
+            if value is None:
+                params.pop(key, None)
+            else:
+                params[key] = value
+        return '?' + params.urlencode()
+
+    @cached_property
+    def sort_links(self):
+        """{column: {'url', 'arrow'}} for the sortable headers."""
+        current = self.sort.lstrip('-')
+        descending = self.sort.startswith('-')
+        links = {}
+        for key in self.SORTS:
+            if key == current:
+                links[key] = {'url': self.url(sort=key if descending else f'-{key}'), 'arrow': '▼' if descending else '▲'}
+            else:
+                links[key] = {'url': self.url(sort=f'-{key}' if key in self.DESCENDING_FIRST else key), 'arrow': ''}
+        return links
+
+    def page_links(self, page):
+        """(number, url) around the current page; None marks an elided gap."""
+        return [
+            (number, None if number == page.paginator.ELLIPSIS else self.url(page=number))
+            for number in page.paginator.get_elided_page_range(page.number, on_each_side=2, on_ends=1)
+        ]
+
+
+class PostGrid(Grid):
+    """Staff see every post, others only their own."""
+    SORTS = {
+        'created': ('created_at', 'id'),
+        'title': ('title', 'id'),
+        'status': ('status', 'created_at', 'id'),
+    }
+    DEFAULT_SORT = '-created'
+    DESCENDING_FIRST = ('created',)
+
+    def __init__(self, params, user):
+        super().__init__(params)
+        self.staff = user.is_staff or user.is_superuser
+        self.user = user
+
+        status = params.get('status', '')
+        self.status = status if status in STATUSES else ''
+        self.category = _int(params.get('category'))
+        featured = params.get('featured', '')
+        self.featured = featured if featured in ('1', '0') else ''
+        self.q = params.get('q', '').strip()[:100]
+        self.author_name = params.get('author', '').strip()[:150] if self.staff else ''
+
+    @cached_property
+    def author_id(self):
+        """The author the grid is limited to: the viewer, a staff filter, or None for everyone."""
+        if not self.staff:
+            return self.user.pk
+        if not self.author_name:
+            return None
+        # An unknown name matches nobody rather than everybody
+        return User.objects.filter(username=self.author_name).values_list('pk', flat=True).first() or 0
+
+    def queryset(self):
+        posts = Blog.objects.summaries()
+        if self.author_id is not None:
+            posts = posts.filter(author_id=self.author_id)
+        if self.status:
+            posts = posts.filter(status=self.status)
+        if self.category:
+            posts = posts.filter(category_id=self.category)
+        if self.featured:
+            posts = posts.filter(is_featured=self.featured == '1')
+        if self.q:
+            posts = posts.filter(title__icontains=self.q)
+        return self.ordered(posts)
+
+    def stored_count(self):
+        if self.q or self.featured:
+            return None
+        if self.category and self.author_id is not None:
+            return None
+        if self.category:
+            row = Category.objects.filter(pk=self.category).values_list('post_count', 'published_count').first()
+        elif self.author_id is not None:
+            row = AuthorStats.objects.filter(pk=self.author_id).values_list('post_count', 'published_count').first()
+        else:
+            totals = DailyStat.objects.aggregate(posts=Coalesce(Sum('posts'), 0), published=Coalesce(Sum('published'), 0))
+            row = totals['posts'], totals['published']
+        total, published = row or (0, 0)
+        return {'': total, 'Published': published, 'Draft': total - published}[self.status]
+
+    @property
+    def filtered(self):
+        return bool(self.status or self.category or self.featured or self.q or self.author_name)
+
+
+class UserGrid(Grid):
+    """Every account, with its activity read from the stored AuthorStats row."""
+    SORTS = {
+        # Ids follow sign-up order, so the primary key stands in for date_joined
+        'joined': ('id',),
+        # Usernames are unique, so the index alone gives a stable order
+        'username': ('username',),
+        # Activity sorts read the joined counters; a top-N sort over one row per user
+        'posts': ('post_stats__post_count', 'id'),
+        'comments': ('post_stats__comment_count', 'id'),
+    }
+    DEFAULT_SORT = '-joined'
+    DESCENDING_FIRST = ('joined', 'posts', 'comments')
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.q = params.get('q', '').strip()[:100]
+        role = params.get('role', '')
+        self.role = role if role in ROLES else ''
+        active = params.get('active', '')
+        self.active = active if active in ('1', '0') else ''
+
+    def queryset(self):
+        users = User.objects.select_related('post_stats')
+        if self.q:
+            users = users.filter(
+                Q(username__icontains=self.q) | Q(email__icontains=self.q)
+                | Q(first_name__icontains=self.q) | Q(last_name__icontains=self.q)
+            )
+        if self.role:
+            users = users.filter(ROLES[self.role])
+        if self.active:
+            users = users.filter(is_active=self.active == '1')
+        return self.ordered(users)
+
+    @cached_property
+    def totals(self):
+        """Total, active, staff flag and per-role counts in one pass over the user table."""
+        return User.objects.aggregate(
+            total=Count('pk'),
+            active=Count('pk', filter=Q(is_active=True)),
+            staff_users=Count('pk', filter=Q(is_staff=True)),
+            **{role: Count('pk', filter=condition) for role, condition in ROLES.items()},
+        )
+
+    def stored_count(self):
+        if self.q or (self.role and self.active):
+            return None
+        if self.role:
+            return self.totals[self.role]
+        if self.active:
+            return self.totals['active'] if self.active == '1' else self.totals['total'] - self.totals['active']
+        return self.totals['total']
+
+    @property
+    def filtered(self):
+        return bool(self.q or self.role or self.active)
+
+
+def row_data(post):
+    return {
+        'id': post.pk,
+        'title': post.title,
+        'slug': post.slug,
+        'author': post.author.username,
+        'category': post.category.category_name,
+        'status': post.status,
+        'is_featured': post.is_featured,
+        'comment_count': post.comment_count,
+        'created_at': post.created_at.isoformat(),
+    }
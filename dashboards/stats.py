@@ -0,0 +1,64 @@
+"""
+Numbers for the dashboard, one query per scope.
+
+Everything is read from the counters blogs.counters keeps current
+(AuthorStats, Category and the DailyStat rollup), never by counting Blog
+or Comment rows, so the cost does not grow with the number of posts.
+"""
+from datetime import timedelta
+
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from blogs.models import AuthorStats, DailyStat
+
+ACTIVITY_DAYS = 14
+TOP_AUTHORS = 5
+
+
+def author_stats(user):
+    """Posts, published and drafts for one author."""
+    row = AuthorStats.objects.filter(pk=user.pk).values_list('post_count', 'published_count').first()
+    posts, published = row or (0, 0)
+    return {'posts': posts, 'published': published, 'drafts': posts - published}
+
+
+def site_stats():
+    """Site-wide totals from the daily rollup."""
+    totals = DailyStat.objects.aggregate(
+        posts=Coalesce(Sum('posts'), 0),
+        published=Coalesce(Sum('published'), 0),
+        comments=Coalesce(Sum('comments'), 0),
+    )
+    totals['drafts'] = totals['posts'] - totals['published']
+    return totals
+
+
+def activity(days=ACTIVITY_DAYS):
+    """The last ``days`` days, newest first, with zero rows for quiet days."""
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    stored = {row.date: row for row in DailyStat.objects.filter(date__gte=start)}
+    series = [stored.get(today - timedelta(days=n), DailyStat(date=today - timedelta(days=n))) for n in range(days)]
+    peak = max((max(row.posts, row.comments) for row in series), default=0) or 1
+    for row in series:
+        # Bar widths for the template, relative to the busiest day
+        row.posts_pct = round(row.posts * 100 / peak)
+        row.comments_pct = round(row.comments * 100 / peak)
+    return series
+
+
+def top_authors(limit=TOP_AUTHORS):
+    return list(
+        AuthorStats.objects.select_related('user').filter(post_count__gt=0).order_by('-post_count')[:limit]
+    )
+
+
+def dashboard_stats(user, staff=False):
+    stats = {'me': author_stats(user)}
+    if staff:
+        stats['site'] = site_stats()
+        stats['activity'] = activity()
+        stats['top_authors'] = top_authors()
+    return stats
@@ -1,3 +1,323 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import QueryDict
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from blog_main import auth_cache
+from blogs import counters
+from blogs.models import AuthorStats, Blog, Category, Comment, DailyStat
+
+from . import stats
+from .grid import PostGrid, UserGrid
+
+
+def create_post(author, category, n, status='Published'):
+    return Blog.objects.create(
+        title=f'Dashboard post {n}', slug=f'dashboard-post-{n}', category=category, author=author,
+        short_description='short', blog_body='body', status=status,
+    )
+
+
+class DashboardStatsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user('writer', 'writer@example.com', 'pw', is_staff=True)
+        cls.reader = User.objects.create_user('commenter', 'commenter@example.com', 'pw')
+        cls.category = Category.objects.create(category_name='Dashboard')
+        cls.doomed = Category.objects.create(category_name='Doomed')
+
+    def setUp(self):
+        cache.clear()
+
+    def numbers(self):
+        """Everything the staff dashboard shows, as plain values."""
+        result = stats.dashboard_stats(self.author, staff=True)
+        return {
+            'me': result['me'],
+            'site': result['site'],
+            'today': [(row.posts, row.published, row.comments) for row in result['activity'][:1]],
+            'top_authors': [(row.user_id, row.post_count) for row in result['top_authors']],
+        }
+
+    def test_stored_counters_match_a_recount(self):
+        posts = [create_post(self.author, self.category, n, 'Draft' if n == 2 else 'Published') for n in range(4)]
+        for post in posts[:3]:
+            Comment.objects.create(user=self.reader, blog=post, comment='Kept')
+        Comment.objects.create(user=self.reader, blog=posts[0], comment='Removed').delete()
+        posts[2].status = 'Published'
+        posts[2].save()
+        posts[3].delete()
+        # A Category delete cascades to posts that have comments
+        doomed = create_post(self.author, self.doomed, 9)
+        Comment.objects.create(user=self.reader, blog=doomed, comment='Cascaded')
+        Category.objects.get(pk=self.doomed.pk).delete()
+        # And so does a User delete
+        leaving = User.objects.create_user('leaving', 'leaving@example.com', 'pw')
+        Comment.objects.create(user=self.reader, blog=create_post(leaving, self.category, 8), comment='Cascaded')
+        Comment.objects.create(user=leaving, blog=posts[0], comment='Theirs')
+        leaving.delete()
+
+        stored = self.numbers()
+        self.assertEqual(stored['me'], {'posts': 3, 'published': 3, 'drafts': 0})
+        self.assertEqual(stored['site'], {'posts': 3, 'published': 3, 'comments': 3, 'drafts': 0})
+        self.assertEqual(stored['today'], [(3, 3, 3)])
+        self.assertEqual(stored['top_authors'], [(self.author.pk, 3)])
+        self.assertEqual(AuthorStats.objects.get(pk=self.reader.pk).comment_count, 3)
+        self.assertEqual(counters.drifted_days(), [])
+        self.assertFalse(counters.drifted().exists())
+        counters.recount()
+        self.assertEqual(self.numbers(), stored)
+
+    def test_activity_fills_quiet_days(self):
+        create_post(self.author, self.category, 1)
+        series = stats.activity(days=5)
+        today = timezone.localdate()
+        self.assertEqual([row.date for row in series], [today - timedelta(days=n) for n in range(5)])
+        self.assertEqual([row.posts for row in series], [1, 0, 0, 0, 0])
+        self.assertEqual(series[0].posts_pct, 100)
+
+    def test_drifted_days(self):
+        create_post(self.author, self.category, 1)
+        DailyStat.objects.update(posts=5)
+        ((stored, actual),) = counters.drifted_days()
+        self.assertEqual((stored.posts, actual.posts), (5, 1))
+        self.assertEqual(stats.site_stats()['posts'], 5)
+        counters.recount()
+        self.assertEqual(counters.drifted_days(), [])
+        self.assertEqual(stats.site_stats()['posts'], 1)
+
+    def test_missing_author_row(self):
+        AuthorStats.objects.filter(pk=self.reader.pk).delete()
+        self.assertEqual(stats.author_stats(self.reader), {'posts': 0, 'published': 0, 'drafts': 0})
+
+    def test_dashboard_page(self):
+        create_post(self.author, self.category, 1)
+        self.client.force_login(self.author)
+        response = self.client.get('/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['stats']['site']['posts'], 1)
+
+
+class PostGridTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = User.objects.create_user('editor', 'editor@example.com', 'pw', is_staff=True)
+        cls.alice = User.objects.create_user('alice', 'alice@example.com', 'pw')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'pw')
+        cls.news = Category.objects.create(category_name='News')
+        cls.notes = Category.objects.create(category_name='Notes')
+        for title, author, category, status, featured in (
+            ('Alpha', cls.alice, cls.news, 'Published', True),
+            ('Beta', cls.alice, cls.news, 'Draft', False),
+            ('Gamma', cls.bob, cls.notes, 'Published', False),
+            ('Delta', cls.bob, cls.news, 'Draft', False),
+        ):
+            Blog.objects.create(
+                title=title, slug=title.lower(), category=category, author=author,
+                short_description='short', blog_body='body', status=status, is_featured=featured,
+            )
+
+    def grid(self, params='', user=None):
+        return PostGrid(QueryDict(params), user or self.staff)
+
+    def titles(self, params='', user=None):
+        return sorted(self.grid(params, user).queryset().values_list('title', flat=True))
+
+    def test_filters(self):
+        for params, titles in (
+            ('', ['Alpha', 'Beta', 'Delta', 'Gamma']),
+            ('status=Published', ['Alpha', 'Gamma']),
+            ('status=bogus', ['Alpha', 'Beta', 'Delta', 'Gamma']),
+            (f'category={self.news.pk}', ['Alpha', 'Beta', 'Delta']),
+            ('featured=1', ['Alpha']),
+            ('featured=0', ['Beta', 'Delta', 'Gamma']),
+            ('q=MM', ['Gamma']),
+            ('author=bob', ['Delta', 'Gamma']),
+            ('author=nobody', []),
+            (f'author=bob&category={self.news.pk}&status=Draft', ['Delta']),
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(self.titles(params), titles)
+
+    def test_non_staff_see_only_their_own(self):
+        self.assertEqual(self.titles(user=self.alice), ['Alpha', 'Beta'])
+        # The author filter is staff-only
+        self.assertEqual(self.titles('author=bob', user=self.alice), ['Alpha', 'Beta'])
+        self.assertFalse(self.grid('author=bob', user=self.alice).filtered)
+
+    def test_sorting(self):
+        def ordered(params):
+            return list(self.grid(params).queryset().values_list('title', flat=True))
+
+        self.assertEqual(ordered('sort=title'), ['Alpha', 'Beta', 'Delta', 'Gamma'])
+        self.assertEqual(ordered('sort=-title'), ['Gamma', 'Delta', 'Beta', 'Alpha'])
+        self.assertEqual(ordered('sort=-created'), ['Delta', 'Gamma', 'Beta', 'Alpha'])
+        self.assertEqual(ordered('sort=password'), ordered('sort=-created'))
+
+    def test_sort_links(self):
+        links = self.grid('sort=title&status=Draft&page=3').sort_links
+        # The current column flips; the others open in their natural direction, filters kept, page reset
+        self.assertEqual(links['title'], {'url': '?sort=-title&status=Draft', 'arrow': '▲'})
+        self.assertEqual(links['created']['url'], '?sort=-created&status=Draft')
+        self.assertEqual(links['status']['url'], '?sort=status&status=Draft')
+        self.assertEqual(self.grid('sort=-title').sort_links['title'], {'url': '?sort=title', 'arrow': '▼'})
+
+    def test_stored_count(self):
+        for params, user, total in (
+            ('', None, 4),
+            ('status=Draft', None, 2),
+            (f'category={self.news.pk}&status=Published', None, 1),
+            ('author=alice', None, 2),
+            ('status=Published', self.bob, 1),
+        ):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.grid(params, user).count, (total, True))
+                # Nothing counts Blog rows
+                self.assertFalse([query for query in queries if 'FROM "blogs_blog"' in query['sql']])
+
+    def test_stored_count_reads_the_counters(self):
+        Category.objects.filter(pk=self.notes.pk).update(post_count=40, published_count=30)
+        self.assertEqual(self.grid(f'category={self.notes.pk}').count, (40, True))
+        self.assertEqual(self.grid(f'category={self.notes.pk}&status=Draft').count, (10, True))
+
+    def test_filters_without_a_counter_count_rows(self):
+        for params, user, total in (
+            ('q=a', None, 4),
+            ('featured=1', None, 1),
+            (f'category={self.news.pk}&author=bob', None, 1),
+            # Non-staff are always limited to one author
+            (f'category={self.news.pk}', self.alice, 2),
+        ):
+            with self.subTest(params=params):
+                grid = self.grid(params, user)
+                self.assertIsNone(grid.stored_count())
+                self.assertEqual(grid.count, (total, True))
+                self.assertEqual(len(grid.page(1)), total)
+
+
+class UserGridTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        cls.staff = User.objects.create_user('helper', 'helper@example.com', 'pw', is_staff=True)
+        cls.active = User.objects.create_user('reader', 'reader@corp.example', 'pw', first_name='Ada')
+        cls.inactive = User.objects.create_user('gone', 'gone@example.com', 'pw', is_active=False)
+        category = Category.objects.create(category_name='Users')
+        for n in range(2):
+            create_post(cls.staff, category, n)
+        post = create_post(cls.active, category, 2)
+        for n in range(3):
+            Comment.objects.create(user=cls.inactive, blog=post, comment=f'Comment {n}')
+
+    def setUp(self):
+        cache.clear()
+
+    def grid(self, params=''):
+        return UserGrid(QueryDict(params))
+
+    def names(self, params=''):
+        return list(self.grid(params).queryset().values_list('username', flat=True))
+
+    def test_filters(self):
+        for params, names in (
+            ('role=manager', ['boss']),
+            ('role=staff', ['helper']),
+            ('role=user', ['gone', 'reader']),
+            ('active=0', ['gone']),
+            ('active=1', ['boss', 'helper', 'reader']),
+            ('role=user&active=1', ['reader']),
+            # Matches usernames, emails and names
+            ('q=corp', ['reader']),
+            ('q=ada', ['reader']),
+        ):
+            with self.subTest(params=params):
+                self.assertEqual(sorted(self.names(params)), names)
+
+    def test_activity_sorts(self):
+        self.assertEqual(self.names('sort=-posts')[:2], ['helper', 'reader'])
+        self.assertEqual(self.names('sort=-comments')[0], 'gone')
+        self.assertEqual(self.names('sort=username'), ['boss', 'gone', 'helper', 'reader'])
+        self.assertEqual(self.names(), ['gone', 'reader', 'helper', 'boss'])
+
+    def test_counts(self):
+        for params, total in (('', 4), ('role=user', 2), ('active=0', 1), ('active=1', 3)):
+            with self.subTest(params=params):
+                # The totals are one aggregate, shared with the page header
+                with self.assertNumQueries(1):
+                    self.assertEqual(self.grid(params).count, (total, True))
+        for params, total in (('role=user&active=1', 1), ('q=example', 4)):
+            with self.subTest(params=params):
+                grid = self.grid(params)
+                self.assertIsNone(grid.stored_count())
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(grid.count, (total, True))
+                self.assertIn('COUNT(', queries[-1]['sql'])
+
+    def test_users_list_page(self):
+        self.client.force_login(self.manager)
+        response = self.client.get('/dashboard/users/', {'role': 'user', 'sort': '-comments'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user.username for user in response.context['users']], ['gone', 'reader'])
+
+
+class BulkUsersTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.manager = User.objects.create_superuser('boss', 'boss@example.com', 'pw')
+        cls.staff = User.objects.create_user('helper', 'helper@example.com', 'pw', is_staff=True)
+        cls.users = [User.objects.create_user(f'member{n}', f'member{n}@example.com', 'pw') for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def bulk(self, data, params=''):
+        return self.client.post(f'/dashboard/users/bulk/{params}', data)
+
+    def test_superusers_only(self):
+        for user in (None, self.staff):
+            with self.subTest(user=user):
+                if user:
+                    self.client.force_login(user)
+                response = self.bulk({'action': 'deactivate', 'user_ids': [self.users[0].pk]})
+                self.assertEqual(response.status_code, 302)
+                self.assertIn('/login/', response['Location'])
+        self.assertTrue(User.objects.get(pk=self.users[0].pk).is_active)
+
+    def test_deactivate_selected_drops_cached_users(self):
+        for user in self.users:
+            auth_cache.remember(user)
+        self.client.force_login(self.manager)
+        auth_cache.remember(self.manager)
+        targets = [self.users[0].pk, self.users[1].pk, self.manager.pk]
+        response = self.bulk({'action': 'deactivate', 'user_ids': targets}, '?role=user')
+        self.assertRedirects(response, '/dashboard/users/?role=user', fetch_redirect_response=False)
+        self.assertEqual(
+            list(User.objects.filter(is_active=False).order_by('pk').values_list('pk', flat=True)), targets[:2],
+        )
+        self.assertIsNone(auth_cache.get(self.users[0].pk))
+        self.assertIsNone(auth_cache.get(self.users[1].pk))
+        # Untouched accounts keep their cache entry, and nobody can lock themselves out
+        self.assertIsNotNone(auth_cache.get(self.users[2].pk))
+        self.assertIsNotNone(auth_cache.get(self.manager.pk))
+        self.assertTrue(User.objects.get(pk=self.manager.pk).is_active)
+
+    def test_activate_filtered(self):
+        User.objects.filter(pk__in=[user.pk for user in self.users]).update(is_active=False)
+        self.client.force_login(self.manager)
+        self.bulk({'action': 'activate', 'scope': 'filtered'}, '?q=member')
+        self.assertEqual(User.objects.filter(is_active=False).count(), 0)
 
-# Create your tests here.
+    def test_unknown_action(self):
+        self.client.force_login(self.manager)
+        self.bulk({'action': 'delete', 'user_ids': [self.users[0].pk]})
+        self.assertTrue(User.objects.filter(pk=self.users[0].pk).exists())
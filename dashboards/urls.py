@@ -4,6 +4,7 @@ from . import views
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
     path('posts/', views.posts, name='posts'),
+    path('posts/data/', views.posts_data, name='posts_data'),
     path('add-post/', views.add_post, name='add_post'),
     path('edit-post/<int:post_id>/', views.edit_post, name='edit_post'),
     path('add-category/', views.add_category, name='add_category'),
@@ -14,7 +15,11 @@ urlpatterns = [
     
     # User Management (Manager only)
     path('users/', views.users_list, name='users_list'),
+    path('users/bulk/', views.bulk_users, name='bulk_users'),
     path('add-user/', views.add_user, name='add_user'),
     path('edit-user/<int:user_id>/', views.edit_user, name='edit_user'),
     path('delete-user/<int:user_id>/', views.delete_user, name='delete_user'),
+
+    # Streaming exports (staff only)
+    path('export/<str:kind>/', views.export_content, name='export_content'),
 ]
\ No newline at end of file
@@ -1,51 +1,75 @@
+from django.http import Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
+from django.template.loader import render_to_string
 from django.contrib.auth.decorators import login_required
+from blog_main import auth_cache
+from blogs import exporter
+from blogs.context_processors import get_chrome
 from blogs.models import Blog, Category
+from blogs.slugs import save_with_unique_slug
 from django.contrib import messages
 from django.utils import timezone
-from django.utils.text import slugify
 from django.contrib.auth.models import User
 from django.contrib.auth.decorators import user_passes_test
 
+from . import stats
+from .grid import PostGrid, UserGrid, row_data
+
+RECENT_POSTS = 10
+
 
 @login_required(login_url='login')
 def dashboard(request):
-    # Get user's blog posts
-    user_posts = Blog.objects.filter(author=request.user).order_by('-created_at')
+    staff = request.user.is_staff or request.user.is_superuser
+
+    # Latest posts only; the posts page lists the rest
+    user_posts = Blog.objects.filter(author=request.user).summaries().order_by('-created_at')[:RECENT_POSTS]
     
     # Get all categories (only for admin/staff users)
-    if request.user.is_staff or request.user.is_superuser:
-        categories = Category.objects.all().order_by('-created_at')
-        all_posts = Blog.objects.all().order_by('-created_at')
-    else:
-        categories = None
-        all_posts = None
+    categories = Category.objects.all().order_by('-created_at') if staff else None
     
     context = {
         'user_posts': user_posts,
         'categories': categories,
-        'all_posts': all_posts,
+        # Every number on the page, read from stored counters
+        'stats': stats.dashboard_stats(request.user, staff=staff),
     }
     return render(request, 'dashboard.html', context)
 
+def post_grid_context(request):
+    # Admin sees all posts, regular users only their own (see dashboards/grid.py)
+    grid = PostGrid(request.GET, request.user)
+    page = grid.page(request.GET.get('page'))
+    return {
+        'grid': grid,
+        'page': page,
+        'page_links': grid.page_links(page),
+        'categories': get_chrome()['categories'],
+    }
+
 @login_required(login_url='login')
 def posts(request):
-    # Get posts based on user role
-    if request.user.is_staff or request.user.is_superuser:
-        # Admin sees all posts
-        posts = Blog.objects.all().order_by('-created_at')
-    else:
-        # Regular users see only their posts
-        posts = Blog.objects.filter(author=request.user).order_by('-created_at')
-    
-    categories = Category.objects.all()
-    
-    context = {
-        'posts': posts,
-        'categories': categories,
-    }
+    context = post_grid_context(request)
+    staff = request.user.is_staff or request.user.is_superuser
+    context['stats'] = stats.site_stats() if staff else stats.author_stats(request.user)
     return render(request, 'dashboard/post.html', context)
 
+@login_required(login_url='login')
+def posts_data(request):
+    """One page of the post grid as JSON, so filters and paging update without a reload"""
+    context = post_grid_context(request)
+    page, grid = context['page'], context['grid']
+    total, exact = grid.count
+    return JsonResponse({
+        'count': total,
+        'count_exact': exact,
+        'page': page.number,
+        'num_pages': page.paginator.num_pages,
+        'rows': [row_data(post) for post in page],
+        'html': render_to_string('dashboard/post_grid.html', context, request=request),
+    })
+
 @login_required(login_url='login')
 def add_post(request):
     categories = Category.objects.all()
@@ -67,20 +91,9 @@ def add_post(request):
         try:
             category = Category.objects.get(id=category_id)
             
-            # Create slug from title
-            slug = slugify(title)
-            original_slug = slug
-            counter = 1
-            
-            # Make sure slug is unique
-            while Blog.objects.filter(slug=slug).exists():
-                slug = f"{original_slug}-{counter}"
-                counter += 1
-            
-            # Create the blog post
-            post = Blog.objects.create(
+            # Create the blog post with a unique slug from its title
+            post = Blog(
                 title=title,
-                slug=slug,
                 category=category,
                 author=request.user,
                 short_description=short_description,
@@ -89,6 +102,7 @@ def add_post(request):
                 is_featured=is_featured,
                 feauture_image=feature_image
             )
+            save_with_unique_slug(post)
             
             messages.success(request, f'✅ Post "{title}" created successfully!')
             return redirect('posts')
@@ -115,7 +129,7 @@ def add_category(request):
         
         if category_name:
             # Check if category already exists
-            if Category.objects.filter(category_name__iexact=category_name).exists():
+            if Category.objects.named(category_name).exists():
                 messages.error(request, f'Category "{category_name}" already exists!')
             else:
                 Category.objects.create(
@@ -161,18 +175,7 @@ def edit_post(request, post_id):
         try:
             category = Category.objects.get(id=category_id)
             
-            # Update slug only if title changed
-            if post.title != title:
-                slug = slugify(title)
-                original_slug = slug
-                counter = 1
-                
-                # Make sure slug is unique (exclude current post)
-                while Blog.objects.filter(slug=slug).exclude(id=post_id).exists():
-                    slug = f"{original_slug}-{counter}"
-                    counter += 1
-                
-                post.slug = slug
+            title_changed = post.title != title
             
             # Update post fields
             post.title = title
@@ -187,7 +190,12 @@ def edit_post(request, post_id):
                 post.feauture_image = feature_image
             
             post.updated_at = timezone.now()
-            post.save()
+            
+            # Update slug only if title changed
+            if title_changed:
+                save_with_unique_slug(post)
+            else:
+                post.save()
             
             messages.success(request, f'✅ Post "{title}" updated successfully!')
             return redirect('posts')
@@ -217,7 +225,7 @@ def edit_category(request, category_id):
         
         if new_name:
             # Check if new name already exists (excluding current category)
-            if Category.objects.filter(category_name__iexact=new_name).exclude(id=category_id).exists():
+            if Category.objects.named(new_name).exclude(id=category_id).exists():
                 messages.error(request, f'Category "{new_name}" already exists!')
             else:
                 old_name = category.category_name
@@ -239,8 +247,8 @@ def delete_category(request, category_id):
     
     category = get_object_or_404(Category, id=category_id)
     
-    # Check if category has posts
-    post_count = category.blog_set.count()
+    # Check if category has posts (stored counter; verify a zero before deleting)
+    post_count = category.post_count or category.blog_set.count()
     
     if post_count > 0:
         messages.warning(request, f'⚠️ Cannot delete "{category.category_name}" - it has {post_count} blog post(s)!')
@@ -293,13 +301,51 @@ def is_manager(user):
 @user_passes_test(is_manager)
 def users_list(request):
     """View all users - Only for superuser"""
-    users = User.objects.all().order_by('-date_joined')
+    # One page at a time; post and comment counts come from the joined AuthorStats row
+    grid = UserGrid(request.GET)
+    page = grid.page(request.GET.get('page'))
     
     context = {
-        'users': users,
+        'users': page,
+        'grid': grid,
+        'page': page,
+        'page_links': grid.page_links(page),
+        'totals': grid.totals,
     }
     return render(request, 'dashboard/users.html', context)
 
+@login_required(login_url='login')
+@user_passes_test(is_manager)
+def bulk_users(request):
+    """Activate or deactivate many users with one UPDATE - Only for superuser"""
+    back = reverse('users_list') + ('?' + request.GET.urlencode() if request.GET else '')
+    if request.method != 'POST':
+        return redirect(back)
+    
+    action = request.POST.get('action')
+    if action not in ('activate', 'deactivate'):
+        messages.error(request, '❌ Unknown bulk action!')
+        return redirect(back)
+    
+    # Either the ticked rows or everyone matching the current filters
+    if request.POST.get('scope') == 'filtered':
+        users = UserGrid(request.GET).queryset()
+    else:
+        ids = [int(pk) for pk in request.POST.getlist('user_ids') if pk.isdigit()]
+        if not ids:
+            messages.warning(request, '⚠️ No users selected!')
+            return redirect(back)
+        users = User.objects.filter(pk__in=ids)
+    
+    # Never lock yourself out
+    users = users.exclude(pk=request.user.pk)
+    # update() sends no signals; drop the cached User of everyone logged out by this
+    deactivated = list(users.filter(is_active=True).values_list('pk', flat=True)) if action == 'deactivate' else []
+    changed = users.update(is_active=action == 'activate')
+    auth_cache.invalidate(*deactivated)
+    messages.success(request, f'✅ {changed} user(s) {action}d!')
+    return redirect(back)
+
 @login_required(login_url='login')
 @user_passes_test(is_manager)
 def add_user(request):
@@ -397,15 +443,18 @@ def edit_user(request, user_id):
 @user_passes_test(is_manager)
 def delete_user(request, user_id):
     """Delete user - Only for superuser"""
-    user_to_delete = get_object_or_404(User, id=user_id)
+    user_to_delete = get_object_or_404(User.objects.select_related('post_stats'), id=user_id)
     
     # Prevent deleting yourself
     if user_to_delete == request.user:
         messages.error(request, '❌ You cannot delete yourself!')
         return redirect('users_list')
     
-    # Check if user has posts
-    post_count = Blog.objects.filter(author=user_to_delete).count()
+    # Check if user has posts (stored counter; a zero is confirmed with an indexed EXISTS, since delete cascades)
+    stats = getattr(user_to_delete, 'post_stats', None)
+    post_count = stats.post_count if stats else 0
+    if not post_count and Blog.objects.filter(author=user_to_delete).exists():
+        post_count = Blog.objects.filter(author=user_to_delete).count()
     
     if post_count > 0:
         messages.warning(request, f'⚠️ User "{user_to_delete.username}" has {post_count} blog post(s). Please reassign or delete posts first!')
@@ -414,4 +463,28 @@ def delete_user(request, user_id):
         user_to_delete.delete()
         messages.success(request, f'✅ User "{username}" deleted successfully!')
     
-    return redirect('users_list')
\ No newline at end of file
+    return redirect('users_list')
+
+# Check if user is staff (exports include drafts on request)
+def is_staff_member(user):
+    return user.is_staff or user.is_superuser
+
+@login_required(login_url='login')
+@user_passes_test(is_staff_member)
+def export_content(request, kind):
+    """Stream posts or comments as JSONL/CSV - Only for staff"""
+    if kind not in exporter.KINDS:
+        raise Http404('Unknown export')
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in exporter.FORMATS:
+        fmt = 'jsonl'
+    compress = request.GET.get('gzip') == '1'
+    include_drafts = request.GET.get('drafts') == '1'
+
+    response = StreamingHttpResponse(
+        exporter.stream(kind, fmt, compress=compress, include_drafts=include_drafts),
+        content_type='application/gzip' if compress else ('text/csv' if fmt == 'csv' else 'application/x-ndjson'),
+    )
+    response['Content-Disposition'] = f'attachment; filename="{exporter.filename(kind, fmt, compress)}"'
+    response['Cache-Control'] = 'private, no-store'
+    return response